@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# vectorised batch engine - thousands of games of breakthrough held as numpy arrays and stepped in
+# lockstep, following the same rules as engine.GameState (and cross-checked against it)
+import argparse
+import random
+import sys
+import time
+import numpy as np
+from engine import *
+from lock_catalogue import LockCatalogue
+
+KIND_PLAY = 0
+KIND_DISCARD = 1
+KIND_LOSE_KEY = 2
+KIND_DISCARD_FIVE = 3
+_BATCH_KINDS = {PLAY_CARD: KIND_PLAY, DISCARD_CARD: KIND_DISCARD, LOSE_KEY: KIND_LOSE_KEY, DISCARD_FIVE: KIND_DISCARD_FIVE}
+
+_END_NONE, _END_DECK_EMPTY, _END_DIFFICULTY, _END_TURN_LIMIT = range(4)
+
+EMPTY = -1  # unused slot in a card array
+MAX_TAIL = 3  # only the last three sequence cards are ever checked against a lock
+
+
+def CompileLocks(Locks):
+    """lock conditions as card code arrays, conditions that can never match get a length of 0"""
+    Codes = {Description: Code for Code, Description in enumerate(CARD_DESCRIPTIONS)}
+    MaxChallenges = max(L.GetNumberOfChallenges() for L in Locks)
+    if MaxChallenges > 62:
+        raise ValueError("locks with more than 62 challenges can't be held in a bitmask")
+    Conditions = np.full((len(Locks), MaxChallenges, MAX_TAIL), EMPTY, np.int16)
+    Lengths = np.zeros((len(Locks), MaxChallenges), np.int8)
+    FullMasks = np.zeros(len(Locks), np.int64)
+    for L, ThisLock in enumerate(Locks):
+        FullMasks[L] = (1 << ThisLock.GetNumberOfChallenges()) - 1
+        for C, ThisChallenge in enumerate(ThisLock.GetChallenges()):
+            Condition = ThisChallenge.GetCondition()
+            if 0 < len(Condition) <= MAX_TAIL and all(D in Codes for D in Condition):
+                Lengths[L, C] = len(Condition)
+                Conditions[L, C, :len(Condition)] = [Codes[D] for D in Condition]
+    return Conditions, Lengths, FullMasks
+
+
+class BatchGameState():
+    """every game is one row of the arrays below, which policies may read but should not change"""
+
+    def __init__(self, NumGames, Locks, Capacity, Rngs=None, Seed=None):
+        self.NumGames = NumGames
+        self._Conditions, self._Lengths, self._FullMasks = CompileLocks(Locks)
+        self._NumLocks = len(Locks)
+        self._Rngs = Rngs  # per-game random.Random, which keeps games identical to engine.GameState
+        self._Generator = np.random.default_rng(Seed)
+        self._Scores = np.array(CARD_SCORES + [0], np.int32)  # the extra entry is for EMPTY
+        self._ToolTypes = np.array([ord(T) for T in CARD_TOOL_TYPES] + [0], np.int32)
+        self.Deck = np.full((NumGames, Capacity + 1), EMPTY, np.int16)  # spare column so the top of an empty deck can be read
+        self.DeckStart = np.zeros(NumGames, np.int32)
+        self.DeckEnd = np.zeros(NumGames, np.int32)
+        self.Hand = np.full((NumGames, HAND_SIZE), EMPTY, np.int16)
+        self.HandCount = np.zeros(NumGames, np.int32)
+        self.Discard = np.full((NumGames, Capacity), EMPTY, np.int16)
+        self.DiscardCount = np.zeros(NumGames, np.int32)
+        self.Tail = np.full((NumGames, MAX_TAIL), EMPTY, np.int16)  # last cards of the sequence, newest on the right
+        self.SeqLen = np.zeros(NumGames, np.int32)
+        self.Score = np.zeros(NumGames, np.int32)
+        self.NumLocksSolved = np.zeros(NumGames, np.int32)
+        self.Turns = np.zeros(NumGames, np.int32)
+        self.CurrentLock = np.zeros(NumGames, np.int32)
+        self.MetMask = np.zeros(NumGames, np.int64)  # challenges met on the current lock, every round starts afresh
+        self.GameOver = np.zeros(NumGames, bool)
+        self.EndCause = np.zeros(NumGames, np.int8)
+        self.PendingDifficulty = np.zeros(NumGames, bool)
+        self.PendingChallengeCheck = np.zeros(NumGames, bool)
+
+    @classmethod
+    def FromGameStates(cls, States):
+        """copy set up engine.GameStates (sharing the same lock file) into a batch, the games carry on
+        using each state's own random generator so they play out exactly as the scalar engine would"""
+        Locks = States[0].GetLocks()
+        Capacity = max(S.GetDeck().GetNumberOfCards() + S.GetHand().GetNumberOfCards() + S.GetDiscard().GetNumberOfCards() for S in States)
+        Batch = cls(len(States), Locks, Capacity, Rngs=[S.GetRng() for S in States])
+        for G, S in enumerate(States):
+            if S.GetDifficultyPending():
+                raise ValueError("can't copy a game that is waiting on a difficulty card")
+            Deck = [C.GetCode() for C in S.GetDeck().GetCards()]
+            Batch.Deck[G, :len(Deck)] = Deck
+            Batch.DeckEnd[G] = len(Deck)
+            Hand = [C.GetCode() for C in S.GetHand().GetCards()]
+            Batch.Hand[G, :len(Hand)] = Hand
+            Batch.HandCount[G] = len(Hand)
+            Discard = [C.GetCode() for C in S.GetDiscard().GetCards()]
+            Batch.Discard[G, :len(Discard)] = Discard
+            Batch.DiscardCount[G] = len(Discard)
+            Tail = [C.GetCode() for C in S.GetSequence().GetCards()[-MAX_TAIL:]]
+            Batch.Tail[G, MAX_TAIL - len(Tail):] = Tail
+            Batch.SeqLen[G] = S.GetSequence().GetNumberOfCards()
+            Batch.Score[G] = S.GetScore()
+            Batch.NumLocksSolved[G] = S.GetNumLocksSolved()
+            Batch.Turns[G] = S.GetTurns()
+            Batch.GameOver[G] = S.GetGameOver()
+            Batch.EndCause[G] = END_CAUSES.index(S.GetEndCause())
+            if S.GetCurrentLockIndex() is None:
+                raise ValueError("the current lock must be a copy of one of the game's locks")
+            Batch.CurrentLock[G] = S.GetCurrentLockIndex()
+            for C in range(S.GetCurrentLock().GetNumberOfChallenges()):
+                if S.GetCurrentLock().GetChallengeMet(C):
+                    Batch.MetMask[G] |= 1 << C
+        return Batch
+
+    @classmethod
+    def NewGames(cls, NumGames, Locks, Seed=None, DeckComposition=STANDARD_DECK, DifficultyCards=DIFFICULTY_CARDS):
+        """deal new games the way GameState.SetupStandardGame does, with numpy's generator"""
+        Cards = [GetToolCardCode(ToolType, Kit) for Copies, ToolCards in DeckComposition for Count in range(Copies) for ToolType, Kit in ToolCards]
+        Batch = cls(NumGames, Locks, len(Cards) + HAND_SIZE * DifficultyCards, Seed=Seed)
+        Deck = Batch.__ShuffleRows(np.tile(np.array(Cards, np.int16), (NumGames, 1)))
+        for Count in range(HAND_SIZE):
+            Batch.Hand[:, Count] = Deck[:, 0]
+            Deck = np.hstack([Deck[:, 1:], np.full((NumGames, DifficultyCards), DIFFICULTY_CODE, np.int16)])
+            Deck = Batch.__ShuffleRows(Deck)
+            Batch.CurrentLock[:] = Batch._Generator.integers(Batch._NumLocks, size=NumGames)
+        Batch.HandCount[:] = HAND_SIZE
+        Batch.Deck[:, :Deck.shape[1]] = Deck
+        Batch.DeckEnd[:] = Deck.shape[1]
+        return Batch
+
+    def __ShuffleRows(self, Cards):
+        return np.take_along_axis(Cards, np.argsort(self._Generator.random(Cards.shape), axis=1), axis=1)
+
+    def GetHandScores(self):
+        return self._Scores[self.Hand]
+
+    def GetHandToolTypes(self):
+        return self._ToolTypes[self.Hand]
+
+    def GetOccupiedMask(self):
+        return np.arange(HAND_SIZE) < self.HandCount[:, None]
+
+    def GetPlayableMask(self):
+        """hand slots that can be played, i.e. aren't the same tool type as the end of the sequence"""
+        Differs = self.GetHandToolTypes() != self._ToolTypes[self.Tail[:, -1]][:, None]
+        return self.GetOccupiedMask() & ((self.SeqLen == 0)[:, None] | Differs)
+
+    def GetEndCauses(self):
+        return [END_CAUSES[Cause] for Cause in self.EndCause]
+
+    def EndGames(self, Mask, Cause=END_TURN_LIMIT):
+        self.GameOver[Mask] = True
+        self.EndCause[Mask] = END_CAUSES.index(Cause)
+
+    def Apply(self, Kinds, Positions):
+        """one action for every live game, Positions follow engine.Action (1-5 card choice, 0 based for LOSE_KEY)"""
+        Live = ~self.GameOver
+        Pending = Live & self.PendingDifficulty
+        Main = Live & ~self.PendingDifficulty
+
+        G = np.flatnonzero(Main & (Kinds == KIND_PLAY))
+        if G.size:
+            Slots = Positions[G] - 1
+            Codes = self.Hand[G, Slots]
+            CanPlay = (self.SeqLen[G] == 0) | (self._ToolTypes[Codes] != self._ToolTypes[self.Tail[G, -1]])
+            P = G[CanPlay]
+            self.Score[P] += self._Scores[Codes[CanPlay]]
+            self.__RemoveFromHand(P, Slots[CanPlay])
+            self.Tail[P, :-1] = self.Tail[P, 1:]
+            self.Tail[P, -1] = Codes[CanPlay]
+            self.SeqLen[P] += 1
+            self.__GetCardFromDeck(P)
+            self.PendingChallengeCheck[G] = True  # checked once any difficulty card has been dealt with
+
+        G = np.flatnonzero(Main & (Kinds == KIND_DISCARD))
+        if G.size:
+            self.__AddToDiscard(G, self.__RemoveFromHand(G, Positions[G] - 1))
+            self.__GetCardFromDeck(G)
+
+        LoseKey = Pending & (Kinds == KIND_LOSE_KEY)
+        G = np.flatnonzero(LoseKey)
+        if G.size:
+            self.__AddToDiscard(G, self.__RemoveFromHand(G, Positions[G]))
+        G = np.flatnonzero(Pending & ~LoseKey)
+        for Count in range(5):  # discard five cards from the deck
+            G = G[self.DeckEnd[G] > self.DeckStart[G]]
+            self.__AddToDiscard(G, self.__PopDeck(G))
+        G = np.flatnonzero(Pending)
+        if G.size:
+            self.PendingDifficulty[G] = False
+            self.__RefillHand(G, np.where(self.DeckEnd[G] == self.DeckStart[G], _END_DIFFICULTY, _END_DECK_EMPTY))
+
+        self.__EndTurn(np.flatnonzero(Live & ~self.PendingDifficulty))
+
+    def __PopDeck(self, G):
+        Codes = self.Deck[G, self.DeckStart[G]]
+        self.DeckStart[G] += 1
+        return Codes
+
+    def __AddToDiscard(self, G, Codes):
+        self.Discard[G, self.DiscardCount[G]] = Codes
+        self.DiscardCount[G] += 1
+
+    def __RemoveFromHand(self, G, Slots):
+        Codes = self.Hand[G, Slots]
+        Columns = np.arange(HAND_SIZE)
+        Source = np.minimum(Columns + (Columns >= Slots[:, None]), HAND_SIZE - 1)  # close the gap left by the card
+        Shifted = np.take_along_axis(self.Hand[G], Source, axis=1)
+        Shifted[:, -1] = EMPTY
+        self.Hand[G] = Shifted
+        self.HandCount[G] -= 1
+        return Codes
+
+    def __GetCardFromDeck(self, G):
+        Top = self.Deck[G, self.DeckStart[G]]
+        Dif = (self.DeckEnd[G] > self.DeckStart[G]) & (Top == DIFFICULTY_CODE)
+        D = G[Dif]
+        self.__AddToDiscard(D, self.__PopDeck(D))
+        self.PendingDifficulty[D] = True
+        R = G[~Dif]
+        self.__RefillHand(R, np.full(R.size, _END_DECK_EMPTY))
+
+    def __RefillHand(self, G, Causes):
+        Active = G
+        while Active.size:
+            Active = Active[(self.HandCount[Active] < HAND_SIZE) & (self.DeckEnd[Active] > self.DeckStart[Active])]
+            Top = self.__PopDeck(Active)
+            Dif = Top == DIFFICULTY_CODE
+            self.__AddToDiscard(Active[Dif], Top[Dif])
+            H = Active[~Dif]
+            self.Hand[H, self.HandCount[H]] = Top[~Dif]
+            self.HandCount[H] += 1
+        Over = (self.DeckEnd[G] == self.DeckStart[G]) & (self.HandCount[G] < HAND_SIZE)
+        self.GameOver[G[Over]] = True
+        self.EndCause[G[Over]] = Causes[Over]
+
+    def __EndTurn(self, G):
+        Check = G[self.PendingChallengeCheck[G]]
+        self.PendingChallengeCheck[Check] = False
+        self.Score[Check[self.__CheckIfLockChallengeMet(Check)]] += 5
+        self.Turns[G] += 1
+        Locks = self.CurrentLock[G]
+        for Game in G[self.MetMask[G] == self._FullMasks[Locks]]:  # rare, so handled a game at a time
+            self.__ProcessLockSolved(Game)
+        self.__CheckIfLockChallengeMet(G[~self.GameOver[G]])  # the sequence is checked again before every turn
+
+    def __CheckIfLockChallengeMet(self, G):
+        Met = np.zeros(G.size, bool)
+        Locks = self.CurrentLock[G]
+        Conditions = self._Conditions[Locks]
+        Lengths = self._Lengths[Locks]
+        Unmet = ((self.MetMask[G][:, None] >> np.arange(Lengths.shape[1])) & 1) == 0
+        for Length in range(1, MAX_TAIL + 1):  # the last card, then the last two, then the last three
+            Match = (~Met & (self.SeqLen[G] >= Length))[:, None] & Unmet & (Lengths == Length)
+            Match &= np.all(Conditions[:, :, :Length] == self.Tail[G, None, MAX_TAIL - Length:], axis=2)
+            Rows = np.flatnonzero(Match.any(axis=1))
+            self.MetMask[G[Rows]] |= np.left_shift(1, Match[Rows].argmax(axis=1)).astype(np.int64)  # first matching challenge
+            Met[Rows] = True
+        return Met
+
+    def __ProcessLockSolved(self, G):
+        self.Score[G] += 10
+        Cards = self.Deck[G, self.DeckStart[G]:self.DeckEnd[G]].tolist() + self.Discard[G, :self.DiscardCount[G]].tolist()
+        if self._Rngs is not None:
+            self._Rngs[G].shuffle(Cards)
+            self.CurrentLock[G] = self._Rngs[G].randrange(self._NumLocks)
+        else:
+            Cards = self._Generator.permutation(Cards)
+            self.CurrentLock[G] = self._Generator.integers(self._NumLocks)
+        self.Deck[G, :len(Cards)] = Cards
+        self.DeckStart[G] = 0
+        self.DeckEnd[G] = len(Cards)
+        self.DiscardCount[G] = 0
+        self.MetMask[G] = 0
+        self.NumLocksSolved[G] += 1
+        self.GameOver[G] = len(Cards) == 0
+        self.EndCause[G] = _END_DECK_EMPTY if len(Cards) == 0 else _END_NONE
+
+
+class BatchGreedyPolicy():  # the same choices as engine.GreedyAgent
+    def ChooseActions(self, Batch):
+        Playable = Batch.GetPlayableMask()
+        HandScores = Batch.GetHandScores()
+        AnyPlay = Playable.any(axis=1)
+        BestPlay = np.where(Playable, HandScores, -1).argmax(axis=1)
+        BestDiscard = np.where(Batch.GetOccupiedMask(), -HandScores, np.iinfo(np.int32).min).argmax(axis=1)
+        Kinds = np.where(Batch.PendingDifficulty, KIND_DISCARD_FIVE, np.where(AnyPlay, KIND_PLAY, KIND_DISCARD))
+        return Kinds, np.where(AnyPlay, BestPlay, BestDiscard) + 1
+
+
+class BatchRandomPolicy():  # a uniformly random legal action, like engine.RandomAgent
+    def __init__(self, Seed=None):
+        self._Generator = np.random.default_rng(Seed)
+
+    def __PickRandom(self, Legal):
+        Targets = (self._Generator.random(Legal.shape[0]) * Legal.sum(axis=1)).astype(np.int64)
+        return (Legal.cumsum(axis=1) > Targets[:, None]).argmax(axis=1)
+
+    def ChooseActions(self, Batch):
+        Occupied = Batch.GetOccupiedMask()
+        Choice = self.__PickRandom(np.stack([Batch.GetPlayableMask(), Occupied], axis=2).reshape(Batch.NumGames, 2 * HAND_SIZE))
+        Keys = Occupied & (Batch.GetHandToolTypes() == ord("K"))
+        KeyChoice = self.__PickRandom(np.hstack([Keys, np.ones((Batch.NumGames, 1), bool)]))
+        Kinds = np.where(Batch.PendingDifficulty, np.where(KeyChoice < HAND_SIZE, KIND_LOSE_KEY, KIND_DISCARD_FIVE), Choice % 2)
+        Positions = np.where(Batch.PendingDifficulty, KeyChoice, Choice // 2 + 1)
+        return Kinds, Positions
+
+
+class BatchReplayPolicy():  # replays the actions each game made in the scalar engine, to cross-check any agent
+    def __init__(self, Actions):
+        self._Actions = Actions  # per game, the engine.Actions in the order they were applied
+        self._Step = 0
+
+    def ChooseActions(self, Batch):
+        Kinds = np.full(Batch.NumGames, KIND_DISCARD)
+        Positions = np.ones(Batch.NumGames, np.int64)
+        for G, Moves in enumerate(self._Actions):
+            if self._Step < len(Moves):  # games that have finished ignore their action
+                Kinds[G] = _BATCH_KINDS[Moves[self._Step].Kind]
+                Positions[G] = Moves[self._Step].Position
+        self._Step += 1
+        return Kinds, Positions
+
+
+class _RecordingAgent(Agent):
+    def __init__(self, Player):
+        super().__init__()
+        self._Player = Player
+        self.Actions = []
+
+    def ChooseAction(self, State, LegalActions):
+        Move = self._Player.ChooseAction(State, LegalActions)
+        self.Actions.append(Move)
+        return Move
+
+
+def PlayBatch(Batch, Policy, MaxTurns=10000):
+    """step every game until they have all finished, returns the number of steps taken"""
+    Steps = 0
+    while True:
+        Batch.EndGames(~Batch.GameOver & (Batch.Turns >= MaxTurns), END_TURN_LIMIT)
+        if Batch.GameOver.all():
+            return Steps
+        Batch.Apply(*Policy.ChooseActions(Batch))
+        Steps += 1
+
+
+def CrossCheck(NumGames, Seed=0, LocksFile="assets/locks.txt", MaxTurns=10000, Policy="greedy"):
+    """play the same seeded games with both engines, returns the seeds that disagree - greedy games are
+    played by each engine's own policy, random games replay the scalar RandomAgent's choices in the batch"""
+    Locks = LockCatalogue(LocksFile)
+    Scalar, Mirrors, Players = [], [], []
+    for GameSeed in range(Seed, Seed + NumGames):
+        for States in (Scalar, Mirrors):
+            State = GameState(Locks, random.Random(GameSeed))
+            State.SetupStandardGame()
+            States.append(State)
+        Players.append(_RecordingAgent(GreedyAgent() if Policy == "greedy" else RandomAgent(random.Random(GameSeed))))
+    for State, Player in zip(Scalar, Players):
+        PlayHeadlessGame(State, Player, MaxTurns)
+    Batch = BatchGameState.FromGameStates(Mirrors)
+    PlayBatch(Batch, BatchGreedyPolicy() if Policy == "greedy" else BatchReplayPolicy([P.Actions for P in Players]), MaxTurns)
+    Mismatches = []
+    for G, State in enumerate(Scalar):
+        if (State.GetScore(), State.GetNumLocksSolved(), State.GetTurns(), State.GetEndCause()) != \
+                (Batch.Score[G], Batch.NumLocksSolved[G], Batch.Turns[G], END_CAUSES[Batch.EndCause[G]]):
+            Mismatches.append(Seed + G)
+    return Mismatches
+
+
+def Main(Args):
+    Parser = argparse.ArgumentParser(description="Play Breakthrough games in lockstep with numpy.")
+    Parser.add_argument("games", type=int, help="number of games to play")
+    Parser.add_argument("--seed", type=int, default=0)
+    Parser.add_argument("--policy", choices=["greedy", "random"], default="random")
+    Parser.add_argument("--locks", default="assets/locks.txt", help="lock file to play with")
+    Parser.add_argument("--max-turns", type=int, default=10000)
+    Parser.add_argument("--check", type=int, default=0, help="first cross-check this many seeded games against the scalar engine")
+    Options = Parser.parse_args(Args)
+
+    if Options.check > 0:
+        Mismatches = CrossCheck(Options.check, Options.seed, Options.locks, Options.max_turns, Options.policy)
+        print(f'Cross-check: {Options.check - len(Mismatches)}/{Options.check} games identical to the scalar engine')
+        if len(Mismatches) > 0:
+            print("Mismatched seeds:", Mismatches[:20])
+
+    StartTime = time.perf_counter()
+    Batch = BatchGameState.NewGames(Options.games, LockCatalogue(Options.locks), Options.seed)
+    Policy = BatchGreedyPolicy() if Options.policy == "greedy" else BatchRandomPolicy(Options.seed)
+    Steps = PlayBatch(Batch, Policy, Options.max_turns)
+    Elapsed = time.perf_counter() - StartTime
+    print(f'{Options.games} games in {Steps} steps, {Elapsed:.2f}s ({Options.games / Elapsed:.1f} games/second)')
+    print(f'Score: mean {Batch.Score.mean():.2f}, max {Batch.Score.max()}, locks solved: mean {Batch.NumLocksSolved.mean():.3f}')
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# benchmark suite - times the engine's hot paths on seeded inputs from the standard game's size up to
+# very large decks and lock files, optionally under a profiler, and writes JSON that later runs compare against
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from engine import *
+from savegame import SaveGame, ReadGameFile
+from networking.server import packStartingData
+from networking.wire import encodeStartingData
+
+DECK_SIZES = [36, 1000, 10000, 100000]
+LOCK_COUNTS = [8, 1000, 10000, 100000]
+STARTING_DATA_SIZES = [36, 1000, 10000, 60000]  # the wire format counts cards in 16 bits
+TOOL_CARDS = [(ToolType, Kit) for ToolType in ("P", "F", "K") for Kit in ("a", "b", "c")]
+_TempFiles = []  # written by setups, removed once the benchmark using them has finished
+
+
+def MakeCards(Size, Rng):
+    """Size cards numbered from 1, tool cards in the standard deck's proportions with a difficulty card in ten"""
+    Cards = []
+    for CardNumber in range(1, Size + 1):
+        if Rng.random() < 0.1:
+            Cards.append(DifficultyCard(CardNumber))
+        else:
+            Cards.append(ToolCard(*Rng.choice(TOOL_CARDS), CardNumber))
+    return Cards
+
+
+def MakeCollection(Name, Cards):
+    Collection = CardCollection(Name)
+    for C in Cards:
+        Collection.AddCard(C)
+    return Collection
+
+
+def MakeLockLine(Rng):
+    Conditions = []
+    for Count in range(Rng.randint(1, 5)):
+        Conditions.append(",".join(" ".join(Rng.choice(TOOL_CARDS)) for Length in range(Rng.randint(1, 3))))
+    return ";".join(Conditions)
+
+
+def WriteTempFile(Text):
+    Handle, FileName = tempfile.mkstemp(prefix="bench-", suffix=".txt")
+    _TempFiles.append(FileName)
+    with os.fdopen(Handle, "w") as f:
+        f.write(Text)
+    return FileName
+
+
+def RemoveTempFiles():
+    while len(_TempFiles) > 0:
+        try:
+            os.remove(_TempFiles.pop())
+        except OSError:
+            pass
+
+
+# each benchmark's setup takes (size, rng) and returns (function to time, operations it does), setup
+# runs again before every repeat so a benchmark is free to use its inputs up - files a setup writes with
+# WriteTempFile are removed after the last repeat
+def SetupShuffle(Size, Rng):
+    Deck = MakeCollection("DECK", MakeCards(Size, Rng))
+    return (lambda: Deck.Shuffle(Rng)), 1
+
+
+def SetupRemoveCard(Size, Rng):
+    Deck = MakeCollection("DECK", MakeCards(Size, Rng))
+    CardNumbers = Rng.sample(range(1, Size + 1), min(Size, 1000))
+
+    def RemoveCards():
+        for CardNumber in CardNumbers:
+            Deck.RemoveCard(CardNumber)
+    return RemoveCards, len(CardNumbers)
+
+
+def SetupCardDisplay(Size, Rng):  # a collection displayed for the first time
+    Deck = MakeCollection("DECK", MakeCards(Size, Rng))
+    return Deck.GetCardDisplay, 1
+
+
+def SetupCardDisplayAfterMove(Size, Rng):  # redisplayed after the last card is played, as every turn does
+    Hand = MakeCollection("HAND", MakeCards(Size, Rng))
+    Sequence = CardCollection("SEQUENCE")
+    Hand.GetCardDisplay()
+
+    def MoveAndDisplay():
+        Hand.MoveCardAt(Hand.GetNumberOfCards() - 1, Sequence)
+        Hand.GetCardDisplay()
+    return MoveAndDisplay, 1
+
+
+def SetupCheckLocks(Size, Rng):
+    Locks = [ParseLock(MakeLockLine(Rng)).GetFreshCopy() for Count in range(Size)]
+    Sequences = [", ".join(" ".join(Rng.choice(TOOL_CARDS)) for Length in range(Rng.randint(1, 3))) for Count in range(3)]
+
+    def CheckLocks():
+        for ThisLock in Locks:
+            for Sequence in Sequences:
+                ThisLock.CheckIfConditionMet(Sequence)
+    return CheckLocks, len(Locks) * len(Sequences)
+
+
+def SetupLoadLocks(Size, Rng):
+    FileName = WriteTempFile("\n".join(MakeLockLine(Rng) for Count in range(Size)) + "\n")
+    return (lambda: LoadLocks(FileName)), Size
+
+
+def _MakeGame(Size, Rng):
+    """a game part way through with a Size card deck"""
+    Locks = LoadLocks()
+    State = GameState(Locks, random.Random(Rng.getrandbits(64)))
+    Cards = MakeCards(Size + HAND_SIZE, Rng)
+    for C in Cards[:HAND_SIZE]:
+        State.GetHand().AddCard(C)
+    for C in Cards[HAND_SIZE:]:
+        State.GetDeck().AddCard(C)
+    State.ChooseRandomLock()
+    return State, Locks
+
+
+def SetupLoadTextGame(Size, Rng):
+    State, Locks = _MakeGame(Size, Rng)
+    CurrentLock = State.GetCurrentLock()
+    Lines = [str(State.GetScore()), ";".join(",".join(C.GetCondition()) for C in CurrentLock.GetChallenges()),
+             ";".join("Y" if C.GetMet() else "N" for C in CurrentLock.GetChallenges())]
+    for Collection in (State.GetHand(), State.GetSequence(), State.GetDiscard(), State.GetDeck()):
+        Lines.append(",".join(f'{C.GetDescription()} {C.GetCardNumber()}' for C in Collection.GetCards()))
+    FileName = WriteTempFile("\n".join(Lines) + "\n")
+    return (lambda: ReadGameFile(FileName, Locks)), 1
+
+
+def SetupLoadSavedGame(Size, Rng):
+    State, Locks = _MakeGame(Size, Rng)
+    FileName = WriteTempFile("")
+    with open(FileName, "wb") as f:
+        f.write(SaveGame(State))
+    return (lambda: ReadGameFile(FileName)), 1
+
+
+def SetupStartingData(Size, Rng):  # what uploadStartingData and the first starting data request do
+    State, Locks = _MakeGame(Size, Rng)
+    return (lambda: encodeStartingData(packStartingData(State.GetHand(), State.GetDeck(), Locks))), 1
+
+
+BENCHMARKS = {  # name -> (setup, sizes, what the size is)
+    "shuffle": (SetupShuffle, DECK_SIZES, "cards"),
+    "remove_card": (SetupRemoveCard, DECK_SIZES, "cards"),
+    "card_display": (SetupCardDisplay, DECK_SIZES, "cards"),
+    "card_display_after_move": (SetupCardDisplayAfterMove, DECK_SIZES, "cards"),
+    "check_locks": (SetupCheckLocks, LOCK_COUNTS, "locks"),
+    "load_locks": (SetupLoadLocks, LOCK_COUNTS, "locks"),
+    "load_text_game": (SetupLoadTextGame, DECK_SIZES, "cards"),
+    "load_saved_game": (SetupLoadSavedGame, DECK_SIZES, "cards"),
+    "starting_data": (SetupStartingData, STARTING_DATA_SIZES, "cards"),
+}
+
+
+def TimeBenchmark(Setup, Size, Seed, Repeats):
+    """per-repeat seconds for one size, the garbage collector is off while the function runs"""
+    Times = []
+    Ops = 1
+    try:
+        for Repeat in range(Repeats):
+            Function, Ops = Setup(Size, random.Random(Seed))
+            GcWasEnabled = gc.isenabled()
+            gc.disable()
+            try:
+                StartTime = time.perf_counter()
+                Function()
+                Times.append(time.perf_counter() - StartTime)
+            finally:
+                if GcWasEnabled:
+                    gc.enable()
+    finally:
+        RemoveTempFiles()
+    return Times, Ops
+
+
+def ProfileBenchmark(Setup, Size, Seed, Profiler, FileName):
+    """run once more under cProfile or pyinstrument, writing the profile to FileName"""
+    Function, Ops = Setup(Size, random.Random(Seed))
+    try:
+        _RunProfiler(Function, Profiler, FileName)
+    finally:
+        RemoveTempFiles()
+
+
+def _RunProfiler(Function, Profiler, FileName):
+    if Profiler == "cprofile":
+        import cProfile
+        import pstats
+        Profile = cProfile.Profile()
+        Profile.runcall(Function)
+        Profile.dump_stats(FileName + ".prof")
+        pstats.Stats(Profile).sort_stats("cumulative").print_stats(12)
+    else:
+        try:
+            from pyinstrument import Profiler as PyinstrumentProfiler
+        except ImportError:
+            raise SystemExit("pyinstrument is not installed (pip install pyinstrument)")
+        Profile = PyinstrumentProfiler()
+        Profile.start()
+        Function()
+        Profile.stop()
+        with open(FileName + ".html", "w") as f:
+            f.write(Profile.output_html())
+        print(Profile.output_text())
+
+
+def RunSuite(Names, Seed, Repeats, MaxSize=None, Profiler=None, ProfileDir="bench-profiles"):
+    Results = {}
+    for Name in Names:
+        Setup, Sizes, Unit = BENCHMARKS[Name]
+        Results[Name] = {}
+        for Size in Sizes:
+            if MaxSize is not None and Size > MaxSize:
+                continue
+            Times, Ops = TimeBenchmark(Setup, Size, Seed, Repeats)
+            Median = statistics.median(Times)
+            Results[Name][str(Size)] = {"unit": Unit, "ops": Ops, "repeats": Repeats, "best": min(Times),
+                                        "median": Median, "per_op": Median / Ops}
+            print(f'{Name:<25}{Size:>8} {Unit:<6}{1e6 * Median:>14.1f}us{1e6 * Median / Ops:>14.3f}us/op')
+            if Profiler is not None:
+                os.makedirs(ProfileDir, exist_ok=True)
+                ProfileBenchmark(Setup, Size, Seed, Profiler, os.path.join(ProfileDir, f'{Name}-{Size}'))
+    return Results
+
+
+def CompareResults(Results, Baseline, Threshold):
+    """the per-op medians that got slower than the baseline by more than Threshold (e.g. 0.1 for 10%)"""
+    Regressions = []
+    for Name, Sizes in Results.items():
+        for Size, Result in Sizes.items():
+            Base = Baseline.get("results", {}).get(Name, {}).get(Size)
+            if Base is None or Base["per_op"] <= 0:
+                continue
+            Ratio = Result["per_op"] / Base["per_op"]
+            Marker = "  REGRESSION" if Ratio > 1 + Threshold else ""
+            print(f'{Name:<25}{Size:>8}{Ratio:>10.2f}x{Marker}')
+            if Marker != "":
+                Regressions.append((Name, Size, Ratio))
+    return Regressions
+
+
+def Main(Args):
+    Parser = argparse.ArgumentParser(description="Benchmark Breakthrough's hot paths.")
+    Parser.add_argument("benchmarks", nargs="*", help=f'benchmarks to run (default: all of {", ".join(BENCHMARKS)})')
+    Parser.add_argument("--seed", type=int, default=0)
+    Parser.add_argument("--repeats", type=int, default=5)
+    Parser.add_argument("--max-size", type=int, default=None, help="skip input sizes above this, e.g. 1000 for a quick run")
+    Parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], default=None, help="also profile every benchmark run")
+    Parser.add_argument("--profile-dir", default="bench-profiles", help="where profiles are written")
+    Parser.add_argument("--json", default=None, help="write the results to this file")
+    Parser.add_argument("--compare", default=None, help="JSON results of an earlier run to compare against")
+    Parser.add_argument("--threshold", type=float, default=0.1, help="slowdown counted as a regression (0.1 is 10%%)")
+    Options = Parser.parse_args(Args)
+    Names = Options.benchmarks or list(BENCHMARKS)
+    for Name in Names:
+        if Name not in BENCHMARKS:
+            Parser.error(f'unknown benchmark {Name!r}')
+
+    Results = RunSuite(Names, Options.seed, Options.repeats, Options.max_size, Options.profile, Options.profile_dir)
+    if Options.json is not None:
+        with open(Options.json, "w") as f:
+            json.dump({"python": platform.python_version(), "implementation": platform.python_implementation(),
+                       "machine": platform.machine(), "seed": Options.seed, "results": Results}, f, indent=2, sort_keys=True)
+    if Options.compare is not None:
+        with open(Options.compare) as f:
+            Baseline = json.load(f)
+        if len(CompareResults(Results, Baseline, Options.threshold)) > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
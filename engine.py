@@ -0,0 +1,739 @@
+#!/usr/bin/env python3
+# headless game engine - the rules of breakthrough with no terminal I/O so that games can be
+# driven by agents (simulations, AI players) as well as by the interactive Breakthrough class
+import abc
+import hashlib
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+PLAY_CARD = "P"
+DISCARD_CARD = "D"
+LOSE_KEY = "K"  # difficulty card - lose a key from the hand
+DISCARD_FIVE = "F"  # difficulty card - discard five cards from the top of the deck
+
+# events reported back by GameState.Apply so a front end can describe what happened
+EVENT_CHALLENGE_MET = 0
+EVENT_LOCK_SOLVED = 1
+EVENT_DIFFICULTY = 2
+EVENT_DIFFICULTY_DISCARDED = 3
+EVENT_GAME_OVER = 4
+
+# every kind of card has a small integer code indexing these tables, descriptions are interned
+# so the hot paths compare and hash them without building strings
+DIFFICULTY_CODE = 0
+CARD_DESCRIPTIONS = ["Dif"]
+CARD_TOOL_TYPES = ["D"]  # first character of the description, cards of one type can't follow each other
+CARD_SCORES = [0]
+TOOL_SCORES = {"K": 3, "F": 2, "P": 1}
+_ToolCardCodes = {}
+
+
+def GetToolCardCode(ToolType, Kit):
+    Code = _ToolCardCodes.get((ToolType, Kit))
+    if Code is None:  # unseen cards (e.g. from a host) get the next free code in this process
+        Code = len(CARD_DESCRIPTIONS)
+        CARD_DESCRIPTIONS.append(sys.intern(ToolType + " " + Kit))
+        CARD_TOOL_TYPES.append(CARD_DESCRIPTIONS[Code][0])
+        CARD_SCORES.append(TOOL_SCORES.get(ToolType, 0))
+        _ToolCardCodes[(ToolType, Kit)] = Code
+    return Code
+
+
+for _ToolType in ("P", "F", "K"):  # the standard cards always have codes 1-9
+    for _Kit in ("a", "b", "c"):
+        GetToolCardCode(_ToolType, _Kit)
+
+# why a game finished, see GameState.GetEndCause
+END_DECK_EMPTY = "DECK_EMPTY"  # not enough cards left to refill the hand
+END_DIFFICULTY = "DIFFICULTY"  # a difficulty card's discard emptied the deck
+END_TURN_LIMIT = "TURN_LIMIT"  # stopped by whoever was driving the game
+END_CAUSES = [None, END_DECK_EMPTY, END_DIFFICULTY, END_TURN_LIMIT]  # for compact encodings
+
+HAND_SIZE = 5
+CARDS_PER_LINE = 10  # when displaying a collection
+DIFFICULTY_CARDS = 5  # added to the deck for every card dealt to the starting hand
+RULESET_VERSION = 1  # bump whenever the same seed and locks would deal or play out a different game
+STANDARD_DECK = [(5, [("P", "a"), ("P", "b"), ("P", "c")]),  # (copies, tool cards)
+                 (3, [("F", "a"), ("F", "b"), ("F", "c"), ("K", "a"), ("K", "b"), ("K", "c")])]
+
+
+@dataclass(frozen=True)
+class Action:
+    Kind: str
+    Position: int = 0  # 1-5 card choice for play/discard, 0 based hand position for LOSE_KEY
+
+
+class GameState():
+    def __init__(self, Locks, Rng=None):
+        self.__Rng = Rng or random.Random()  # seed it to replay a game exactly
+        self.__Deck = CardCollection("DECK")
+        self.__Hand = CardCollection("HAND")
+        self.__Sequence = CardCollection("SEQUENCE")
+        self.__Discard = CardCollection("DISCARD")
+        self.__Locks = Locks
+        self.__Score = 0
+        self.__GameOver = False
+        self.__CurrentLock = Lock()
+        self.__CurrentLockIndex = None  # which of Locks the current lock is a fresh copy of
+        self.__NumLocksSolved = 0
+        self.__Turns = 0
+        self.__PendingDifficulty = None  # (difficulty card, card choice that drew it)
+        self.__PendingChallengeCheck = False
+        self.__EndCause = None
+
+    def GetDeck(self):
+        return self.__Deck
+
+    def GetHand(self):
+        return self.__Hand
+
+    def GetSequence(self):
+        return self.__Sequence
+
+    def GetDiscard(self):
+        return self.__Discard
+
+    def GetRng(self):
+        return self.__Rng
+
+    def GetLocks(self):
+        return self.__Locks
+
+    def GetScore(self):
+        return self.__Score
+
+    def SetScore(self, NewScore):
+        self.__Score = NewScore
+
+    def GetCurrentLock(self):
+        return self.__CurrentLock
+
+    def GetCurrentLockIndex(self):
+        return self.__CurrentLockIndex
+
+    def SetCurrentLock(self, NewLock, Index=None):
+        self.__CurrentLock = NewLock
+        self.__CurrentLockIndex = Index
+
+    def GetNumLocksSolved(self):
+        return self.__NumLocksSolved
+
+    def SetNumLocksSolved(self, NewValue):
+        self.__NumLocksSolved = NewValue
+
+    def GetTurns(self):
+        return self.__Turns
+
+    def SetTurns(self, NewValue):
+        self.__Turns = NewValue
+
+    def GetGameOver(self):
+        return self.__GameOver
+
+    def EndGame(self, Cause=END_TURN_LIMIT):
+        self.__GameOver = True
+        self.__EndCause = Cause
+
+    def GetEndCause(self):
+        return self.__EndCause
+
+    def GetDifficultyPending(self):
+        return self.__PendingDifficulty is not None
+
+    def GetPendingDifficulty(self):
+        return self.__PendingDifficulty
+
+    def GetPendingChallengeCheck(self):
+        """True while a played card waits on a difficulty card before the lock is checked"""
+        return self.__PendingChallengeCheck
+
+    def SetPendingDifficulty(self, CurrentCard, CardChoice):
+        """restore a game waiting on a difficulty card, which should already be on the discard pile"""
+        self.__PendingDifficulty = (CurrentCard, CardChoice)
+
+    def GetCopy(self, Rng=None):
+        """an independent game in the same position for searching ahead, cards are shared as they never change -
+        give it its own Rng so the copy doesn't draw from (or reveal) this game's random stream"""
+        Copy = GameState(self.__Locks, Rng)
+        Copy.__Deck = self.__Deck.GetCopy()
+        Copy.__Hand = self.__Hand.GetCopy()
+        Copy.__Sequence = self.__Sequence.GetCopy()
+        Copy.__Discard = self.__Discard.GetCopy()
+        Copy.__Score = self.__Score
+        Copy.__GameOver = self.__GameOver
+        Copy.__CurrentLock = self.__CurrentLock.GetCopy()
+        Copy.__CurrentLockIndex = self.__CurrentLockIndex
+        Copy.__NumLocksSolved = self.__NumLocksSolved
+        Copy.__Turns = self.__Turns
+        Copy.__PendingDifficulty = self.__PendingDifficulty
+        Copy.__PendingChallengeCheck = self.__PendingChallengeCheck
+        Copy.__EndCause = self.__EndCause
+        return Copy
+
+    def SetupStandardGame(self, DeckComposition=STANDARD_DECK, DifficultyCards=DIFFICULTY_CARDS):
+        self.__CreateStandardDeck(DeckComposition)
+        self.__Deck.Shuffle(self.__Rng)
+        for Count in range(HAND_SIZE):
+            self.__MoveCard(self.__Deck, self.__Hand, 0)  # move five cards from the deck to the hand
+            self.__AddDifficultyCardsToDeck(DifficultyCards)
+            self.__Deck.Shuffle(self.__Rng)
+            self.ChooseRandomLock()
+
+    def ChooseRandomLock(self):
+        """start a round on a fresh copy of a random lock, so the locks themselves are never marked as met"""
+        Index = self.__Rng.randrange(len(self.__Locks))
+        self.__CurrentLock = self.__Locks[Index].GetFreshCopy()
+        self.__CurrentLockIndex = Index
+        return self.__CurrentLock
+
+    def CheckIfLockChallengeMet(self):
+        NumberOfCards = self.__Sequence.GetNumberOfCards()
+        Tail = tuple(self.__Sequence.GetCardDescriptionAt(Count) for Count in range(max(0, NumberOfCards - 3), NumberOfCards))
+        for Length in range(1, len(Tail) + 1):  # the last card, then the last two, then the last three
+            if self.__CurrentLock.CheckIfCardsMet(Tail[len(Tail) - Length:]):
+                return True
+        return False
+
+    def GetLegalActions(self):
+        if self.__GameOver:
+            return []
+        if self.__PendingDifficulty is not None:
+            Actions = [Action(LOSE_KEY, Pos) for Pos in range(self.__Hand.GetNumberOfCards())
+                       if CARD_TOOL_TYPES[self.__Hand.GetCardCodeAt(Pos)] == "K"]
+            Actions.append(Action(DISCARD_FIVE))
+            return Actions
+        Actions = []
+        for CardChoice in range(1, self.__Hand.GetNumberOfCards() + 1):
+            if self.__CanPlayCard(CardChoice):  # playing a card of the same tool type does nothing, so isn't offered
+                Actions.append(Action(PLAY_CARD, CardChoice))
+            Actions.append(Action(DISCARD_CARD, CardChoice))
+        return Actions
+
+    def GetDifficultyAction(self, Choice):
+        """translate a typed response to a difficulty card into the action DifficultyCard.Process would take"""
+        CurrentCard, CardChoice = self.__PendingDifficulty
+        Pos = CurrentCard.GetKeyPosition(Choice, CardChoice)
+        if Pos is not None and Pos < self.__Hand.GetNumberOfCards() and CARD_TOOL_TYPES[self.__Hand.GetCardCodeAt(Pos)] == "K":
+            return Action(LOSE_KEY, Pos)
+        return Action(DISCARD_FIVE)
+
+    def Apply(self, Move):
+        """apply an action to the game and return a list of the EVENT_ codes it caused"""
+        Events = []
+        if self.__PendingDifficulty is not None:
+            self.__ResolveDifficulty(Move, Events)
+        elif Move.Kind == PLAY_CARD:
+            self.__PlayCardToSequence(Move.Position, Events)
+        elif Move.Kind == DISCARD_CARD:
+            self.__MoveCard(self.__Hand, self.__Discard, Move.Position - 1)  # move the card to the discard pile
+            self.__GetCardFromDeck(Move.Position, Events)
+        else:
+            raise ValueError(f'{Move.Kind} is not a valid action without a pending difficulty card')
+        if self.__PendingDifficulty is None:
+            self.__EndTurn(Events)
+        return Events
+
+    def __EndTurn(self, Events):
+        if self.__PendingChallengeCheck:
+            self.__PendingChallengeCheck = False
+            if self.CheckIfLockChallengeMet():
+                Events.append(EVENT_CHALLENGE_MET)
+                self.__Score += 5
+        self.__Turns += 1
+        if self.__CurrentLock.GetLockSolved():
+            self.__ProcessLockSolved()
+            Events.append(EVENT_LOCK_SOLVED)
+            if self.__Deck.GetNumberOfCards() == 0:
+                self.EndGame(END_DECK_EMPTY)
+            else:  # recycling the discard pile can rescue a game the refill had ended
+                self.__GameOver = False
+                self.__EndCause = None
+        if self.__GameOver:
+            Events.append(EVENT_GAME_OVER)
+        else:
+            self.CheckIfLockChallengeMet()  # the sequence is checked again before every turn
+
+    def __ProcessLockSolved(self):
+        self.__Score += 10
+        while self.__Discard.GetNumberOfCards() > 0:
+            self.__MoveCard(self.__Discard, self.__Deck, 0)  # add all discarded cards back to deck
+        self.__Deck.Shuffle(self.__Rng)
+        self.ChooseRandomLock()
+        self.__NumLocksSolved += 1
+
+    def __CanPlayCard(self, CardChoice):
+        if self.__Sequence.GetNumberOfCards() == 0:
+            return True
+        return CARD_TOOL_TYPES[self.__Hand.GetCardCodeAt(CardChoice - 1)] != CARD_TOOL_TYPES[self.__Sequence.GetCardCodeAt(-1)]
+
+    def __PlayCardToSequence(self, CardChoice, Events):
+        if self.__CanPlayCard(CardChoice):
+            self.__Score += self.__MoveCard(self.__Hand, self.__Sequence, CardChoice - 1)
+            self.__GetCardFromDeck(CardChoice, Events)
+        self.__PendingChallengeCheck = True  # checked once any difficulty card has been dealt with
+
+    def __GetCardFromDeck(self, CardChoice, Events):
+        if self.__Deck.GetNumberOfCards() > 0:
+            if self.__Deck.GetCardCodeAt(0) == DIFFICULTY_CODE:  # see if new card is a difficulty card
+                CurrentCard = self.__Deck.PopCardAt(0)  # get and remove the difficulty card from deck
+                self.__Discard.AddCard(CurrentCard)
+                self.__PendingDifficulty = (CurrentCard, CardChoice)
+                Events.append(EVENT_DIFFICULTY)
+                return
+        self.__RefillHand(Events)
+
+    def __ResolveDifficulty(self, Move, Events):
+        CurrentCard, CardChoice = self.__PendingDifficulty
+        if Move.Kind == LOSE_KEY:
+            CurrentCard.LoseKey(self.__Hand, self.__Discard, Move.Position)
+        elif Move.Kind == DISCARD_FIVE:
+            CurrentCard.DiscardFromDeck(self.__Deck, self.__Discard)
+        else:
+            raise ValueError(f'{Move.Kind} does not resolve a difficulty card')
+        self.__PendingDifficulty = None
+        self.__RefillHand(Events, END_DIFFICULTY if self.__Deck.GetNumberOfCards() == 0 else END_DECK_EMPTY)
+
+    def __RefillHand(self, Events, Cause=END_DECK_EMPTY):
+        while self.__Hand.GetNumberOfCards() < HAND_SIZE and self.__Deck.GetNumberOfCards() > 0:
+            if self.__Deck.GetCardCodeAt(0) == DIFFICULTY_CODE:
+                self.__MoveCard(self.__Deck, self.__Discard, 0)
+                Events.append(EVENT_DIFFICULTY_DISCARDED)
+            else:
+                self.__MoveCard(self.__Deck, self.__Hand, 0)
+        if self.__Deck.GetNumberOfCards() == 0 and self.__Hand.GetNumberOfCards() < HAND_SIZE:  # if there wasn't enough cards to refill the hand
+            self.EndGame(Cause)
+
+    def __AddDifficultyCardsToDeck(self, DifficultyCards):
+        for Count in range(DifficultyCards):
+            self.__Deck.AddCard(DifficultyCard())
+
+    def __CreateStandardDeck(self, DeckComposition):
+        for Copies, Cards in DeckComposition:
+            for Count in range(Copies):
+                for ToolType, Kit in Cards:
+                    self.__Deck.AddCard(ToolCard(ToolType, Kit))
+
+    def __MoveCard(self, FromCollection, ToCollection, Pos):
+        CardToMove = FromCollection.MoveCardAt(Pos, ToCollection)
+        if FromCollection.GetName() == "HAND" and ToCollection.GetName() == "SEQUENCE":
+            return CardToMove.GetScore()  # only cards played to the sequence are scored
+        return 0
+
+
+class Agent(metaclass=abc.ABCMeta):  # anything that can choose moves for a GameState
+
+    def __init__(self, Rng=None):
+        self._Rng = Rng or random.Random()
+
+    @abc.abstractmethod
+    def ChooseAction(self, State, LegalActions): pass
+
+
+class RandomAgent(Agent):
+    def ChooseAction(self, State, LegalActions):
+        return LegalActions[self._Rng.randrange(len(LegalActions))]
+
+
+class GreedyAgent(Agent):  # plays whenever it can, otherwise discards the cheapest card
+    def ChooseAction(self, State, LegalActions):
+        Best = LegalActions[0]
+        BestValue = None
+        Hand = State.GetHand()
+        for Move in LegalActions:
+            if Move.Kind == PLAY_CARD:
+                Value = 10 + Hand.GetCards()[Move.Position - 1].GetScore()
+            elif Move.Kind == DISCARD_CARD:
+                Value = -Hand.GetCards()[Move.Position - 1].GetScore()
+            elif Move.Kind == DISCARD_FIVE:
+                Value = 0
+            else:  # losing a key costs the points it would have scored
+                Value = -3
+            if BestValue is None or Value > BestValue:
+                Best, BestValue = Move, Value
+        return Best
+
+
+def ParseLockTemplate(LineFromFile):
+    return LockTemplate(C.split(",") for C in LineFromFile.split(";"))
+
+
+def ParseLock(LineFromFile):
+    return Lock(ParseLockTemplate(LineFromFile))
+
+
+def LoadLockLines(FileName="assets/locks.txt"):
+    LockLines = []
+    with open(FileName) as f:
+        LineFromFile = f.readline().rstrip()
+        while LineFromFile != "":
+            LockLines.append(LineFromFile)
+            LineFromFile = f.readline().rstrip()
+    return LockLines
+
+
+def LoadLocks(FileName="assets/locks.txt"):
+    return [ParseLock(LineFromFile) for LineFromFile in LoadLockLines(FileName)]
+
+
+def HashLocks(Locks):
+    """8 byte fingerprint of the locks' conditions, players with the same fingerprint deal the same games"""
+    Hash = hashlib.sha1()
+    for ThisLock in Locks:
+        Hash.update(";".join(",".join(C.GetCondition()) for C in ThisLock.GetChallenges()).encode("utf-8") + b"\n")
+    return Hash.digest()[:8]
+
+
+def PlayHeadlessGame(State, Player, MaxTurns=10000):
+    """let an agent play a game through to the end, returns the final state"""
+    while not State.GetGameOver():
+        if State.GetTurns() >= MaxTurns:
+            State.EndGame(END_TURN_LIMIT)
+        else:
+            State.Apply(Player.ChooseAction(State, State.GetLegalActions()))
+    return State
+
+
+def Main(Args):
+    NumGames = int(Args[0]) if len(Args) > 0 else 1000
+    StartTime = time.perf_counter()
+    TotalScore = 0
+    Locks = LoadLocks()  # every game plays fresh copies, so they can be shared
+    for Count in range(NumGames):
+        State = GameState(Locks)
+        State.SetupStandardGame()
+        TotalScore += PlayHeadlessGame(State, RandomAgent()).GetScore()
+    Elapsed = time.perf_counter() - StartTime
+    print(f'{NumGames} games in {Elapsed:.2f}s ({NumGames / Elapsed:.1f} games/second), mean score {TotalScore / NumGames:.2f}')
+
+
+class Challenge():
+    __slots__ = ("_Met", "_Condition")  # a set is made for every lock played
+
+    def __init__(self):
+        self._Met = False
+        self._Condition = []
+
+    def GetMet(self):
+        return self._Met
+
+    def GetCondition(self):
+        return self._Condition
+
+    def SetMet(self, NewValue):
+        self._Met = NewValue
+
+    def SetCondition(self, NewCondition):
+        self._Condition = NewCondition
+
+class LockTemplate():  # a lock's conditions parsed and indexed once, shared by every copy of the lock
+    __slots__ = ("_Conditions", "_Matcher")
+
+    def __init__(self, Conditions):
+        self._Conditions = tuple(tuple(sys.intern(D) for D in C) for C in Conditions)
+        Matcher = {}  # tuple of card descriptions -> positions of the challenges with that condition, in order
+        for Pos, C in enumerate(self._Conditions):
+            Matcher.setdefault(C, []).append(Pos)
+        self._Matcher = {C: tuple(Positions) for C, Positions in Matcher.items()}
+
+    def GetConditions(self):
+        return self._Conditions
+
+    def GetMatcher(self):
+        return self._Matcher
+
+    def GetFreshCopy(self):
+        return Lock(self)
+
+class Lock():
+    def __init__(self, Template=None):
+        self._Template = Template
+        self._Challenges = []
+        self._Matcher = {}
+        if Template is not None:
+            self._Matcher = Template.GetMatcher()  # shared until a challenge is added
+            for Condition in Template.GetConditions():
+                C = Challenge()
+                C.SetCondition(Condition)
+                self._Challenges.append(C)
+
+    def AddChallenge(self, Condition):
+        if self._Template is not None:
+            self._Matcher = {Key: list(Positions) for Key, Positions in self._Matcher.items()}
+            self._Template = None
+        C = Challenge()
+        C.SetCondition(Condition)
+        self._Challenges.append(C)
+        self._Matcher.setdefault(tuple(Condition), []).append(len(self._Challenges) - 1)
+
+    def GetTemplate(self):
+        if self._Template is None:
+            self._Template = LockTemplate(C.GetCondition() for C in self._Challenges)
+            self._Matcher = self._Template.GetMatcher()
+        return self._Template
+
+    def GetFreshCopy(self):
+        """the same challenges with none of them met"""
+        return Lock(self.GetTemplate())
+
+    def GetCopy(self):
+        """the same challenges with the same ones met"""
+        Copy = Lock(self.GetTemplate())
+        for Pos, C in enumerate(self._Challenges):
+            if C.GetMet():
+                Copy.SetChallengeMet(Pos, True)
+        return Copy
+
+    def __ConvertConditionToString(self, C):
+        ConditionAsString = ""
+        for Pos in range(0, len(C) - 1):
+            ConditionAsString += C[Pos] + ", "
+        ConditionAsString += C[len(C) - 1]
+        return ConditionAsString
+
+    def GetLockDetails(self):
+        LockDetails = "\n" + "CURRENT LOCK" + "\n" + "------------" + "\n"
+        for C in self._Challenges:
+            if C.GetMet():
+                LockDetails += "Challenge met: "
+            else:
+                LockDetails += "Not met:       "
+            LockDetails += self.__ConvertConditionToString(C.GetCondition()) + "\n"
+        LockDetails += "\n"
+        return LockDetails
+
+    def GetChallenges(self):
+        return self._Challenges
+
+    def GetLockSolved(self):
+        for C in self._Challenges:
+            if not C.GetMet():
+                return False
+        return True
+
+    def CheckIfConditionMet(self, Sequence):
+        return self.CheckIfCardsMet(tuple(Sequence.split(", ")))
+
+    def CheckIfCardsMet(self, Descriptions):
+        """mark the first unmet challenge whose condition is exactly these card descriptions"""
+        for Pos in self._Matcher.get(Descriptions, ()):
+            C = self._Challenges[Pos]
+            if not C.GetMet():
+                C.SetMet(True)
+                return True
+        return False
+
+    def SetChallengeMet(self, Pos, Value):
+        self._Challenges[Pos].SetMet(Value)
+
+    def GetChallengeMet(self, Pos):
+        return self._Challenges[Pos].GetMet()
+
+    def GetNumberOfChallenges(self):
+        return len(self._Challenges)
+
+class Card():
+    __slots__ = ("_CardNumber",)  # cards are created in bulk by simulations, so no per-instance dict
+    _NextCardNumber = 0
+
+    def __init__(self):
+        self._CardNumber = Card._NextCardNumber
+        Card._NextCardNumber += 1
+
+    def GetScore(self):
+        return 0
+
+    def GetCode(self):
+        return None
+
+    def Process(self, Deck, Discard, Hand, Sequence, CurrentLock, Choice, CardChoice):
+        pass
+
+    def GetCardNumber(self):
+        return self._CardNumber
+
+    def GetDescription(self):
+        if self._CardNumber < 10:
+            return " " + str(self._CardNumber)
+        else:
+            return str(self._CardNumber)
+
+class ToolCard(Card):  # inheritance
+    __slots__ = ("_Code",)  # tool type and kit are encoded as a small int, see GetToolCardCode
+
+    def __init__(self, *args):
+        self._Code = GetToolCardCode(args[0], args[1])
+        if len(args) == 2:
+            super(ToolCard, self).__init__()  # instantaite rest as normal card
+        elif len(args) == 3:
+            self._CardNumber = args[2]
+            Card._NextCardNumber = max(Card._NextCardNumber, args[2] + 1)  # so new cards can't reuse it
+
+    def GetScore(self):
+        return CARD_SCORES[self._Code]
+
+    def GetCode(self):
+        return self._Code
+
+    def GetDescription(self):
+        return CARD_DESCRIPTIONS[self._Code]
+
+class DifficultyCard(Card):
+    __slots__ = ()
+
+    def __init__(self, *args):
+        if len(args) == 0:
+            super(DifficultyCard, self).__init__()
+        elif len(args) == 1:
+            self._CardNumber = args[0]
+            Card._NextCardNumber = max(Card._NextCardNumber, args[0] + 1)
+
+    def GetCode(self):
+        return DIFFICULTY_CODE
+
+    def GetDescription(self):
+        return CARD_DESCRIPTIONS[DIFFICULTY_CODE]
+
+    def GetKeyPosition(self, Choice, CardChoice):
+        """hand position of the key chosen to be lost (after the played card left the hand), or None"""
+        ChoiceAsInteger = None
+        try:
+            ChoiceAsInteger = int(Choice)
+        except ValueError:
+            pass
+        if ChoiceAsInteger is not None:
+            if ChoiceAsInteger >= 1 and ChoiceAsInteger <= 5:
+                if ChoiceAsInteger >= CardChoice:
+                    ChoiceAsInteger -= 1
+                if ChoiceAsInteger > 0:
+                    ChoiceAsInteger -= 1
+                return ChoiceAsInteger
+        return None
+
+    def LoseKey(self, Hand, Discard, Pos):
+        Hand.MoveCardAt(Pos, Discard)
+
+    def DiscardFromDeck(self, Deck, Discard):
+        Count = 0
+        while Count < 5 and Deck.GetNumberOfCards() > 0:
+            Deck.MoveCardAt(0, Discard)
+            Count += 1
+
+    def Process(self, Deck, Discard, Hand, Sequence, CurrentLock, Choice, CardChoice):
+        Pos = self.GetKeyPosition(Choice, CardChoice)
+        if Pos is not None and CARD_TOOL_TYPES[Hand.GetCardCodeAt(Pos)] == "K":
+            self.LoseKey(Hand, Discard, Pos)
+            return
+        self.DiscardFromDeck(Deck, Discard)
+
+class CardCollection():  # card numbers are assumed to be unique within a game
+    def __init__(self, N):
+        self._Name = N
+        self._Cards = []
+        self._Positions = {}  # card number -> position in _Cards, offset by _Base
+        self._Base = 0  # lets cards be taken from the front without renumbering the rest
+        self._Version = 0  # bumped by every change, so the display knows when it is stale
+        self._DisplayVersion = -1
+        self._Display = ""
+        self._DisplayRows = []  # rendered full rows of CARDS_PER_LINE cards, kept while cards are only added
+
+    def GetName(self):
+        return self._Name
+
+    def GetCardNumberAt(self, X):
+        return self._Cards[X].GetCardNumber()
+
+    def GetCardDescriptionAt(self, X):
+        return self._Cards[X].GetDescription()
+
+    def GetCardCodeAt(self, X):
+        return self._Cards[X].GetCode()
+
+    def GetPositionOf(self, CardNumber):
+        Pos = self._Positions.get(CardNumber)
+        if Pos is None:
+            return None
+        return Pos - self._Base
+
+    def AddCard(self, C):
+        self._Positions[C.GetCardNumber()] = len(self._Cards) + self._Base
+        self._Cards.append(C)
+        self._Version += 1
+
+    def PopCardAt(self, X):
+        if X < 0:
+            X += len(self._Cards)
+        CardToGet = self._Cards.pop(X)
+        del self._Positions[CardToGet.GetCardNumber()]
+        self._Version += 1
+        del self._DisplayRows[X // CARDS_PER_LINE:]
+        if X < len(self._Cards) - X:  # renumber whichever side of the gap is shorter
+            for Pos in range(X):
+                self._Positions[self._Cards[Pos].GetCardNumber()] += 1
+            self._Base += 1
+        else:
+            for Pos in range(X, len(self._Cards)):
+                self._Positions[self._Cards[Pos].GetCardNumber()] -= 1
+        return CardToGet
+
+    def MoveCardAt(self, X, ToCollection):
+        CardToMove = self.PopCardAt(X)
+        ToCollection.AddCard(CardToMove)
+        return CardToMove
+
+    def __Reindex(self):
+        self._Base = 0
+        self._Positions = {C.GetCardNumber(): Pos for Pos, C in enumerate(self._Cards)}
+
+    def GetCards(self):
+        return self._Cards
+
+    def GetCopy(self):
+        Copy = CardCollection(self._Name)
+        Copy._Cards = list(self._Cards)
+        Copy.__Reindex()
+        return Copy
+
+    def GetNumberOfCards(self):
+        return len(self._Cards)
+
+    def Shuffle(self, Rng=random):
+        Rng.shuffle(self._Cards)  # Fisher-Yates, one swap per card
+        self.__Reindex()
+        self._Version += 1
+        self._DisplayRows = []
+
+    def RemoveCard(self, CardNumber):
+        Pos = self.GetPositionOf(CardNumber)
+        if Pos is None:
+            return None
+        return self.PopCardAt(Pos)
+
+    def __CreateLineOfDashes(self, Size):
+        return "------" * Size
+
+    def __RenderRow(self, Start, End):
+        Cells = "".join(["| " + self._Cards[Pos].GetDescription() + " " for Pos in range(Start, End)])
+        return Cells + "|" + "\n" + self.__CreateLineOfDashes(End - Start) + "\n"
+
+    def GetCardDisplay(self):
+        if self._DisplayVersion == self._Version:
+            return self._Display
+        if len(self._Cards) == 0:
+            CardDisplay = "\n" + self._Name + ":" + " empty" + "\n" + "\n"
+        else:
+            FullRows = len(self._Cards) // CARDS_PER_LINE
+            for Row in range(len(self._DisplayRows), FullRows):  # only rows that gained or changed cards are rendered
+                self._DisplayRows.append(self.__RenderRow(Row * CARDS_PER_LINE, (Row + 1) * CARDS_PER_LINE))
+            Parts = ["\n" + self._Name + ":" + "\n" + "\n", self.__CreateLineOfDashes(min(len(self._Cards), CARDS_PER_LINE)) + "\n"]
+            Parts.extend(self._DisplayRows)
+            if len(self._Cards) % CARDS_PER_LINE > 0:
+                Parts.append(self.__RenderRow(FullRows * CARDS_PER_LINE, len(self._Cards)))
+            CardDisplay = "".join(Parts)
+        self._Display = CardDisplay
+        self._DisplayVersion = self._Version
+        return CardDisplay
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
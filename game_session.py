@@ -2,6 +2,7 @@
 from networking.server import *
 from networking.client import *
 from networking.standards import *
+from networking.metrics import metricsFromEnvironment
 import threading
 import abc
 from networking.player_state import PlayerState
@@ -39,23 +40,39 @@ class GameSession(metaclass=abc.ABCMeta):  # common to both the host and cient
 
 class ClientSession(GameSession):
 
-    def __init__(self, name, host_ip):
+    def __init__(self, name, host_ip, lobby=None):
         super().__init__(name, "CLIENT")
-        self._client = BreakthroughClient(name, host_ip)
+        self._client = BreakthroughClient(name, host_ip, lobby, metricsFromEnvironment())
+        self._lobbyId = lobby
         self._clientThread = threading.Thread(target=self._client.connect, daemon=True).start()
 
     def updatePlayerState(self, new_score, new_ls):
-        self._client.playerScore = new_score
-        self._client.playerLocksSolved = new_ls
+        self._client.updatePlayerState(new_score, new_ls)  # pushed to the host only if it changed
 
     def waitForGameToStart(self):  # continually 'wait'
         self._client.connected.wait()
         self._client.requestData(CLIENT_SDATA_REQUEST)
         self._client.recvdObjFromServer.wait()
+        if self._lobbyId is not None:  # a dedicated server waits for the lobby owner to start it
+            self._lobby()
         self._client.gameStarted.wait()
 
+    def _lobby(self):
+        while not self._client.gameStarted.is_set():
+            self.displayLobby()
+            cmd = input("\r(r)efresh lobby, (s)tart game (lobby owner only), (w)ait for the owner:>").upper()
+            if cmd == "S": self.reportEvent(SERVER_START_GAME)
+            elif cmd == "W": return
+            if cmd in ("R", "S"): self._client.gameStarted.wait(0.5)  # for the server's reply
+
     def getStartingData(self) -> {}:
         #assert("HAND" in self._client._ObjFromServer.keys() and "DECK" in self._client._ObjFromServer.keys())
+        return self._client._objFromServer  # just a seed ("SEED" key) if the host dealt from one
+
+    def requestFullStartingData(self) -> {}:  # when we can't deal the host's game from its seed
+        self._client.recvdObjFromServer.clear()
+        self._client.requestData(CLIENT_FULL_SDATA_REQUEST)
+        self._client.recvdObjFromServer.wait()
         return self._client._objFromServer
 
     def displayLobby(self):
@@ -64,10 +81,10 @@ class ClientSession(GameSession):
 
     def displayStats(self):
         print("---------CURRENT SCORES---------")
-        self._client.requestData(CLIENT_STATS_REQUEST)
+        print(self._client.scoreboard.formatScores())
 
     def reportEvent(self, event: str):
-        self._client.messageHost(event)
+        self._client.reportEvent(event)
 
     def leaveSession(self):
         self._client.disconnectHost()
@@ -75,12 +92,14 @@ class ClientSession(GameSession):
 
 class HostSession(GameSession):
 
-    def __init__(self, name, hand, deck, locks):
+    def __init__(self, name, hand, deck, locks, starting_seed=None):
         super().__init__(name, "HOST")
-        self._server = BreakthroughHost(name)
+        self._server = BreakthroughHost(name, metrics=metricsFromEnvironment())
         self._serverThread = threading.Thread(target=self._server.listenForClients, daemon=True)
         self._serverThread.start()
         self._server.uploadStartingData(hand, deck, locks)
+        if starting_seed is not None:  # (ruleset version, lock fingerprint, seed)
+            self._server.uploadStartingSeed(*starting_seed)
         self._waitForInput = True
         self._lobby()
 
@@ -94,8 +113,7 @@ class HostSession(GameSession):
 
     def displayStats(self):
         print("---------CURRENT SCORES---------")
-        #self._server.issueStatsRequest()
-        threading.Thread(target=self._server.issueStatsRequest).start()
+        print(self._server.scoreboard.formatScores())
 
     def reportEvent(self, event: int):
         self._server.handleClientEvent(self._name, event)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# lock catalogue - a lock file parsed once into read-only locks that games take fresh copies of,
+# optionally cached on disk and, for very large generated files, loaded a lock at a time
+import array
+import collections
+import hashlib
+import marshal
+import os
+from engine import *
+
+CACHE_VERSION = 1
+
+
+class LockCatalogue():
+    """a sequence of locks for GameState - treat them as read-only, GameState plays fresh copies"""
+
+    def __init__(self, FileName="assets/locks.txt", Lazy=False, CacheDir=None, HashContents=False, CacheSize=1024):
+        self._FileName = FileName
+        self._Lazy = Lazy
+        self._CacheDir = CacheDir
+        self._HashContents = HashContents  # key the disk cache on the file's contents instead of its size and mtime
+        self._CacheSize = CacheSize
+        self._Locks = []
+        self._Offsets = array.array("Q")  # lazy: where each lock's line starts in the file
+        self._Recent = collections.OrderedDict()  # lazy: index -> lock, least recently used first
+        self._File = None
+        self._Hash = None
+        Cached = self.__ReadCache()
+        if Cached is not None:
+            self.__Restore(Cached)
+        elif Lazy:
+            self.__IndexFile()
+            self.__WriteCache(self._Offsets.tobytes())
+        else:
+            Conditions = [ParseLockTemplate(Line).GetConditions() for Line in LoadLockLines(FileName)]
+            self._Locks = [Lock(LockTemplate(C)) for C in Conditions]
+            self.__WriteCache(Conditions)
+
+    def __len__(self):
+        return len(self._Offsets) if self._Lazy else len(self._Locks)
+
+    def __getitem__(self, Index):
+        if not self._Lazy:
+            return self._Locks[Index]
+        if Index < 0:
+            Index += len(self._Offsets)
+        if not 0 <= Index < len(self._Offsets):
+            raise IndexError("lock index out of range")
+        ThisLock = self._Recent.get(Index)
+        if ThisLock is not None:
+            self._Recent.move_to_end(Index)
+            return ThisLock
+        if self._File is None:
+            self._File = open(self._FileName, "rb")
+        self._File.seek(self._Offsets[Index])
+        ThisLock = ParseLock(self._File.readline().decode("utf-8").rstrip())
+        self._Recent[Index] = ThisLock
+        if len(self._Recent) > self._CacheSize:
+            self._Recent.popitem(last=False)
+        return ThisLock
+
+    def __iter__(self):
+        for Index in range(len(self)):
+            yield self[Index]
+
+    def GetHash(self):
+        """HashLocks of the whole catalogue, worked out once"""
+        if self._Hash is None:
+            self._Hash = HashLocks(self)
+        return self._Hash
+
+    def __getstate__(self):  # the open file can't be pickled, it is reopened when needed
+        State = self.__dict__.copy()
+        State["_File"] = None
+        return State
+
+    def Close(self):
+        if self._File is not None:
+            self._File.close()
+            self._File = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *Args):
+        self.Close()
+
+    def __IndexFile(self):
+        """record where each line starts, stopping at the first blank line like LoadLockLines"""
+        Offset = 0
+        with open(self._FileName, "rb") as f:
+            for LineFromFile in f:
+                if LineFromFile.rstrip() == b"":
+                    break
+                self._Offsets.append(Offset)
+                Offset += len(LineFromFile)
+
+    def __GetCacheKey(self):
+        Info = os.stat(self._FileName)
+        Key = hashlib.sha1(f'{os.path.abspath(self._FileName)}|{self._Lazy}'.encode("utf-8"))
+        if self._HashContents:
+            with open(self._FileName, "rb") as f:
+                for Block in iter(lambda: f.read(1 << 20), b""):
+                    Key.update(Block)
+        else:
+            Key.update(f'|{Info.st_size}|{Info.st_mtime_ns}'.encode("utf-8"))
+        return Key.hexdigest()
+
+    def __GetCachePath(self):
+        return os.path.join(self._CacheDir, "locks-" + self.__GetCacheKey() + ".cache")
+
+    def __ReadCache(self):
+        if self._CacheDir is None:
+            return None
+        try:
+            with open(self.__GetCachePath(), "rb") as f:
+                Version, Contents = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):  # missing or unreadable caches are rebuilt
+            return None
+        return Contents if Version == CACHE_VERSION else None
+
+    def __WriteCache(self, Contents):
+        if self._CacheDir is None:
+            return
+        try:
+            os.makedirs(self._CacheDir, exist_ok=True)
+            CachePath = self.__GetCachePath()
+            with open(CachePath + ".tmp", "wb") as f:
+                marshal.dump((CACHE_VERSION, Contents), f)
+            os.replace(CachePath + ".tmp", CachePath)  # readers never see half a cache
+        except OSError:
+            pass  # the cache is only an optimisation
+
+    def __Restore(self, Contents):
+        if self._Lazy:
+            self._Offsets.frombytes(Contents)
+        else:
+            self._Locks = [Lock(LockTemplate(C)) for C in Contents]
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# monte carlo tree search player - every playout deals the unseen deck in a random order (a determinization)
+# and searches from there, with statistics shared through a transposition table keyed on what the player can see
+import argparse
+import math
+import random
+import sys
+import time
+from engine import *
+
+
+def GetPositionKey(State):
+    """compact hash of the position as far as the moves go: hand (as a multiset), the last three sequence
+    cards, the current lock and its progress, deck size and any pending difficulty card"""
+    Hand = State.GetHand()
+    Sequence = State.GetSequence()
+    NumberOfCards = Sequence.GetNumberOfCards()
+    MetMask = 0
+    for Pos, C in enumerate(State.GetCurrentLock().GetChallenges()):
+        if C.GetMet():
+            MetMask |= 1 << Pos
+    return hash((State.GetDifficultyPending(),
+                 tuple(sorted(Hand.GetCardCodeAt(Pos) for Pos in range(Hand.GetNumberOfCards()))),
+                 tuple(Sequence.GetCardCodeAt(Pos) for Pos in range(max(0, NumberOfCards - 3), NumberOfCards)),
+                 State.GetCurrentLockIndex(), MetMask, State.GetDeck().GetNumberOfCards(), State.GetNumLocksSolved()))
+
+
+def GetMoveKey(State, Move):
+    """moves are told apart by the card they use rather than its position, so they mean the same thing in
+    every determinization and every transposition"""
+    if Move.Kind == DISCARD_FIVE:
+        return (DISCARD_FIVE, -1)
+    if Move.Kind == LOSE_KEY:
+        return (LOSE_KEY, State.GetHand().GetCardCodeAt(Move.Position))
+    return (Move.Kind, State.GetHand().GetCardCodeAt(Move.Position - 1))
+
+
+def DescribeAction(Move):
+    if Move.Kind == PLAY_CARD:
+        return f'play card {Move.Position}'
+    if Move.Kind == DISCARD_CARD:
+        return f'discard card {Move.Position}'
+    if Move.Kind == LOSE_KEY:
+        return f'lose the key at position {Move.Position + 1}'
+    return "discard five cards from the deck"
+
+
+class SearchNode():
+    __slots__ = ("Visits", "Edges")
+
+    def __init__(self):
+        self.Visits = 0
+        self.Edges = {}  # move key -> [visits, total reward, times the move was available]
+
+
+class MCTSAgent(Agent):
+    """information set MCTS: searches for Playouts playouts or TimeLimit seconds per move, whichever
+    runs out first, rolling out with a greedy policy for up to Horizon turns and scoring the points gained"""
+
+    def __init__(self, Rng=None, Playouts=400, TimeLimit=None, Horizon=30, Exploration=0.7, RewardScale=50.0,
+                 MaxNodes=200000, RolloutRandomness=0.2):
+        super().__init__(Rng)
+        self._Playouts = Playouts
+        self._TimeLimit = TimeLimit
+        self._Horizon = Horizon
+        self._Exploration = Exploration
+        self._RewardScale = RewardScale  # points that count as a reward of 1
+        self._MaxNodes = MaxNodes
+        self._RolloutRandomness = RolloutRandomness  # chance a rollout move is random instead of greedy
+        self._RolloutAgent = GreedyAgent(self._Rng)
+        self._Table = {}  # position key -> SearchNode, kept between moves of a game
+        self._LastSearch = {}
+
+    def ChooseAction(self, State, LegalActions):
+        if len(LegalActions) == 1:
+            self._LastSearch = {}
+            return LegalActions[0]
+        Root = self.Search(State)
+        Best, BestVisits = LegalActions[0], -1
+        for Move in LegalActions:
+            Edge = Root.Edges.get(GetMoveKey(State, Move))
+            if Edge is not None and Edge[0] > BestVisits:
+                Best, BestVisits = Move, Edge[0]
+        return Best
+
+    def GetLastSearch(self):
+        """playouts, seconds, playouts per second and table size of the last search"""
+        return dict(self._LastSearch)
+
+    def GetHint(self, State):
+        """the move the search would make, with its playout rate, for showing a player"""
+        Move = self.ChooseAction(State, State.GetLegalActions())
+        Stats = self._LastSearch
+        if Stats.get("playouts", 0) == 0:
+            return f'Suggested move: {DescribeAction(Move)}'
+        return f'Suggested move: {DescribeAction(Move)} ({Stats["playouts"]} playouts, {Stats["playouts_per_second"]:.0f}/s)'
+
+    def Search(self, State):
+        if len(self._Table) > self._MaxNodes:
+            self._Table.clear()  # start again rather than grow without bound
+        RootKey = GetPositionKey(State)
+        Root = self._Table.get(RootKey)
+        if Root is None:
+            Root = self._Table[RootKey] = SearchNode()
+        StartTime = time.perf_counter()
+        Deadline = None if self._TimeLimit is None else StartTime + self._TimeLimit
+        Playouts = 0
+        while Playouts < self._Playouts and (Deadline is None or time.perf_counter() < Deadline):
+            self.__Playout(State, Root)
+            Playouts += 1
+        Elapsed = time.perf_counter() - StartTime
+        self._LastSearch = {"playouts": Playouts, "seconds": Elapsed, "nodes": len(self._Table),
+                            "playouts_per_second": Playouts / Elapsed if Elapsed > 0 else 0.0}
+        return Root
+
+    def __Playout(self, State, Root):
+        Sim = State.GetCopy(random.Random(self._Rng.getrandbits(64)))
+        Sim.GetDeck().Shuffle(Sim.GetRng())  # deal the unseen deck one way it might be
+        StartScore = Sim.GetScore()
+        Path = []
+        Node = Root
+        Turns = 0
+        while Node is not None and not Sim.GetGameOver() and Turns < self._Horizon:
+            Key, Move = self.__Select(Sim, Node)
+            Sim.Apply(Move)
+            Path.append((Node, Key))
+            Turns += 1
+            NextKey = GetPositionKey(Sim)
+            Node = self._Table.get(NextKey)
+            if Node is None:  # a new position: add it, then roll out from it
+                if len(self._Table) < self._MaxNodes:
+                    self._Table[NextKey] = SearchNode()
+                break
+        while not Sim.GetGameOver() and Turns < self._Horizon:
+            Sim.Apply(self.__RolloutMove(Sim))
+            Turns += 1
+        Reward = (Sim.GetScore() - StartScore) / self._RewardScale
+        for Node, Key in Path:
+            Node.Visits += 1
+            Edge = Node.Edges[Key]
+            Edge[0] += 1
+            Edge[1] += Reward
+
+    def __Select(self, Sim, Node):
+        """(move key, action) to follow from Node - untried moves first, then by UCB over the moves legal
+        in this determinization, counting only the playouts where each was available"""
+        Moves = {}
+        for Move in Sim.GetLegalActions():
+            Moves.setdefault(GetMoveKey(Sim, Move), Move)
+        Untried = []
+        for Key in Moves:
+            Edge = Node.Edges.get(Key)
+            if Edge is None:
+                Edge = Node.Edges[Key] = [0, 0.0, 0]
+            Edge[2] += 1
+            if Edge[0] == 0:
+                Untried.append(Key)
+        if len(Untried) > 0:
+            Key = Untried[self._Rng.randrange(len(Untried))]
+            return Key, Moves[Key]
+        Best, BestValue = None, None
+        for Key in Moves:
+            Visits, Total, Available = Node.Edges[Key]
+            Value = Total / Visits + self._Exploration * math.sqrt(math.log(Available) / Visits)
+            if BestValue is None or Value > BestValue:
+                Best, BestValue = Key, Value
+        return Best, Moves[Best]
+
+    def __RolloutMove(self, Sim):
+        LegalActions = Sim.GetLegalActions()
+        if self._Rng.random() < self._RolloutRandomness:
+            return LegalActions[self._Rng.randrange(len(LegalActions))]
+        return self._RolloutAgent.ChooseAction(Sim, LegalActions)
+
+
+def Main(Args):
+    Parser = argparse.ArgumentParser(description="Play seeded headless games with the MCTS player.")
+    Parser.add_argument("games", type=int, nargs="?", default=10)
+    Parser.add_argument("--seed", type=int, default=0)
+    Parser.add_argument("--playouts", type=int, default=400, help="playouts per move")
+    Parser.add_argument("--time", type=float, default=None, help="seconds per move, whichever runs out first")
+    Parser.add_argument("--horizon", type=int, default=30, help="turns a playout looks ahead")
+    Options = Parser.parse_args(Args)
+
+    Locks = LoadLocks()
+    TotalScore, TotalPlayouts, TotalSeconds = 0, 0, 0.0
+    for Seed in range(Options.seed, Options.seed + Options.games):
+        State = GameState(Locks, random.Random(Seed))
+        State.SetupStandardGame()
+        Player = MCTSAgent(random.Random(f'agent-{Seed}'), Options.playouts, Options.time, Options.horizon)
+        while not State.GetGameOver():
+            State.Apply(Player.ChooseAction(State, State.GetLegalActions()))
+            Stats = Player.GetLastSearch()
+            TotalPlayouts += Stats.get("playouts", 0)
+            TotalSeconds += Stats.get("seconds", 0.0)
+        TotalScore += State.GetScore()
+        print(f'seed {Seed}: score {State.GetScore()}, locks solved {State.GetNumLocksSolved()}, turns {State.GetTurns()}')
+    print(f'mean score {TotalScore / Options.games:.2f}, {TotalPlayouts / TotalSeconds if TotalSeconds > 0 else 0:.0f} playouts/second')
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
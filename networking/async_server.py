@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# dedicated asyncio server - many independent lobbies multiplexed over one listening socket, each
+# connection is a task rather than a thread, and clients name the lobby to join in their hello
+import argparse
+import asyncio
+import random
+import struct
+import sys
+from dataclasses import dataclass, field
+from networking.standards import *
+from networking.framing import *
+from networking.server import BreakthroughHost, packStartingData
+from networking.scoreboard import *
+from networking.wire import *
+from networking.metrics import NULL_METRICS, startMetrics
+from engine import GameState, RULESET_VERSION
+from lock_catalogue import LockCatalogue
+
+
+@dataclass
+class LobbyClient:
+    name: str
+    writer: asyncio.StreamWriter
+    address: (str, int)
+    playerState: dict = field(default_factory=lambda: {'score': 0, 'locksSolved': 0})
+    lastHeard: float = 0.0  # loop time of the last frame from them
+
+
+class Lobby:
+    """one game session: its players, the starting data they all share and the lobby owner, who is
+    the first to join and the only player who can start the game"""
+
+    def __init__(self, lobby_id, starting_data, seed_data=None, slow_client_policy=SLOW_CLIENT_DISCONNECT,
+                 outbound_limit=OUTBOUND_LIMIT):
+        self.lobbyId = lobby_id
+        self._slowClientPolicy = slow_client_policy
+        self._outboundLimit = outbound_limit
+        self._startingData = starting_data
+        self._seedData = seed_data
+        self._clients = {}
+        self._owner = None
+        self._started = False
+        self._pendingStates = {}  # name -> future resolved by the player's next state
+        self._tasks = set()
+        self._scoreboard = Scoreboard()
+        self._scoreboardFlush = None  # handle of the scheduled broadcast, changes until then are coalesced
+
+    @property
+    def clientCount(self) -> int:
+        return len(self._clients)
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    def join(self, client: LobbyClient) -> bool:
+        if client.name in self._clients or self._started:
+            return False
+        self._clients[client.name] = client
+        if self._owner is None:
+            self._owner = client.name
+        self.__updateScoreboard(client.name, client.playerState)
+        self.send(client, MSG_SCOREBOARD, self._scoreboard.encodeAll())
+        self.submitMsgToAll(f'PLAYER: {client.name} has joined lobby {self.lobbyId}')
+        return True
+
+    def leave(self, name, reason="Disconnection"):
+        if self._clients.pop(name, None) is None:
+            return
+        pending = self._pendingStates.pop(name, None)
+        if pending is not None and not pending.done():
+            pending.cancel()
+        if self._owner == name:
+            self._owner = next(iter(self._clients), None)  # ownership passes to the longest connected player
+        self._scoreboard.remove(name)
+        self.__scheduleScoreboardFlush()
+        self.submitMsgToAll(f'PLAYER: {name} has been disconnected ({reason})')
+
+    def send(self, client: LobbyClient, msg_type, payload=b'', flags=0):
+        """queue a frame for one client - a client with more than the outbound limit still waiting to go
+        out is disconnected or misses the frame, as the slow client policy says"""
+        if client.writer.is_closing():  # dropped already, it leaves once its reader notices
+            return
+        waiting = client.writer.transport.get_write_buffer_size()
+        if waiting > 0 and waiting + len(payload) > self._outboundLimit:
+            if self._slowClientPolicy == SLOW_CLIENT_DISCONNECT:
+                client.writer.transport.abort()  # its reader sees the end of the stream and it leaves the lobby
+            return
+        writeFrame(client.writer, msg_type, payload, flags)
+
+    def submitMsgToAll(self, message: str):
+        payload = message.encode(ENCODING_STD)
+        for client in self._clients.values():
+            self.send(client, MSG_TEXT, payload)
+
+    def submitCommandToAll(self, code: int):
+        payload = bytes((code,))
+        for client in self._clients.values():
+            self.send(client, MSG_COMMAND, payload)
+
+    async def handleFrame(self, client: LobbyClient, msg_type, flags, payload):
+        request_id, payload = splitRequestId(flags, payload)
+        if msg_type == MSG_COMMAND:
+            if len(payload) != 1:
+                raise ProtocolError(f"command payload of {len(payload)} bytes")
+            await self.__processCommand(client, payload[0])
+        elif msg_type == MSG_STATE_UPDATE:  # pushed, or a reply to a stats request
+            client.playerState = decodeStateUpdate(payload)
+            self.__updateScoreboard(client.name, client.playerState)
+            pending = self._pendingStates.pop(client.name, None)
+            if pending is not None and not pending.done():
+                pending.set_result(client.playerState)
+        elif msg_type == MSG_TEXT:
+            self.submitMsgToAll(f'{client.name}: {str(payload, ENCODING_STD)}')
+
+    def __updateScoreboard(self, name, state):
+        if self._scoreboard.update(name, state):
+            self.__scheduleScoreboardFlush()
+
+    def __scheduleScoreboardFlush(self):
+        if self._scoreboardFlush is None and self._scoreboard.hasChanges():
+            self._scoreboardFlush = asyncio.get_running_loop().call_later(SCOREBOARD_INTERVAL, self.__flushScoreboard)
+
+    def __flushScoreboard(self):
+        self._scoreboardFlush = None
+        changes = self._scoreboard.takeChanges()
+        if len(changes) > 0:
+            for client in self._clients.values():
+                self.send(client, MSG_SCOREBOARD, changes)
+
+    @property
+    def scoreboard(self) -> Scoreboard:
+        return self._scoreboard
+
+    async def __processCommand(self, client: LobbyClient, code: int):
+        if code == CLIENT_LOBBY_REQUEST:
+            self.send(client, MSG_TEXT, self.getLobbyDisplay().encode(ENCODING_STD))
+        elif code == CLIENT_SDATA_REQUEST and self._seedData is not None:
+            self.send(client, MSG_SEED_DATA, self._seedData)
+        elif code in (CLIENT_SDATA_REQUEST, CLIENT_FULL_SDATA_REQUEST):
+            self.send(client, MSG_STARTING_DATA, self._startingData)
+        elif code == CLIENT_STATS_REQUEST:  # the asker's own state arrives on this connection, so don't wait here
+            task = asyncio.ensure_future(self.__processStatsRequest(client))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif code == SERVER_START_GAME:
+            if client.name != self._owner:
+                self.send(client, MSG_TEXT, f'Only the lobby owner ({self._owner}) can start the game'.encode(ENCODING_STD))
+            elif not self._started:
+                self._started = True
+                self.submitCommandToAll(SERVER_START_GAME)
+        elif code == CLIENT_LOST_GAME:
+            self.submitMsgToAll(f'{client.name} is now out of the game.')
+        elif code == CLIENT_WON_GAME:
+            self.submitMsgToAll(f'{client.name} has won the game!')
+
+    async def __processStatsRequest(self, client: LobbyClient):
+        stats_msg = await self.collectStats()
+        if client.name in self._clients:
+            self.send(client, MSG_TEXT, stats_msg.encode(ENCODING_STD))
+
+    async def collectStats(self, timeout=STATS_TIMEOUT) -> str:
+        """ask every player for their state, players who don't answer in time show their last known state"""
+        loop = asyncio.get_running_loop()
+        waiting = []
+        for name, client in self._clients.items():
+            pending = self._pendingStates.get(name)
+            if pending is None or pending.done():
+                pending = self._pendingStates[name] = loop.create_future()
+                self.send(client, MSG_COMMAND, bytes((SERVER_PS_REQUEST,)))
+            waiting.append(pending)
+        if len(waiting) > 0:
+            await asyncio.wait(waiting, timeout=timeout)
+        stats_msg = ''
+        for client in self._clients.values():
+            stats_msg += BreakthroughHost.formatPlayerState(client.name, client.playerState)
+        return stats_msg
+
+    def getLobbyDisplay(self) -> str:
+        msg = f'------------ Players in lobby {self.lobbyId} --------------\n'
+        for client in self._clients.values():
+            msg += "USERNAME: " + client.name + ("  (owner)" if client.name == self._owner else "") + "\n"
+            msg += "ADDRESS: " + str(client.address) + "\n"
+        msg += "--------------------------------------------\n"
+        return msg
+
+
+class AsyncBreakthroughServer:
+    def __init__(self, host="0.0.0.0", port=9999, locks_file="assets/locks.txt", seed=None, metrics=NULL_METRICS,
+                 slow_client_policy=SLOW_CLIENT_DISCONNECT, outbound_limit=OUTBOUND_LIMIT):
+        self._host = host
+        self._port = port
+        self._locks = LockCatalogue(locks_file)  # read-only, so every lobby shares it
+        self._rng = random.Random(seed)
+        self._lobbies = {}
+        self._server = None
+        self._slowClientPolicy = slow_client_policy
+        self._outboundLimit = outbound_limit
+        self._metrics = metrics
+        metrics.gauge("lobbies", lambda: self.lobbyCount)
+        metrics.gauge("active_clients", lambda: self.clientCount)
+
+    @property
+    def port(self) -> int:
+        return self._port
+
+    @property
+    def lobbyCount(self) -> int:
+        return len(self._lobbies)
+
+    @property
+    def clientCount(self) -> int:
+        return sum(lobby.clientCount for lobby in self._lobbies.values())
+
+    def getLobby(self, lobby_id) -> Lobby:
+        """the lobby with this id, dealing a new game for it if it doesn't exist yet"""
+        lobby = self._lobbies.get(lobby_id)
+        if lobby is None:
+            seed = self._rng.getrandbits(64)
+            state = GameState(self._locks, random.Random(seed))
+            state.SetupStandardGame()
+            starting_data = encodeStartingData(packStartingData(state.GetHand(), state.GetDeck(), self._locks))
+            seed_data = encodeSeedData(RULESET_VERSION, self._locks.GetHash(), seed)
+            lobby = self._lobbies[lobby_id] = Lobby(lobby_id, starting_data, seed_data,
+                                                         self._slowClientPolicy, self._outboundLimit)
+        return lobby
+
+    async def start(self):
+        self._server = await asyncio.start_server(self.__handleConnection, self._host, self._port)
+        self._port = self._server.sockets[0].getsockname()[1]  # in case port 0 asked for any free port
+        print(f'Serving lobbies on: {(self._host, self._port)}')
+
+    async def serveForever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def __handleConnection(self, reader, writer):
+        address = writer.get_extra_info("peername")
+        lobby, name, keep_alive = None, None, None
+        try:
+            frame = await asyncio.wait_for(readFrameAsync(reader), HANDSHAKE_TIMEOUT)
+            if frame is None or frame[0] != MSG_HELLO:
+                return
+            self._metrics.countFrame("in", frame[0], frame[2])
+            lobby_id, name = decodeHello(frame[1], frame[2])
+            lobby = self.getLobby(lobby_id)
+            client = LobbyClient(name, writer, address, lastHeard=asyncio.get_running_loop().time())
+            if not lobby.join(client):
+                writeFrame(writer, MSG_TEXT, f'Could not join lobby {lobby_id} as {name}'.encode(ENCODING_STD))
+                await writer.drain()
+                lobby = None
+                return
+            keep_alive = asyncio.ensure_future(self.__keepAlive(client))
+            while True:
+                frame = await readFrameAsync(reader)
+                if frame is None:
+                    break
+                client.lastHeard = asyncio.get_running_loop().time()
+                started = self._metrics.now()
+                self._metrics.countFrame("in", frame[0], frame[2])
+                await lobby.handleFrame(client, *frame)
+                await writer.drain()
+                self._metrics.observeFrame("handler_seconds", frame[0], frame[2], started)
+        except (OSError, ProtocolError, IndexError, ValueError, struct.error, asyncio.TimeoutError):  # disconnected, silent or sent garbage
+            pass
+        finally:
+            if keep_alive is not None:
+                keep_alive.cancel()
+            if lobby is not None:
+                lobby.leave(name)
+                if lobby.clientCount == 0:
+                    self._lobbies.pop(lobby.lobbyId, None)
+            writer.close()
+
+
+    @staticmethod
+    async def __keepAlive(client: LobbyClient):
+        """heartbeat the client, and close the connection once it has been silent for IDLE_TIMEOUT - its
+        reader then sees the end of the stream and the client leaves the lobby"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            if loop.time() - client.lastHeard > IDLE_TIMEOUT:
+                client.writer.close()
+                return
+            writeFrame(client.writer, MSG_HEARTBEAT)
+
+
+def Main(args):
+    parser = argparse.ArgumentParser(description="Host many Breakthrough lobbies from one process.")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--locks", default="assets/locks.txt", help="lock file every lobby deals from")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--slow-clients", choices=[SLOW_CLIENT_DISCONNECT, SLOW_CLIENT_DROP], default=SLOW_CLIENT_DISCONNECT,
+                        help="what to do with a client that falls more than --outbound-limit bytes behind")
+    parser.add_argument("--outbound-limit", type=int, default=OUTBOUND_LIMIT)
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve metrics over http on this local port")
+    parser.add_argument("--metrics-log", type=float, default=None, help="print metrics every this many seconds")
+    options = parser.parse_args(args)
+    metrics = startMetrics(options.metrics_port, options.metrics_log)
+    server = AsyncBreakthroughServer(options.host, options.port, options.locks, options.seed, metrics,
+                                     options.slow_clients, options.outbound_limit)
+    try:
+        asyncio.run(server.serveForever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
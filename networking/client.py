@@ -1,25 +1,44 @@
 #!/usr/bin/env python3
+import collections
+import selectors
 import socket
 from networking.standards import *
-import time
-import pickle
+from networking.framing import *
+import struct
 import threading
+import time
 from networking.player_state import PlayerState
+from networking.scoreboard import *
+from networking.wire import *
+from networking.metrics import NULL_METRICS
 
 
 class BreakthroughClient:
-    def __init__(self, client_name, host_ip):
+    def __init__(self, client_name, host_ip, lobby=None, metrics=NULL_METRICS):
         self._clientName = client_name
+        self._lobby = lobby  # only dedicated servers have more than one lobby
         self._clientActive = False
         self._port = 9999
+        if ":" in host_ip:  # host:port, for a dedicated server
+            host_ip, port = host_ip.rsplit(":", 1)
+            self._port = int(port)
         self._clientSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # TCP socket
         self._host_ip = host_ip
         self._hostAddress = (self._host_ip, self._port)
         self._playerState = {'score': 0, 'locksSolved': 0}
         self._objFromServer = {}
+        self._scoreboard = Scoreboard()  # kept up to date by the host's broadcasts
+        self._outbound = collections.deque()  # encoded frames waiting for the I/O loop to send them
+        self._outboundMutex = threading.Lock()
+        self._wakeReceiver, self._wakeSender = socket.socketpair()  # wakes the I/O loop when there is more to send
+        self._wakeReceiver.setblocking(False)
+        self._wakeSender.setblocking(False)
         self.connected = threading.Event()
         self.gameStarted = threading.Event()
         self.recvdObjFromServer = threading.Event()
+        self._metrics = metrics
+        metrics.gauge("outbound_frames", lambda: len(self._outbound))
+        metrics.gauge("threads", threading.active_count)
 
     @property
     def port(self) -> int:
@@ -32,7 +51,7 @@ class BreakthroughClient:
     @clientActive.setter
     def clientActive(self, value):
         self._clientActive = value
-        if not value: self._clientSocket.close()
+        if not value: self.__wakeIOLoop()  # the I/O loop closes the socket as it finishes
 
     @property
     def playerScore(self) -> int:
@@ -52,8 +71,33 @@ class BreakthroughClient:
         if value < 0 or value > 100: return
         self._playerState['locksSolved'] = value
 
+    @property
+    def scoreboard(self) -> Scoreboard:
+        return self._scoreboard
+
+    def updatePlayerState(self, score, locks_solved):
+        """set both at once and push them to the host if either changed"""
+        old_state = dict(self._playerState)
+        self.playerScore = score
+        self.playerLocksSolved = locks_solved
+        if self._playerState != old_state and self.connected.is_set():
+            self.__send(MSG_STATE_UPDATE, encodeStateUpdate(self._playerState['score'], self._playerState['locksSolved']))
+
+    def __send(self, msg_type, payload, flags=0):
+        """queue a frame for the I/O loop, never blocks the caller on the network"""
+        with self._outboundMutex:
+            self._outbound.append(encodeFrame(msg_type, payload, flags))
+        self._metrics.countFrame("out", msg_type, payload)
+        self.__wakeIOLoop()
+
+    def __wakeIOLoop(self):
+        try:
+            self._wakeSender.send(b'\0')
+        except (BlockingIOError, OSError):  # already has a wake up pending, or the loop has finished
+            pass
+
     def disconnectHost(self):
-        self._clientSocket.close()
+        self.clientActive = False
 
     def switchHost(self, new_ip, new_port):
         self._host_ip = new_ip
@@ -64,76 +108,146 @@ class BreakthroughClient:
         print("client attempting connection")
         self._clientActive = True
         self._clientSocket.connect((self._hostAddress))
-        self._clientSocket.send(bytes((f'{len(self._clientName):<{HEADER_SIZE}}' + self._clientName), "utf-8"))
-        time.sleep(0.2)
+        self._clientSocket.setblocking(False)
+        self._clientSocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # frames are coalesced here instead
+        flags, hello = encodeHello(self._clientName, self._lobby)
+        with self._outboundMutex:
+            self._outbound.appendleft(encodeFrame(MSG_HELLO, hello, flags))  # always the first frame sent
+        self._metrics.countFrame("out", MSG_HELLO, hello)
         self.connected.set()
-        time.sleep(0.2) # avoid mixing packets
-        self.__handleServerStreamData()
-
-    def __checkHeaderDecodeBit(self, flag) -> bool:
-        pass
-
-    def __handleServerStreamData(self):
-        new_message  = True
-        decode_bytes = True
-        message_data = ''
-        message_bytes = b''
-        while self._clientActive:
-            if self._clientSocket:
-                try:
-                    packet = self._clientSocket.recv(PACKET_SIZE)
-                    if len(packet) > 0:
-                        if new_message:
-                            payload_size = int(packet[:PAYLOAD_WIDTH])
-                            new_message = False
-                            if str(SERVER_SEND_PICKLE) in str(packet[PAYLOAD_WIDTH:HEADER_SIZE]):
-                                decode_bytes = False
-                                self.recvdObjFromServer.clear()
-
-                        if decode_bytes:
-                            message_data += packet.decode(ENCODING_STD)
-                            if len(message_data) - HEADER_SIZE >= payload_size:
-                                self.__processServerMessage(message_data[HEADER_SIZE:])
-                                message_data = ''
-                                new_message = True
-                        else:
-                            message_bytes += packet
-                            if len(message_bytes) + 1 - HEADER_SIZE >= payload_size:
-                                self._objFromServer = pickle.loads(message_bytes[HEADER_SIZE + 1:])
-                                self.recvdObjFromServer.set()
-                                message_bytes = b''
-                                new_message = True
-                                decode_bytes = True  # by default
-
-                except ConnectionAbortedError or ConnectionResetError:
-                    self.connected.reset()
-                    return
+        self.__runIOLoop()
+
+    def __runIOLoop(self):
+        """the only place the socket is used: reads whatever has arrived and sends whatever is queued,
+        sending heartbeats while there is nothing else to send and giving up on a host gone silent"""
+        reader = FrameReader(self._clientSocket)
+        selector = selectors.DefaultSelector()
+        selector.register(self._clientSocket, selectors.EVENT_READ)
+        selector.register(self._wakeReceiver, selectors.EVENT_READ)
+        watching = selectors.EVENT_READ
+        last_heard = last_sent = time.monotonic()
+        try:
+            while self._clientActive:
+                wanted = selectors.EVENT_READ | (selectors.EVENT_WRITE if len(self._outbound) > 0 else 0)
+                if wanted != watching:
+                    selector.modify(self._clientSocket, wanted)
+                    watching = wanted
+                ready = selector.select(HEARTBEAT_INTERVAL / 2)
+                now = time.monotonic()
+                for key, events in ready:
+                    if key.fileobj is self._wakeReceiver:
+                        self.__drainWakeups()
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        self.__flushOutbound()
+                        last_sent = now
+                    if events & selectors.EVENT_READ:
+                        if not reader.receive():  # the host closed the connection
+                            self._clientActive = False
+                            break
+                        last_heard = now
+                        frame = reader.nextFrame()
+                        while frame is not None:
+                            self.__processFrame(*frame)
+                            frame = reader.nextFrame()
+                if now - last_heard > IDLE_TIMEOUT:
+                    print("host has stopped responding")
+                    break
+                if now - last_sent >= HEARTBEAT_INTERVAL and len(self._outbound) == 0:
+                    with self._outboundMutex:
+                        self._outbound.append(encodeFrame(MSG_HEARTBEAT))
+                    self._metrics.countFrame("out", MSG_HEARTBEAT, b'')
+                    last_sent = now
+        except (OSError, struct.error):
+            pass
+        except ProtocolError as error:  # the host sent garbage, stop talking to it
+            print(f"disconnecting from host: {error}")
+        finally:
+            selector.close()
+            self._clientActive = False
+            self._clientSocket.close()
+            self.connected.clear()
+
+    def __drainWakeups(self):
+        try:
+            while self._wakeReceiver.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def __flushOutbound(self):
+        """send as much of the queue as the socket will take in one call, keeping any unsent remainder"""
+        with self._outboundMutex:
+            if len(self._outbound) == 0:
+                return
+            if len(self._outbound) == 1:
+                data = self._outbound.popleft()
+            else:  # coalesce queued frames into one send
+                parts, size = [], 0
+                while len(self._outbound) > 0 and size < RECV_BUFFER_SIZE:
+                    parts.append(self._outbound.popleft())
+                    size += len(parts[-1])
+                data = b''.join(parts)
+        try:
+            sent = self._clientSocket.send(data)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        if sent < len(data):  # a partial send, the rest goes first next time
+            with self._outboundMutex:
+                self._outbound.appendleft(memoryview(data)[sent:])
+
+    def __processFrame(self, msg_type, flags, payload):
+        started = self._metrics.now()
+        self._metrics.countFrame("in", msg_type, payload)
+        request_id, payload = splitRequestId(flags, payload)
+        if msg_type == MSG_COMMAND:
+            if len(payload) != 1:
+                raise ProtocolError(f"command payload of {len(payload)} bytes")
+            self.__processServerCommand(payload[0], request_id)
+        elif msg_type == MSG_STARTING_DATA:
+            self._objFromServer = decodeStartingData(payload)
+            self._metrics.observeFrame("decode_seconds", msg_type, payload, started)
+            self.recvdObjFromServer.set()
+        elif msg_type == MSG_SEED_DATA:
+            self._objFromServer = decodeSeedData(payload)
+            self._metrics.observeFrame("decode_seconds", msg_type, payload, started)
+            self.recvdObjFromServer.set()
+        elif msg_type == MSG_SCOREBOARD:
+            try:
+                self._scoreboard.applyChanges(payload)
+            except UnicodeDecodeError as error:
+                raise ProtocolError("scoreboard name is not utf-8") from error
+            self._metrics.observeFrame("decode_seconds", msg_type, payload, started)
+        elif msg_type == MSG_TEXT:
+            try:
+                message = str(payload, ENCODING_STD)
+            except UnicodeDecodeError as error:
+                raise ProtocolError("text is not utf-8") from error
+            self.__processServerMessage(message)
+        self._metrics.observeFrame("handler_seconds", msg_type, payload, started)
+
+    def __processServerCommand(self, request_code: int, request_id=None):
+        if request_code == SERVER_PS_REQUEST:
+            self.sendPlayerState(request_id)
+        elif request_code == SERVER_START_GAME:
+            print("starting game!")
+            self.gameStarted.set()
+        if request_code == CLIENT_WON_GAME:  # end the game in some way?
+            self._clientActive = False
 
     def __processServerMessage(self, message: str):
-        if len(message) == 1: # it is a set command
-            request_code = int(message)
-            if request_code == SERVER_PS_REQUEST:
-                self.sendPlayerState()
-            elif request_code == SERVER_START_GAME:
-                print("starting game!")
-                self.gameStarted.set()
-            if request_code == CLIENT_WON_GAME:  # end the game in some way?
-                self._clientActive = False
-        else:
-            pass
-            print("\nFROM SERVER: \n" + message)
+        print("\nFROM SERVER: \n" + message)
 
-    def sendPlayerState(self):
-        if self._clientActive and self._clientSocket:
-            msg = pickle.dumps(self._playerState)
-            msg = bytes(f'{len(msg):<{HEADER_SIZE}}', ENCODING_STD) + msg
-            self._clientSocket.send(msg)
+    def sendPlayerState(self, request_id=None):
+        if self._clientActive:
+            flags, msg = withRequestId(request_id, encodeStateUpdate(self._playerState['score'], self._playerState['locksSolved']))
+            self.__send(MSG_STATE_UPDATE, msg, flags)
 
     def messageHost(self, message):
-        self._clientSocket.send(bytes((f'{len(message):<{HEADER_SIZE}}' + message), "utf-8"))
+        self.__send(MSG_TEXT, message.encode(ENCODING_STD))
 
     def reportEvent(self, event: int):
-        self._clientSocket.send(bytes((f'{len(str(event)):<{HEADER_SIZE}}' + str(bit)), "utf-8"))
+        self.__send(MSG_COMMAND, bytes((event,)))
 
     def requestData(self, bit: int) -> str:
-        self._clientSocket.send(bytes((f'{len(str(bit)):<{HEADER_SIZE}}' + str(bit)), "utf-8"))
+        self.__send(MSG_COMMAND, bytes((bit,)))
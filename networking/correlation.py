@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# request/response correlation - a request sent to several players gets an id, their replies carry
+# it back, and whoever asked waits on a future that completes when everyone has answered or time runs out
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+
+class PendingRequest:
+    def __init__(self, request_id, expected, deadline):
+        self.requestId = request_id
+        self.deadline = deadline
+        self.results = {}  # name -> reply, only the players who answered in time
+        self.future = Future()  # result is the results dict, possibly partial
+        self._expected = set(expected)
+
+    @property
+    def missing(self) -> set:
+        return set(self._expected)
+
+    def _complete(self):
+        if not self.future.done():
+            self.future.set_result(self.results)
+
+
+class RequestTracker:
+    """open requests keyed by id, one daemon thread expires them so nothing busy-waits or hangs on a
+    player who never answers"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._deadlines = []  # heap of (deadline, request id)
+        self._mutex = threading.Lock()
+        self._wakeup = threading.Condition(self._mutex)
+        self._reaper = None
+
+    def open(self, expected, timeout) -> PendingRequest:
+        with self._mutex:
+            request = PendingRequest(next(self._ids) & 0xFFFFFFFF, expected, time.monotonic() + timeout)
+            if len(request.missing) == 0:
+                request._complete()
+                return request
+            self._pending[request.requestId] = request
+            heapq.heappush(self._deadlines, (request.deadline, request.requestId))
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self.__expireRequests, daemon=True)
+                self._reaper.start()
+            self._wakeup.notify()
+        return request
+
+    def resolve(self, request_id, name, reply) -> bool:
+        """record a player's reply, False if the request has already finished or didn't ask them"""
+        with self._mutex:
+            request = self._pending.get(request_id)
+            if request is None or name not in request._expected:
+                return False
+            request.results[name] = reply
+            request._expected.discard(name)
+            if len(request._expected) == 0:
+                del self._pending[request_id]
+            else:
+                request = None
+        if request is not None:
+            request._complete()  # outside the lock, callbacks may send
+        return True
+
+    def forget(self, name):
+        """a player has left, stop waiting for them on every open request"""
+        finished = []
+        with self._mutex:
+            for request_id, request in list(self._pending.items()):
+                request._expected.discard(name)
+                if len(request._expected) == 0:
+                    del self._pending[request_id]
+                    finished.append(request)
+        for request in finished:
+            request._complete()
+
+    def __expireRequests(self):
+        while True:
+            expired = []
+            with self._mutex:
+                while len(self._deadlines) > 0 and self._deadlines[0][0] <= time.monotonic():
+                    deadline, request_id = heapq.heappop(self._deadlines)
+                    if request_id in self._pending:
+                        expired.append(self._pending.pop(request_id))
+                if len(expired) == 0:
+                    self._wakeup.wait(self._deadlines[0][0] - time.monotonic() if len(self._deadlines) > 0 else None)
+            for request in expired:
+                request._complete()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# length-prefixed framing shared by the client and the server - frames are read with recv_into
+# straight into one preallocated buffer and handed out as memoryview slices of it
+import asyncio
+import socket
+import struct
+from networking.standards import *
+
+FRAME_HEADER = struct.Struct(FRAME_HEADER_FORMAT)
+REQUEST_ID = struct.Struct("!I")
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def sendFrame(sock, msg_type: int, payload=b'', flags=0):
+    header = FRAME_HEADER.pack(msg_type, flags, len(payload))
+    if len(payload) < 1024:
+        sock.sendall(header + payload)  # one small copy beats a second syscall
+        return
+    sent = sock.sendmsg([header, payload])  # header and payload leave in one syscall without joining them
+    total = len(header) + len(payload)
+    if sent < total:  # interrupted part way, send whatever is left
+        data = memoryview(payload)
+        if sent < len(header):
+            sock.sendall(header[sent:])
+            sent = len(header)
+        sock.sendall(data[sent - len(header):])
+
+
+def encodeFrame(msg_type: int, payload=b'', flags=0) -> bytes:
+    return FRAME_HEADER.pack(msg_type, flags, len(payload)) + payload
+
+
+def encodeHello(name: str, lobby=None):
+    """(flags, payload) of a hello frame, naming the lobby to join on a dedicated server"""
+    if lobby is None:
+        return 0, name.encode(ENCODING_STD)
+    return HELLO_HAS_LOBBY, (lobby + LOBBY_SEPARATOR + name).encode(ENCODING_STD)
+
+
+def decodeHello(flags, payload):
+    """(lobby, name) from a hello frame, lobby is DEFAULT_LOBBY if the client didn't name one"""
+    text = str(payload, ENCODING_STD)
+    if flags & HELLO_HAS_LOBBY:
+        lobby, separator, name = text.partition(LOBBY_SEPARATOR)
+        if separator == "":
+            raise ProtocolError("hello frame is missing the lobby separator")
+        return lobby or DEFAULT_LOBBY, name
+    return DEFAULT_LOBBY, text
+
+
+def sendText(sock, message: str):
+    sendFrame(sock, MSG_TEXT, message.encode(ENCODING_STD))
+
+
+def sendCommand(sock, code: int, request_id=None):
+    if request_id is None:
+        sendFrame(sock, MSG_COMMAND, bytes((code,)))
+    else:
+        sendFrame(sock, MSG_COMMAND, REQUEST_ID.pack(request_id) + bytes((code,)), FRAME_HAS_REQUEST_ID)
+
+
+def splitRequestId(flags, payload):
+    """(request id or None, rest of the payload) of a frame"""
+    if not flags & FRAME_HAS_REQUEST_ID:
+        return None, payload
+    if len(payload) < REQUEST_ID.size:
+        raise ProtocolError("frame is too short for its request id")
+    return REQUEST_ID.unpack_from(payload)[0], payload[REQUEST_ID.size:]
+
+
+def withRequestId(request_id, payload):
+    """(flags, payload) to send a reply to request_id, which may be None"""
+    if request_id is None:
+        return 0, payload
+    return FRAME_HAS_REQUEST_ID, REQUEST_ID.pack(request_id) + payload
+
+
+class FrameReader:
+    """reads whole frames from a socket, a frame's payload is a memoryview that is only valid until
+    the next call to readFrame - decode or copy it before then"""
+
+    def __init__(self, sock, buffer_size=RECV_BUFFER_SIZE):
+        self._sock = sock
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # unread bytes are self._buffer[self._start:self._end]
+        self._end = 0
+
+    def readFrame(self):
+        """(type, flags, payload) of the next frame, or None once the other end has closed the connection"""
+        if not self.__fill(FRAME_HEADER.size):
+            return None
+        msg_type, flags, length = FRAME_HEADER.unpack_from(self._buffer, self._start)
+        if length > MAX_FRAME_SIZE:
+            raise ProtocolError(f'frame of {length} bytes is larger than {MAX_FRAME_SIZE}')
+        if not self.__fill(FRAME_HEADER.size + length):
+            return None
+        payload_start = self._start + FRAME_HEADER.size
+        self._start = payload_start + length
+        return msg_type, flags, self._view[payload_start:self._start]
+
+    def receive(self) -> bool:
+        """one recv_into for a non-blocking socket, False once the other end has closed the connection -
+        then take the frames that have arrived with nextFrame"""
+        if self._start == self._end:  # everything has been handed out, start again at the front
+            self._start = self._end = 0
+        elif self._end == len(self._buffer):
+            self.__makeRoom(self._end - self._start + 1)
+        try:
+            received = self._sock.recv_into(self._view[self._end:])
+        except (BlockingIOError, InterruptedError):
+            return True
+        if received == 0:
+            return False
+        self._end += received
+        return True
+
+    def nextFrame(self):
+        """(type, flags, payload) of a frame that has already been received in full, otherwise None"""
+        if self._end - self._start < FRAME_HEADER.size:
+            return None
+        msg_type, flags, length = FRAME_HEADER.unpack_from(self._buffer, self._start)
+        if length > MAX_FRAME_SIZE:
+            raise ProtocolError(f'frame of {length} bytes is larger than {MAX_FRAME_SIZE}')
+        if self._end - self._start < FRAME_HEADER.size + length:
+            if self._start + FRAME_HEADER.size + length > len(self._buffer):
+                self.__makeRoom(FRAME_HEADER.size + length)  # so the rest of it can be received in place
+            return None
+        payload_start = self._start + FRAME_HEADER.size
+        self._start = payload_start + length
+        return msg_type, flags, self._view[payload_start:self._start]
+
+    def __iter__(self):
+        while True:
+            frame = self.readFrame()
+            if frame is None:
+                return
+            yield frame
+
+    def __fill(self, needed) -> bool:
+        """make sure at least needed unread bytes are buffered, False on end of stream"""
+        if self._end - self._start >= needed:
+            return True
+        if self._start + needed > len(self._buffer):
+            self.__makeRoom(needed)
+        while self._end - self._start < needed:
+            received = self._sock.recv_into(self._view[self._end:])
+            if received == 0:
+                if self._end > self._start:
+                    raise ProtocolError("connection closed part way through a frame")
+                return False
+            self._end += received
+        return True
+
+    def __makeRoom(self, needed):
+        unread = self._end - self._start
+        if needed <= len(self._buffer):  # slide the unread bytes to the front
+            self._buffer[:unread] = self._buffer[self._start:self._end]
+        else:  # a frame bigger than the buffer, earlier payload views keep the old buffer alive
+            buffer = bytearray(max(needed, 2 * len(self._buffer)))
+            buffer[:unread] = self._view[self._start:self._end]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        self._start, self._end = 0, unread
+
+
+async def readFrameAsync(reader):
+    """(type, flags, payload) of the next frame from an asyncio StreamReader, or None at end of stream"""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as error:
+        if len(error.partial) > 0:
+            raise ProtocolError("connection closed part way through a frame") from error
+        return None
+    msg_type, flags, length = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f'frame of {length} bytes is larger than {MAX_FRAME_SIZE}')
+    try:
+        payload = await reader.readexactly(length) if length > 0 else b''
+    except asyncio.IncompleteReadError as error:
+        raise ProtocolError("connection closed part way through a frame") from error
+    return msg_type, flags, payload
+
+
+def writeFrame(writer, msg_type: int, payload=b'', flags=0):
+    """queue a frame on an asyncio StreamWriter, await writer.drain() to wait for slow readers"""
+    writer.writelines([FRAME_HEADER.pack(msg_type, flags, len(payload)), payload])
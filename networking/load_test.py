@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# load generator - N bots speaking the client protocol join a host on loopback and send requests at
+# set rates, the latency of every request is recorded and reported per message type
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from networking.standards import *
+from networking.framing import *
+from networking.wire import *
+from networking.server import BreakthroughHost
+from networking.async_server import AsyncBreakthroughServer
+from networking.metrics import Metrics, NULL_METRICS
+from engine import *
+
+# request kind -> (command sent, test for the reply frame)
+REQUESTS = {
+    "lobby": (CLIENT_LOBBY_REQUEST, lambda msg_type, payload: msg_type == MSG_TEXT and b'Players in lobby' in payload[:64]),
+    "seed": (CLIENT_SDATA_REQUEST, lambda msg_type, payload: msg_type in (MSG_SEED_DATA, MSG_STARTING_DATA)),
+    "starting_data": (CLIENT_FULL_SDATA_REQUEST, lambda msg_type, payload: msg_type == MSG_STARTING_DATA),
+    "stats": (CLIENT_STATS_REQUEST, lambda msg_type, payload: msg_type == MSG_TEXT and b'Current Score:' in payload),
+}
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self._samples = {}  # kind -> latencies in seconds
+        self._errors = {}
+
+    def record(self, kind, latency):
+        self._samples.setdefault(kind, []).append(latency)
+
+    def recordError(self, kind):
+        self._errors[kind] = self._errors.get(kind, 0) + 1
+
+    @staticmethod
+    def percentile(ordered, fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if len(ordered) > 0 else 0.0
+
+    def getReport(self, elapsed) -> dict:
+        report = {}
+        for kind in sorted(set(self._samples) | set(self._errors)):
+            ordered = sorted(self._samples.get(kind, []))
+            report[kind] = {"count": len(ordered), "errors": self._errors.get(kind, 0),
+                            "per_second": len(ordered) / elapsed if elapsed > 0 else 0.0,
+                            "p50_ms": 1000 * self.percentile(ordered, 0.50), "p99_ms": 1000 * self.percentile(ordered, 0.99),
+                            "max_ms": 1000 * (ordered[-1] if len(ordered) > 0 else 0.0)}
+        return report
+
+    @staticmethod
+    def formatReport(report, elapsed) -> str:
+        msg = f'{"message":<15}{"count":>8}{"errors":>8}{"per sec":>10}{"p50 ms":>10}{"p99 ms":>10}{"max ms":>10}\n'
+        for kind, row in report.items():
+            msg += f'{kind:<15}{row["count"]:>8}{row["errors"]:>8}{row["per_second"]:>10.1f}{row["p50_ms"]:>10.2f}{row["p99_ms"]:>10.2f}{row["max_ms"]:>10.2f}\n'
+        msg += f'elapsed {elapsed:.2f}s\n'
+        return msg
+
+
+class Bot:
+    """one synthetic player: joins, then sends requests one at a time with random pauses between them,
+    answering the host's player state requests as a real client would"""
+
+    def __init__(self, name, address, lobby, rates, recorder, rng, timeout):
+        self._name = name
+        self._address = address
+        self._lobby = lobby
+        self._rates = rates  # kind -> requests per second, "state" is pushed player state and has no reply
+        self._recorder = recorder
+        self._rng = rng
+        self._timeout = timeout
+        self._score = 0
+        self._waiting = None  # (reply test, future) of the request in flight
+        self._writer = None
+
+    async def run(self, stop_time):
+        host, port = self._address
+        started = time.perf_counter()
+        try:
+            reader, self._writer = await asyncio.open_connection(host, port)
+            flags, hello = encodeHello(self._name, self._lobby)
+            joined = asyncio.get_running_loop().create_future()
+            self._waiting = (lambda msg_type, payload: msg_type == MSG_SCOREBOARD, joined)  # first frame after joining
+            writeFrame(self._writer, MSG_HELLO, hello, flags)
+            read_task = asyncio.ensure_future(self.__readFrames(reader))
+            await asyncio.wait_for(joined, self._timeout)
+        except (OSError, asyncio.TimeoutError, ProtocolError):
+            self._recorder.recordError("join")
+            self.__close()
+            return
+        self._recorder.record("join", time.perf_counter() - started)
+        try:
+            await self.__sendRequests(stop_time)
+        finally:
+            read_task.cancel()
+            self.__close()
+
+    def __close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    async def __sendRequests(self, stop_time):
+        kinds = [kind for kind, rate in self._rates.items() if rate > 0]
+        total_rate = sum(self._rates[kind] for kind in kinds)
+        if total_rate == 0:
+            return
+        weights = [self._rates[kind] / total_rate for kind in kinds]
+        while True:
+            pause = self._rng.expovariate(total_rate)
+            if time.perf_counter() + pause >= stop_time:
+                return
+            await asyncio.sleep(pause)
+            kind = self._rng.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            if kind == "state":
+                self._score += 1
+                writeFrame(self._writer, MSG_STATE_UPDATE, encodeStateUpdate(self._score % 100, 0))
+                await self._writer.drain()
+                self._recorder.record("state", time.perf_counter() - started)
+                continue
+            code, test = REQUESTS[kind]
+            reply = asyncio.get_running_loop().create_future()
+            self._waiting = (test, reply)
+            writeFrame(self._writer, MSG_COMMAND, bytes((code,)))
+            try:
+                await self._writer.drain()
+                await asyncio.wait_for(reply, self._timeout)
+                self._recorder.record(kind, time.perf_counter() - started)
+            except (OSError, asyncio.TimeoutError):
+                self._recorder.recordError(kind)
+                self._waiting = None
+                if self._writer.is_closing():
+                    return
+
+    async def __readFrames(self, reader):
+        try:
+            while True:
+                frame = await readFrameAsync(reader)
+                if frame is None:
+                    return
+                msg_type, flags, payload = frame
+                request_id, payload = splitRequestId(flags, payload)
+                if msg_type == MSG_HEARTBEAT:  # keeps an idle bot from being reaped
+                    writeFrame(self._writer, MSG_HEARTBEAT)
+                elif msg_type == MSG_COMMAND and payload[0] == SERVER_PS_REQUEST:
+                    reply_flags, reply = withRequestId(request_id, encodeStateUpdate(self._score % 100, 0))
+                    writeFrame(self._writer, MSG_STATE_UPDATE, reply, reply_flags)
+                elif self._waiting is not None and self._waiting[0](msg_type, payload):
+                    test, future = self._waiting
+                    self._waiting = None
+                    if not future.done():
+                        future.set_result(payload)
+        except (OSError, ProtocolError):
+            pass
+
+
+def startThreadedHost(host_ip="127.0.0.1", seed=0, metrics=NULL_METRICS):
+    """a BreakthroughHost on any free port with a seeded game to hand out, returns it once it is listening"""
+    locks = LoadLocks()
+    state = GameState(locks, random.Random(seed))
+    state.SetupStandardGame()
+    host = BreakthroughHost("loadtest-host", port=0, host_ip=host_ip, metrics=metrics)
+    host.uploadStartingData(state.GetHand(), state.GetDeck(), locks)
+    host.uploadStartingSeed(RULESET_VERSION, HashLocks(locks), seed)
+    threading.Thread(target=host.listenForClients, daemon=True).start()
+    host.listening.wait()
+    return host
+
+
+async def runLoadTest(address, bots, duration, rates, lobbies=0, seed=0, timeout=5.0, connect_rate=200.0):
+    """run the bots against a host, lobbies > 0 spreads them over that many lobbies of a dedicated server"""
+    recorder = LatencyRecorder()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    stop_time = started + duration
+    tasks = []
+    for count in range(bots):
+        lobby = f'lobby{count % lobbies}' if lobbies > 0 else None
+        bot = Bot(f'bot{count}', address, lobby, rates, recorder, random.Random(rng.getrandbits(64)), timeout)
+        tasks.append(asyncio.ensure_future(bot.run(stop_time)))
+        await asyncio.sleep(1 / connect_rate)  # don't flood the listen backlog
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    return recorder.getReport(elapsed), elapsed
+
+
+def Main(args):
+    parser = argparse.ArgumentParser(description="Measure a Breakthrough host's throughput and latency with synthetic players.")
+    parser.add_argument("--server", choices=["threaded", "async", "external"], default="threaded",
+                        help="start a BreakthroughHost or dedicated server in this process, or use --connect")
+    parser.add_argument("--connect", default="127.0.0.1:9999", help="host:port of an external server")
+    parser.add_argument("--bots", type=int, default=50)
+    parser.add_argument("--lobbies", type=int, default=0, help="spread the bots over this many lobbies (dedicated servers)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to send requests for")
+    parser.add_argument("--lobby-rate", type=float, default=0.5, help="lobby requests per bot per second")
+    parser.add_argument("--seed-rate", type=float, default=0.1, help="starting data (seed) requests per bot per second")
+    parser.add_argument("--starting-data-rate", type=float, default=0.1, help="full starting data requests per bot per second")
+    parser.add_argument("--stats-rate", type=float, default=0.05, help="stats requests per bot per second")
+    parser.add_argument("--state-rate", type=float, default=1.0, help="player state pushes per bot per second")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds before a request counts as an error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    parser.add_argument("--metrics", action="store_true", help="instrument an in-process server and print its metrics")
+    options = parser.parse_args(args)
+    metrics = Metrics() if options.metrics else NULL_METRICS
+
+    rates = {"lobby": options.lobby_rate, "seed": options.seed_rate, "starting_data": options.starting_data_rate,
+             "stats": options.stats_rate, "state": options.state_rate}
+
+    async def run():
+        server = None
+        if options.server == "threaded":
+            address = ("127.0.0.1", startThreadedHost(seed=options.seed, metrics=metrics).port)
+        elif options.server == "async":
+            server = AsyncBreakthroughServer("127.0.0.1", 0, seed=options.seed, metrics=metrics)
+            await server.start()
+            address = ("127.0.0.1", server.port)
+        else:
+            host, port = options.connect.rsplit(":", 1)
+            address = (host, int(port))
+        try:
+            return await runLoadTest(address, options.bots, options.duration, rates, options.lobbies, options.seed, options.timeout)
+        finally:
+            if server is not None:
+                server.close()
+
+    report, elapsed = asyncio.run(run())
+    print(LatencyRecorder.formatReport(report, elapsed), end="")
+    if options.metrics:
+        print(metrics.formatText(), end="")
+    if options.json is not None:
+        with open(options.json, "w") as f:
+            json.dump({"server": options.server, "bots": options.bots, "rates": rates, "elapsed": elapsed, "report": report}, f, indent=2)
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
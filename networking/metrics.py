@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# counters, histograms and gauges for the host and client - read with snapshot(), over http or logged
+# periodically; a disabled Metrics (the default) returns straight away from every call
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from networking.standards import *
+from networking.framing import FRAME_HEADER
+
+MSG_NAMES = {MSG_HELLO: "hello", MSG_TEXT: "text", MSG_COMMAND: "command", MSG_STARTING_DATA: "starting_data",
+             MSG_STATE_UPDATE: "state_update", MSG_SCOREBOARD: "scoreboard", MSG_SEED_DATA: "seed_data",
+             MSG_HEARTBEAT: "heartbeat"}
+COMMAND_NAMES = {CLIENT_LOBBY_REQUEST: "lobby_request", CLIENT_STATS_REQUEST: "stats_request",
+                 CLIENT_SDATA_REQUEST: "sdata_request", CLIENT_FULL_SDATA_REQUEST: "full_sdata_request",
+                 CLIENT_PS_SEND: "ps_send", SERVER_PS_REQUEST: "ps_request", CLIENT_LOST_GAME: "lost_game",
+                 SERVER_START_GAME: "start_game", CLIENT_WON_GAME: "won_game"}
+HISTOGRAM_BOUNDS = [1e-6 * 2 ** i for i in range(25)]  # 1us up to about 17s, doubling
+
+
+def messageLabel(msg_type, payload=None) -> str:
+    """'command.stats_request', 'state_update', ... - commands are split by their code"""
+    name = MSG_NAMES.get(msg_type, str(msg_type))
+    if msg_type == MSG_COMMAND and payload is not None and len(payload) > 0:
+        return name + "." + COMMAND_NAMES.get(payload[-1], str(payload[-1]))  # the code is the last byte
+    return name
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+        self.total += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, fraction) -> float:
+        """upper bound of the bucket holding that fraction of the values"""
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count > 0:
+                return min(HISTOGRAM_BOUNDS[index], self.max) if index < len(HISTOGRAM_BOUNDS) else self.max
+        return 0.0
+
+    def summary(self) -> dict:
+        return {"count": self.count, "sum": self.total, "mean": self.total / self.count if self.count > 0 else 0.0,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99), "max": self.max}
+
+
+class Metrics:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._counters = {}  # (name, label) -> value
+        self._histograms = {}  # (name, label) -> Histogram
+        self._gauges = {}  # name -> function returning the current value
+        self._mutex = threading.Lock()
+        self._started = time.monotonic()
+        self._httpServer = None
+
+    def now(self) -> float:
+        """a start time for observeSince, 0 when disabled so nothing is timed"""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def count(self, name, label="", amount=1):
+        if not self.enabled:
+            return
+        with self._mutex:
+            key = (name, label)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, label, value):
+        if not self.enabled:
+            return
+        with self._mutex:
+            histogram = self._histograms.get((name, label))
+            if histogram is None:
+                histogram = self._histograms[(name, label)] = Histogram()
+            histogram.add(value)
+
+    def observeSince(self, name, label, started):
+        if self.enabled:
+            self.observe(name, label, time.perf_counter() - started)
+
+    def observeFrame(self, name, msg_type, payload, started):
+        """observeSince labelled by message type, the label is only worked out when enabled"""
+        if self.enabled:
+            self.observe(name, messageLabel(msg_type, payload), time.perf_counter() - started)
+
+    def countFrame(self, direction, msg_type, payload):
+        """one frame in or out: message count by type and bytes including the frame header"""
+        if not self.enabled:
+            return
+        label = messageLabel(msg_type, payload)
+        with self._mutex:
+            for key, amount in (((f'messages_{direction}', label), 1), ((f'bytes_{direction}', ""), FRAME_HEADER.size + len(payload))):
+                self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, function):
+        """function() is read at every snapshot"""
+        if self.enabled:
+            self._gauges[name] = function
+
+    def snapshot(self) -> dict:
+        with self._mutex:
+            counters = dict(self._counters)
+            histograms = {key: histogram.summary() for key, histogram in self._histograms.items()}
+        snapshot = {"uptime_seconds": time.monotonic() - self._started, "counters": {}, "histograms": {}, "gauges": {}}
+        for (name, label), value in sorted(counters.items()):
+            snapshot["counters"].setdefault(name, {})[label or "total"] = value
+        for (name, label), summary in sorted(histograms.items()):
+            snapshot["histograms"].setdefault(name, {})[label or "total"] = summary
+        for name, function in sorted(self._gauges.items()):
+            try:
+                snapshot["gauges"][name] = function()
+            except Exception as error:  # a gauge must never break the dump
+                snapshot["gauges"][name] = repr(error)
+        return snapshot
+
+    def formatText(self) -> str:
+        """the snapshot as 'name{label} value' lines"""
+        snapshot = self.snapshot()
+        lines = [f'uptime_seconds {snapshot["uptime_seconds"]:.1f}']
+        for name, values in snapshot["counters"].items():
+            lines.extend(f'{name}{{{label}}} {value}' for label, value in values.items())
+        for name, values in snapshot["histograms"].items():
+            for label, summary in values.items():
+                lines.append(f'{name}{{{label}}} count={summary["count"]} mean={summary["mean"] * 1000:.3f}ms '
+                             f'p50<={summary["p50"] * 1000:.3f}ms p99<={summary["p99"] * 1000:.3f}ms max={summary["max"] * 1000:.3f}ms')
+        lines.extend(f'{name} {value}' for name, value in snapshot["gauges"].items())
+        return "\n".join(lines) + "\n"
+
+    def serveHttp(self, port=0, host="127.0.0.1") -> int:
+        """serve /metrics (text) and /metrics.json from a daemon thread, returns the port"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics.json":
+                    body, content_type = json.dumps(metrics.snapshot()).encode(ENCODING_STD), "application/json"
+                elif self.path in ("/", "/metrics"):
+                    body, content_type = metrics.formatText().encode(ENCODING_STD), "text/plain"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # keep the game's terminal clean
+                pass
+
+        self._httpServer = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._httpServer.serve_forever, daemon=True).start()
+        return self._httpServer.server_address[1]
+
+    def startPeriodicLog(self, interval, log=print):
+        def logMetrics():
+            while True:
+                time.sleep(interval)
+                log(self.formatText())
+        threading.Thread(target=logMetrics, daemon=True).start()
+
+    def close(self):
+        if self._httpServer is not None:
+            self._httpServer.shutdown()
+            self._httpServer = None
+
+
+NULL_METRICS = Metrics(enabled=False)
+
+
+def startMetrics(port=None, interval=None):
+    """enabled metrics served over http on port and/or logged every interval seconds, NULL_METRICS if neither"""
+    if port is None and interval is None:
+        return NULL_METRICS
+    metrics = Metrics()
+    if port is not None:
+        print(f'Metrics on: http://127.0.0.1:{metrics.serveHttp(port)}/metrics')
+    if interval is not None:
+        metrics.startPeriodicLog(interval)
+    return metrics
+
+
+def metricsFromEnvironment():
+    """startMetrics from BREAKTHROUGH_METRICS_PORT and BREAKTHROUGH_METRICS_LOG (seconds), disabled if neither is set"""
+    port = os.environ.get("BREAKTHROUGH_METRICS_PORT")
+    interval = os.environ.get("BREAKTHROUGH_METRICS_LOG")
+    return startMetrics(None if port is None else int(port), None if interval is None else float(interval))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# a client's outbound frames - anyone queues already encoded frames without blocking, one writer
+# thread per client sends them, so a client that reads slowly only ever holds up itself
+import collections
+import threading
+from networking.standards import *
+
+
+class Outbox:
+    """a bounded queue of encoded frames, put() refuses frames once limit bytes are waiting"""
+
+    def __init__(self, limit=OUTBOUND_LIMIT):
+        self._frames = collections.deque()
+        self._size = 0  # bytes waiting
+        self._limit = limit
+        self._closed = False
+        self._ready = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def put(self, frame) -> bool:
+        """False, leaving the queue as it was, if the frame doesn't fit or the outbox is closed"""
+        with self._ready:
+            if self._closed or (self._size + len(frame) > self._limit and self._size > 0):
+                return False
+            self._frames.append(frame)
+            self._size += len(frame)
+            self._ready.notify()
+        return True
+
+    def take(self):
+        """the waiting frames joined into one send of up to RECV_BUFFER_SIZE (or one bigger frame), waiting
+        for some if there are none - None once the outbox is closed"""
+        with self._ready:
+            while len(self._frames) == 0 and not self._closed:
+                self._ready.wait()
+            if self._closed:
+                return None
+            parts = [self._frames.popleft()]
+            size = len(parts[0])
+            while len(self._frames) > 0 and size + len(self._frames[0]) <= RECV_BUFFER_SIZE:
+                parts.append(self._frames.popleft())
+                size += len(parts[-1])
+            self._size -= size
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    def close(self):
+        """wakes the writer, frames still waiting are never sent"""
+        with self._ready:
+            self._closed = True
+            self._frames.clear()
+            self._size = 0
+            self._ready.notify_all()
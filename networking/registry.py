@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# the host's connected clients - changed under a lock by replacing the whole map, so broadcasts and
+# lobby listings iterate a snapshot without locking and never see it change size underneath them
+import threading
+
+
+class ClientRegistry:
+    """clients by name, anything with a .name works - every change copies the map, which suits a few
+    hundred players joining and leaving against many more broadcasts"""
+
+    def __init__(self):
+        self._clients = {}  # never changed once published, only replaced
+        self._mutex = threading.Lock()
+
+    def add(self, client) -> bool:
+        """False if the name is already taken"""
+        with self._mutex:
+            if client.name in self._clients:
+                return False
+            clients = dict(self._clients)
+            clients[client.name] = client
+            self._clients = clients
+        return True
+
+    def remove(self, name, client=None) -> bool:
+        """remove name, only if it is still this client when one is given - False if nothing was removed,
+        so of several threads dropping the same client exactly one goes on to clean up after it"""
+        with self._mutex:
+            current = self._clients.get(name)
+            if current is None or (client is not None and current is not client):
+                return False
+            clients = dict(self._clients)
+            del clients[name]
+            self._clients = clients
+        return True
+
+    def snapshot(self) -> dict:
+        """the clients as they are now, later joins and leaves don't change it - don't modify it"""
+        return self._clients
+
+    def get(self, name, default=None):
+        return self._clients.get(name, default)
+
+    def __getitem__(self, name):
+        return self._clients[name]
+
+    def __contains__(self, name):
+        return name in self._clients
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __iter__(self):
+        return iter(self._clients)
+
+    def names(self) -> list:
+        return list(self._clients)
+
+    def values(self) -> list:
+        return list(self._clients.values())
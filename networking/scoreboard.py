@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# live scoreboard - players push their state when it changes and the host broadcasts only the entries
+# that changed, so showing the scores is a local read rather than a round trip to every player
+import struct
+import threading
+from networking.standards import *
+
+SCOREBOARD_ENTRY = struct.Struct("!BBii")  # flags, name length, score, locks solved - then the name
+ENTRY_REMOVED = 1
+
+
+class Scoreboard:
+    """every player's latest state, shared between threads - changes since the last takeChanges are
+    remembered so they can be sent as one coalesced update"""
+
+    def __init__(self):
+        self._entries = {}  # name -> {'score', 'locksSolved'}
+        self._changed = set()
+        self._mutex = threading.Lock()
+
+    def update(self, name, state) -> bool:
+        """record a player's state, False if nothing changed"""
+        with self._mutex:
+            if self._entries.get(name) == state:
+                return False
+            self._entries[name] = dict(state)
+            self._changed.add(name)
+            return True
+
+    def remove(self, name):
+        with self._mutex:
+            if self._entries.pop(name, None) is not None:
+                self._changed.add(name)
+
+    def get(self, name):
+        with self._mutex:
+            state = self._entries.get(name)
+            return None if state is None else dict(state)
+
+    def snapshot(self) -> dict:
+        with self._mutex:
+            return {name: dict(state) for name, state in self._entries.items()}
+
+    def hasChanges(self) -> bool:
+        return len(self._changed) > 0
+
+    def takeChanges(self) -> bytes:
+        """an encoded update holding the entries changed since the last call (b'' if none)"""
+        with self._mutex:
+            changed, self._changed = self._changed, set()
+            return self.__encode(changed)
+
+    def encodeAll(self) -> bytes:
+        """an encoded update holding every entry, for a player who has just joined"""
+        with self._mutex:
+            return self.__encode(self._entries)
+
+    def __encode(self, names) -> bytes:
+        parts = []
+        for name in names:
+            encoded = name.encode(ENCODING_STD)[:255]
+            if len(encoded) == 255:  # don't cut a character in half
+                encoded = encoded.decode(ENCODING_STD, errors="ignore").encode(ENCODING_STD)
+            state = self._entries.get(name)
+            if state is None:
+                parts.append(SCOREBOARD_ENTRY.pack(ENTRY_REMOVED, len(encoded), 0, 0) + encoded)
+            else:
+                parts.append(SCOREBOARD_ENTRY.pack(0, len(encoded), state['score'], state['locksSolved']) + encoded)
+        return b''.join(parts)
+
+    def applyChanges(self, payload):
+        """apply an update made by takeChanges, as a client does with the host's broadcasts"""
+        offset = 0
+        with self._mutex:
+            while offset < len(payload):
+                flags, name_length, score, locks_solved = SCOREBOARD_ENTRY.unpack_from(payload, offset)
+                offset += SCOREBOARD_ENTRY.size
+                name = str(payload[offset:offset + name_length], ENCODING_STD)
+                offset += name_length
+                if flags & ENTRY_REMOVED:
+                    self._entries.pop(name, None)
+                else:
+                    self._entries[name] = {'score': score, 'locksSolved': locks_solved}
+
+    def formatScores(self) -> str:
+        msg = ''
+        for name, state in sorted(self.snapshot().items(), key=lambda item: -item[1]['score']):
+            msg += f'{name} -- :\n'
+            msg += f'Current Score:{state["score"]}\n'
+            msg += f'Locks Solved:{state["locksSolved"]}\n'
+        return msg
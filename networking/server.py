@@ -1,12 +1,30 @@
 #!/usr/bin/env python3
 import socket
-import pickle
+import struct
 import threading
 import time
 import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from networking.player_state import PlayerState
 from networking.standards import *
+from networking.framing import *
+from networking.correlation import RequestTracker
+from networking.scoreboard import *
+from networking.wire import *
+from networking.metrics import NULL_METRICS
+from networking.registry import ClientRegistry
+from networking.outbox import Outbox
+
+
+def packStartingData(hand, deck, locks) -> dict:
+    assert(hand.GetName() == "HAND" and deck.GetName() == "DECK")
+    starting_data = {}
+    starting_data["HAND"] = [card.GetDescription() for card in hand.GetCards()]
+    starting_data["DECK"] = [card.GetDescription() for card in deck.GetCards()]
+    starting_data["LOCKS"] = []
+    for lock in locks:
+        starting_data["LOCKS"].append([c.GetCondition() for c in lock.GetChallenges()])
+    return starting_data
 
 
 @dataclass
@@ -14,25 +32,39 @@ class BtHostClient:
     name: str
     sock: socket.socket
     address: (str, int)
-    decode: bool
+    reader: FrameReader
+    outbox: Outbox  # only the client's writer thread sends on the socket
+    lastHeard: float = field(default_factory=time.monotonic)  # clients silent for IDLE_TIMEOUT are dropped
+    lastSent: float = field(default_factory=time.monotonic)  # quiet clients are sent a heartbeat
 
 
 class BreakthroughHost:
-    def __init__(self, player_name):
+    def __init__(self, player_name, port=9999, host_ip=None, metrics=NULL_METRICS,
+                 slow_client_policy=SLOW_CLIENT_DISCONNECT, outbound_limit=OUTBOUND_LIMIT):
         self._playerName = player_name
         self._serverListening = False
-        self._clientCount = 0
-        self._activeClients = {}
-        self._port = 9999  # hope no one is using this!
+        self._activeClients = ClientRegistry()  # iterate a snapshot(), it is changed from many threads
+        self._port = port  # 9999 by default, hope no one is using this!
         self._serverSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # create TCP socket
         self._host_name = socket.gethostname()
-        self._host_ip = socket.gethostbyname(self._host_name)
+        self._host_ip = host_ip or socket.gethostbyname(self._host_name)
         self._socketAddress = (self._host_ip, self._port)
         self._wantsPackets = True
+        self.listening = threading.Event()
         self._playerState = {'score': 0, 'locksSolved': 0}
         self._hostStartingData = {}
-        self.__clientDataObjects = []
-        self.__cdoMutex = threading.Lock()
+        self._encodedStartingData = None
+        self._seedData = None  # set if the game was dealt from a seed, joining is then a few bytes
+        self.__statsRequests = RequestTracker()
+        self._scoreboard = Scoreboard()
+        self._scoreboard.update(player_name, self._playerState)
+        self.__scoreboardChanged = threading.Event()
+        self._slowClientPolicy = slow_client_policy
+        self._outboundLimit = outbound_limit
+        self._metrics = metrics
+        metrics.gauge("active_clients", lambda: len(self._activeClients))
+        metrics.gauge("outbound_bytes", lambda: sum(c.outbox.size for c in self._activeClients.values()))
+        metrics.gauge("threads", threading.active_count)
 
     @property
     def port(self) -> int:
@@ -40,7 +72,7 @@ class BreakthroughHost:
 
     @property
     def clientCount(self) -> int:
-        return self._clientCount
+        return len(self._activeClients)
 
     @property
     def serverListening(self) -> bool:
@@ -63,95 +95,183 @@ class BreakthroughHost:
     def playerScore(self, value):
         if value < 0 or value > 100: return
         self._playerState['score'] = value
+        self.__updateScoreboard(self._playerName, self._playerState)
 
     @playerLocksSolved.setter
     def playerLocksSolved(self, value):
         if value < 0 or value > 20: return
         self._playerState['locksSolved'] = value
+        self.__updateScoreboard(self._playerName, self._playerState)
+
+    @property
+    def scoreboard(self) -> Scoreboard:
+        return self._scoreboard
+
+    def __updateScoreboard(self, name, state):
+        if self._scoreboard.update(name, state):
+            self.__scoreboardChanged.set()
+
+    def __broadcastScoreboard(self):  # one thread, changes within an interval go out as one frame
+        while self._serverListening:
+            self.__scoreboardChanged.wait()
+            time.sleep(SCOREBOARD_INTERVAL)
+            self.__scoreboardChanged.clear()
+            changes = self._scoreboard.takeChanges()
+            if len(changes) > 0:
+                self.__submitFrameToAll(MSG_SCOREBOARD, changes)
 
     def uploadStartingData(self, hand, deck, locks):
-        assert(hand.GetName() == "HAND" and deck.GetName() == "DECK")
-        self._hostStartingData["HAND"] = [card.GetDescription() for card in hand.GetCards()]
-        self._hostStartingData["DECK"] = [card.GetDescription() for card in deck.GetCards()]
-        self._hostStartingData["LOCKS"] = []
-        for lock in locks:
-            self._hostStartingData["LOCKS"].append([c.GetCondition() for c in lock.GetChallenges()])
+        self._hostStartingData = packStartingData(hand, deck, locks)
+        self._encodedStartingData = None
+
+    def uploadStartingSeed(self, ruleset, locks_hash, seed):
+        """clients with the same ruleset and locks deal the starting data themselves from the seed"""
+        self._seedData = encodeSeedData(ruleset, locks_hash, seed)
 
     def listenForClients(self):
         print(f'Listening for clients on: {self._socketAddress}')
         self._serverListening = True
+        threading.Thread(target=self.__broadcastScoreboard, daemon=True).start()
+        threading.Thread(target=self.__maintainConnections, daemon=True).start()
         self._serverSocket.bind(self._socketAddress)  # Binding
         self._serverSocket.listen(0)
+        self._port = self._serverSocket.getsockname()[1]  # if port 0 asked for any free port
+        self._socketAddress = (self._host_ip, self._port)
+        self.listening.set()
         while self._serverListening:
-            client_socket, address = self._serverSocket.accept()
-            self.__handleClientConnection(client_socket, address)
+            try:
+                client_socket, address = self._serverSocket.accept()
+            except OSError:  # the listening socket was closed
+                break
+            # the hello is read on the client's own thread so a silent connection can't hold up accept
+            threading.Thread(target=self.__handleClientConnection, args=(client_socket, address), daemon=True).start()
 
-    def __handleClientConnection(self, client_sock, address):
+    def __handleClientConnection(self, client_sock, address):  # each new client thread
         if client_sock:
-            name = client_sock.recv(PACKET_SIZE).decode(ENCODING_STD)[HEADER_SIZE:]
-            self._activeClients[name] = BtHostClient(name, client_sock, address, True)
-            #self.__submitMsgToAll(f'New player: {name} has connected!')
-            # create a thread to receive data from current client on
-            stream_thread = threading.Thread(target=self.__handleClientStreamData, args=(name,), daemon=True)
-            stream_thread.start()
-            self._clientCount += 1
-
-    def __handleClientStreamData(self, client_name): # each new client thread
-        client_obj = self._activeClients[client_name]
-        new_message = True
-        message_data_utf = ''
-        message_pure_bytes = b''
-        decode_bytes = self._activeClients[client_name].decode
-
-        while self._wantsPackets:
-            if client_obj.sock:
+            reader = FrameReader(client_sock)
+            client_sock.settimeout(HANDSHAKE_TIMEOUT)
+            try:
+                frame = reader.readFrame()
+                if frame is not None and frame[0] == MSG_HELLO:
+                    lobby, name = decodeHello(frame[1], frame[2])  # this host is a single lobby
+            except (OSError, ProtocolError, UnicodeDecodeError):
+                frame = None
+            if frame is None or frame[0] != MSG_HELLO:
+                client_sock.close()
+                return
+            client_sock.settimeout(None)
+            self._metrics.countFrame("in", frame[0], frame[2])
+            client_obj = BtHostClient(name, client_sock, address, reader, Outbox(self._outboundLimit))
+            if not self._activeClients.add(client_obj):
                 try:
-                    packet = client_obj.sock.recv(PACKET_SIZE)
-                    if len(packet) > 0:
-                        if new_message:
-                            payload_size = int(packet[:HEADER_SIZE])
-                            new_message = False
-                            decode_bytes = self._activeClients[client_name].decode  # do we want bytes for new msg?
-
-                        if decode_bytes:
-                            message_data_utf += packet.decode(ENCODING_STD)
-                            if len(message_data_utf) - HEADER_SIZE >= payload_size:
-                                self.__processClientMessage(client_name, message_data_utf[HEADER_SIZE:])
-                                message_data_utf = ''
-                                new_message = True
-                        else:
-                            message_pure_bytes += packet
-                            if len(message_pure_bytes) - HEADER_SIZE >= payload_size:
-                                self.__addClientObjectReceived(client_name, pickle.loads(message_pure_bytes[HEADER_SIZE:]))
-                                self._activeClients[client_name].decode = True  # we have received object, back to norm
-                                new_message = True
-                                message_bytes = b''
-
-                except ConnectionResetError or ConnectionAbortedError or KeyError:  # disconnected, left, or kicked
+                    sendText(client_sock, f'The name {name} is already taken in this lobby')
+                except OSError:
+                    pass
+                client_sock.close()
+                return
+            threading.Thread(target=self.__drainOutbox, args=(client_obj,), daemon=True).start()
+            self.__updateScoreboard(name, {'score': 0, 'locksSolved': 0})
+            self.__queueFrame(client_obj, MSG_SCOREBOARD, self._scoreboard.encodeAll())
+            #self.__submitMsgToAll(f'New player: {name} has connected!')
+            self.__handleClientStreamData(client_obj)  # receive data from the client on this thread from now on
+
+    def __handleClientStreamData(self, client_obj):
+        client_name = client_obj.name
+        try:
+            while self._wantsPackets:
+                frame = client_obj.reader.readFrame()
+                if frame is None:
                     break
+                client_obj.lastHeard = time.monotonic()
+                started = self._metrics.now()
+                msg_type, flags, payload = frame
+                self._metrics.countFrame("in", msg_type, payload)
+                request_id, payload = splitRequestId(flags, payload)
+                if msg_type == MSG_COMMAND:
+                    if len(payload) != 1:
+                        raise ProtocolError(f'a command is one byte, not {len(payload)}')
+                    self.__processClientCommand(client_name, payload[0])
+                elif msg_type == MSG_STATE_UPDATE:  # pushed, or a reply to a stats request
+                    state = decodeStateUpdate(payload)
+                    self._metrics.observeFrame("decode_seconds", msg_type, payload, started)
+                    self.__updateScoreboard(client_name, state)
+                    if request_id is not None:
+                        self.__statsRequests.resolve(request_id, client_name, state)
+                elif msg_type == MSG_TEXT:
+                    self.__processClientMessage(client_name, str(payload, ENCODING_STD))
+                self._metrics.observeFrame("handler_seconds", msg_type, payload, started)
+        except (OSError, ProtocolError, KeyError, IndexError, ValueError, struct.error):  # disconnected, left, kicked or garbage
+            pass
+        finally:
+            self.__handlePlayerDisconnect(client_obj)
+            client_obj.sock.close()  # only this thread reads the socket, so only it closes it
+
+    def __handlePlayerDisconnect(self, client_obj, reason="Disconnection"):
+        name = client_obj.name
+        if not self._activeClients.remove(name, client_obj):
+            return  # already gone, or the name belongs to a newer connection
+        client_obj.outbox.close()  # ends the writer thread
+        try:
+            client_obj.sock.shutdown(socket.SHUT_RDWR)  # wakes the client's reader thread with an end of stream
+        except OSError:
+            pass
+        self.__statsRequests.forget(name)  # don't keep a stats view waiting on them
+        self._scoreboard.remove(name)
+        self.__scoreboardChanged.set()
+        self.__submitMsgToAll(f'PLAYER: {name} has been disconnected ({reason})')
+
+    def __maintainConnections(self):  # one thread: heartbeats to quiet clients, drops clients gone silent
+        while self._serverListening:
+            time.sleep(HEARTBEAT_INTERVAL / 2)
+            now = time.monotonic()
+            for client_obj in self._activeClients.values():
+                if now - client_obj.lastHeard > IDLE_TIMEOUT:
+                    self.__handlePlayerDisconnect(client_obj, "Timed out")
+                elif now - client_obj.lastSent >= HEARTBEAT_INTERVAL:
+                    self.__queueFrame(client_obj, MSG_HEARTBEAT, b'')
+
+    def __drainOutbox(self, client_obj):  # each client's writer thread, a slow client only holds up itself
+        while True:
+            data = client_obj.outbox.take()
+            if data is None:
+                break
+            try:
+                client_obj.sock.sendall(data)
+            except OSError:
+                self.__handlePlayerDisconnect(client_obj)
+                break
 
-        self.__handlePlayerDisconnect(client_obj.name)
-
-    def __handlePlayerDisconnect(self, name, reason="Disconnection"):
-        if name in self._activeClients:
-            del self._activeClients[name]
-            self._clientCount -= 1
-            self.__submitMsgToAll(f'PLAYER: {name} has been disconnected ({reason})')
-
-    def __submitMsgToAll(self, message: str, pickled=False):
+    def __queueFrame(self, client_obj, msg_type, payload, flags=0, frame=None):
+        """hand a frame to the client's writer thread without waiting on the network - a client too far
+        behind to take it is disconnected or misses it, as the slow client policy says"""
+        if frame is None:
+            frame = encodeFrame(msg_type, payload, flags)
+        if client_obj.outbox.put(frame):
+            client_obj.lastSent = time.monotonic()
+            self._metrics.countFrame("out", msg_type, payload)
+        elif self._slowClientPolicy == SLOW_CLIENT_DROP:
+            self._metrics.count("frames_dropped")
+        elif client_obj.name in self._activeClients:
+            self._metrics.count("slow_clients_disconnected")
+            self.__handlePlayerDisconnect(client_obj, "Too far behind")
+
+    def __submitFrameToAll(self, msg_type, payload, flags=0):
+        frame = encodeFrame(msg_type, payload, flags)  # encoded once, every outbox holds the same bytes
+        for client_obj in self._activeClients.snapshot().values():
+            self.__queueFrame(client_obj, msg_type, payload, flags, frame)
+
+    def __submitMsgToAll(self, message: str):
         print(message)  # all includes us
-        for name in self._activeClients.keys():
-            self.__submitMsgToClient(name, message, pickled=pickled)
+        self.__submitFrameToAll(MSG_TEXT, message.encode(ENCODING_STD))
 
-    def __submitMsgToClient(self, name, message: str, pickled=False):
-        if self._activeClients[name].sock:
-            if not pickled:
-                self._activeClients[name].sock.send(bytes((f'{len(message):<{HEADER_SIZE}}' + message), ENCODING_STD))
-            else:
-                msg = f'{len(message):<{HEADER_SIZE}}'
-                flag = msg[:PAYLOAD_WIDTH] + str(SERVER_SEND_PICKLE) + msg[HEADER_SIZE + len(str(SERVER_SEND_PICKLE)):]  # add pf header
-                self._activeClients[name].sock.send(bytes(flag, ENCODING_STD) + message)
+    def __submitCommandToAll(self, code: int):
+        print(code)
+        self.__submitFrameToAll(MSG_COMMAND, bytes((code,)))
 
+    def __submitMsgToClient(self, name, message, msg_type=MSG_TEXT):
+        if msg_type == MSG_TEXT:
+            message = message.encode(ENCODING_STD)
+        self.__queueFrame(self._activeClients[name], msg_type, message)
 
     def handleClientEvent(self, client_name, event_flag: int):
         if event_flag == CLIENT_LOST_GAME:
@@ -162,21 +282,25 @@ class BreakthroughHost:
         elif event_flag == CLIENT_WON_GAME:
             self.__submitMsgToAll(f'{client_name} has won the game!')
         else:
-            self.__submitMsgToAll(str(event_flag))
-
-    def __processClientMessage(self, client_name, message):
-        if len(str(message)) == 1:
-            request_flag = int(message)
-            if request_flag == CLIENT_LOBBY_REQUEST:
-                self.__submitMsgToClient(client_name, self.getLobbyDisplay())
-            elif request_flag == CLIENT_SDATA_REQUEST:  # starting data request
-                self.__submitStartDataToClient(client_name)
-            elif request_flag == CLIENT_STATS_REQUEST:
-                threading.Thread(target=self.__processStatsRequest, args=(client_name,), daemon=True).start()
+            self.__submitCommandToAll(event_flag)
+
+    def __processClientCommand(self, client_name, request_flag: int):
+        if request_flag == CLIENT_LOBBY_REQUEST:
+            self.__submitMsgToClient(client_name, self.getLobbyDisplay())
+        elif request_flag == CLIENT_SDATA_REQUEST:  # starting data request
+            if self._seedData is not None:
+                self.__submitMsgToClient(client_name, self._seedData, msg_type=MSG_SEED_DATA)
             else:
-                self.handleClientEvent(client_name, request_flag)
+                self.__submitStartDataToClient(client_name)
+        elif request_flag == CLIENT_FULL_SDATA_REQUEST:
+            self.__submitStartDataToClient(client_name)
+        elif request_flag == CLIENT_STATS_REQUEST:  # answered once every player has replied, never blocks this thread
+            self.__collectStatsResponse(lambda stats_msg: self.__processStatsRequest(client_name, stats_msg))
         else:
-            print(f'SERVER: message from client {self._activeClients[name].address} ({name}): {message}')
+            self.handleClientEvent(client_name, request_flag)
+
+    def __processClientMessage(self, client_name, message):
+        print(f'SERVER: message from client {self._activeClients[client_name].address} ({client_name}): {message}')
 
     @staticmethod
     def formatPlayerState(name, obj) -> str:
@@ -185,43 +309,49 @@ class BreakthroughHost:
         msg += f'Locks Solved:{obj["locksSolved"]}\n'
         return msg
 
-    def __collectStatsResponse(self) -> str:
-        for name in self._activeClients:
-            self._activeClients[name].decode = False # start receving bytes only (for pickle)
-            self.__submitMsgToClient(name, str(SERVER_PS_REQUEST))
-
-        stats_msg = ''
-        while True:
-            if len(self.__clientDataObjects) == self._clientCount:
-                for obj in self.__clientDataObjects:
-                    stats_msg += BreakthroughHost.formatPlayerState(obj[0], obj[1])
-                stats_msg += BreakthroughHost.formatPlayerState(self._playerName, self._playerState)
-                break
-
-        self.__clientDataObjects.clear()
-        return stats_msg
-    
-    def __processStatsRequest(self, client):
-        stats_msg = self.__collectStatsResponse()
-        self.__submitMsgToClient(client, stats_msg)
-
-    def isssueStatsRequest(self):
-        print(self.__collectStatsResponse())
-
-    def __addClientObjectReceived(self, client, obj):
-        self.__cdoMutex.acquire()
-        self.__clientDataObjects.append([client, obj])
-        self.__cdoMutex.release()
+    def __collectStatsResponse(self, on_done, timeout=STATS_TIMEOUT):
+        """ask every player for their state under one request id, on_done gets the stats message once they
+        have all answered or the timeout passes - players who didn't answer are listed as such"""
+        clients = self._activeClients.snapshot()
+        names = list(clients)
+        request = self.__statsRequests.open(names, timeout)
+        flags, payload = withRequestId(request.requestId, bytes((SERVER_PS_REQUEST,)))
+        frame = encodeFrame(MSG_COMMAND, payload, flags)  # one request id, so one frame for everyone
+        for client_obj in clients.values():
+            self.__queueFrame(client_obj, MSG_COMMAND, payload, flags, frame)
+
+        def formatStats(future):
+            results = future.result()
+            stats_msg = ''
+            for name in names:
+                if name in results:
+                    stats_msg += BreakthroughHost.formatPlayerState(name, results[name])
+                else:
+                    stats_msg += f'{name} -- : (no response)\n'
+            stats_msg += BreakthroughHost.formatPlayerState(self._playerName, self._playerState)
+            on_done(stats_msg)
+
+        request.future.add_done_callback(formatStats)
+        return request.future
+
+    def __processStatsRequest(self, client, stats_msg):
+        client_obj = self._activeClients.get(client)
+        if client_obj is not None:
+            self.__queueFrame(client_obj, MSG_TEXT, stats_msg.encode(ENCODING_STD))
+
+    def issueStatsRequest(self):
+        self.__collectStatsResponse(print)
 
     def __submitStartDataToClient(self, client):  # at the start of the game all players should start with same cards
-        msg = pickle.dumps(self._hostStartingData)
-        self.__submitMsgToClient(client, msg, pickled=True)
+        if self._encodedStartingData is None:  # encoded once, every client gets the same bytes
+            self._encodedStartingData = encodeStartingData(self._hostStartingData)
+        self.__submitMsgToClient(client, self._encodedStartingData, msg_type=MSG_STARTING_DATA)
 
     def getLobbyDisplay(self) -> str:
         msg = "------------ Players in lobby --------------\n"
-        for key in self._activeClients.keys():
-            msg += "USERNAME: " + self._activeClients[key].name + "\n"
-            msg += "ADDRESS: " + str(self._activeClients[key].address) + "\n"
+        for client_obj in self._activeClients.snapshot().values():
+            msg += "USERNAME: " + client_obj.name + "\n"
+            msg += "ADDRESS: " + str(client_obj.address) + "\n"
         msg += "--------------------------------------------\n"
         return msg
 
@@ -230,8 +360,9 @@ class BreakthroughHost:
         self.__submitMsgToAll(msg)
 
     def kickPlayer(self, username, reason):
-        if username in self._activeClients:
-            self.__handlePlayerDisconnect(username, reason=reason)
+        client_obj = self._activeClients.get(username)
+        if client_obj is not None:
+            self.__handlePlayerDisconnect(client_obj, reason=reason)
         else: print(f'Error: username ({username}) was not recognised as an active player.')
 
     def messageAllClients(self, message: str):
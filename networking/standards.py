@@ -2,16 +2,40 @@
 # constants that both client and server will rely upon to communicate
 
 
-PACKET_SIZE = 32
 ENCODING_STD = "utf-8"
 CLIENT_LOBBY_REQUEST = 0
 CLIENT_STATS_REQUEST = 1
-CLIENT_SDATA_REQUEST = 2
-PAYLOAD_WIDTH = 3
+CLIENT_SDATA_REQUEST = 2  # answered with the seed if the host has one, otherwise the full starting data
+CLIENT_FULL_SDATA_REQUEST = 3  # for a client whose lock file or rules don't match the host's
 CLIENT_PS_SEND = 4
-HEADER_SIZE = 5
 SERVER_PS_REQUEST = 6
-SERVER_SEND_PICKLE = 9
 CLIENT_LOST_GAME = 7
 CLIENT_WON_GAME = 10
 SERVER_START_GAME = 8
+
+# every message is a frame: a fixed binary header (type, flags, payload length) then the payload
+FRAME_HEADER_FORMAT = "!BBI"  # network byte order
+MAX_FRAME_SIZE = 16 * 1024 * 1024  # anything bigger is a corrupt stream, not a message
+RECV_BUFFER_SIZE = 64 * 1024
+MSG_HELLO = 1  # client name, the first frame a client sends
+MSG_TEXT = 2  # utf-8 text to show the player
+MSG_COMMAND = 3  # one of the request/event codes above, as a single byte
+MSG_STARTING_DATA = 4  # host -> client: the cards and locks everyone starts with, see networking/wire.py
+MSG_STATE_UPDATE = 5  # client -> host: the player's score and locks solved, sent when they change or asked for
+MSG_SCOREBOARD = 6  # host -> clients: the scoreboard entries that changed
+MSG_SEED_DATA = 7  # host -> client: ruleset version, lock fingerprint and seed to deal the starting data locally
+MSG_HEARTBEAT = 8  # either way, empty: sent after HEARTBEAT_INTERVAL with nothing else to send
+FRAME_HAS_REQUEST_ID = 1  # flag: the payload starts with a 4-byte request id, replies echo it back
+STATS_TIMEOUT = 2.0  # seconds to wait for players to report their state
+SCOREBOARD_INTERVAL = 0.25  # scoreboard changes are coalesced into at most one broadcast this often
+HEARTBEAT_INTERVAL = 5.0  # seconds
+IDLE_TIMEOUT = 4 * HEARTBEAT_INTERVAL  # a peer not heard from for this long is disconnected
+HANDSHAKE_TIMEOUT = HEARTBEAT_INTERVAL  # clients say hello as soon as they connect
+OUTBOUND_LIMIT = 1024 * 1024  # bytes waiting to go to one client before the slow client policy applies
+SLOW_CLIENT_DISCONNECT = "disconnect"  # slow client policies: drop the client
+SLOW_CLIENT_DROP = "drop"  # or drop the frames that don't fit, the client misses them
+
+# a dedicated server hosts many lobbies on one port, a hello with this flag names the lobby to join
+HELLO_HAS_LOBBY = 1
+LOBBY_SEPARATOR = "\n"  # hello payload is then lobby + LOBBY_SEPARATOR + player name
+DEFAULT_LOBBY = "default"
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# schema-based binary encodings for everything sent between players - nothing received from the
+# network is ever unpickled, a malformed payload can only raise ProtocolError
+import struct
+from networking.standards import *
+from networking.framing import ProtocolError
+
+WIRE_VERSION = 1
+PLAYER_STATE = struct.Struct("!ii")  # score, locks solved
+SEED_DATA = struct.Struct("!H8sQ")  # ruleset version, lock fingerprint, seed
+_STARTING_HEADER = struct.Struct("!BBHHHH")  # version, code width, descriptions, hand size, deck size, locks
+_CODE_WIDTHS = (1, 2)  # bytes per card code, 1 unless the starting data uses over 256 descriptions
+_MAX_COUNT = 0xFFFF  # descriptions, hand size, deck size and locks are counted in 16 bits
+_MAX_LENGTH = 0xFF  # description bytes, challenges in a lock and cards in a condition in 8
+
+
+def encodeStateUpdate(score, locks_solved) -> bytes:
+    return PLAYER_STATE.pack(score, locks_solved)
+
+
+def decodeStateUpdate(payload) -> dict:
+    if len(payload) != PLAYER_STATE.size:
+        raise ProtocolError(f'player state should be {PLAYER_STATE.size} bytes, not {len(payload)}')
+    score, locks_solved = PLAYER_STATE.unpack_from(payload)
+    return {'score': score, 'locksSolved': locks_solved}
+
+
+def encodeSeedData(ruleset, locks_hash, seed) -> bytes:
+    return SEED_DATA.pack(ruleset, locks_hash, seed)
+
+
+def decodeSeedData(payload) -> dict:
+    if len(payload) != SEED_DATA.size:
+        raise ProtocolError(f'seed data should be {SEED_DATA.size} bytes, not {len(payload)}')
+    ruleset, locks_hash, seed = SEED_DATA.unpack_from(payload)
+    return {"RULESET": ruleset, "LOCKS_HASH": locks_hash, "SEED": seed}
+
+
+def encodeStartingData(starting_data: dict) -> bytes:
+    """the dict made by packStartingData as bytes: a table of the card descriptions used, then the hand,
+    deck and every lock condition as codes into that table"""
+    table = {}
+    for description in starting_data["HAND"] + starting_data["DECK"]:
+        table.setdefault(description, len(table))
+    for lock in starting_data["LOCKS"]:
+        for condition in lock:
+            for description in condition:
+                table.setdefault(description, len(table))
+    _checkCount("card descriptions", len(table), _MAX_COUNT)
+    _checkCount("cards in the hand", len(starting_data["HAND"]), _MAX_COUNT)
+    _checkCount("cards in the deck", len(starting_data["DECK"]), _MAX_COUNT)
+    _checkCount("locks", len(starting_data["LOCKS"]), _MAX_COUNT)
+    width = 1 if len(table) <= 0x100 else 2
+    parts = [_STARTING_HEADER.pack(WIRE_VERSION, width, len(table), len(starting_data["HAND"]),
+                                   len(starting_data["DECK"]), len(starting_data["LOCKS"]))]
+    for description in table:
+        encoded = description.encode(ENCODING_STD)
+        _checkCount("bytes in a card description", len(encoded), _MAX_LENGTH)
+        parts.append(bytes((len(encoded),)) + encoded)
+    parts.append(_packCodes([table[d] for d in starting_data["HAND"]], width))
+    parts.append(_packCodes([table[d] for d in starting_data["DECK"]], width))
+    for lock in starting_data["LOCKS"]:
+        _checkCount("challenges in a lock", len(lock), _MAX_LENGTH)
+        parts.append(bytes((len(lock),)))
+        for condition in lock:
+            _checkCount("cards in a lock condition", len(condition), _MAX_LENGTH)
+            parts.append(bytes([len(condition)] + [table[d] for d in condition]) if width == 1 else
+                         bytes((len(condition),)) + _packCodes([table[d] for d in condition], width))
+    return b''.join(parts)
+
+
+def _checkCount(what, count, limit):
+    if count > limit:
+        raise ProtocolError(f'starting data has {count} {what}, the wire format allows at most {limit}')
+
+
+def _packCodes(codes, width) -> bytes:
+    return bytes(codes) if width == 1 else struct.pack(f'!{len(codes)}H', *codes)
+
+
+def decodeStartingData(payload) -> dict:
+    data = bytes(payload)
+    if len(data) < _STARTING_HEADER.size:
+        raise ProtocolError("starting data is truncated")
+    version, width, table_size, hand_size, deck_size, lock_count = _STARTING_HEADER.unpack_from(data)
+    if version != WIRE_VERSION or width not in _CODE_WIDTHS:
+        raise ProtocolError(f'unsupported starting data (version {version}, code width {width})')
+    offset = _STARTING_HEADER.size
+    try:
+        table = []
+        for count in range(table_size):
+            end = offset + 1 + data[offset]
+            table.append(data[offset + 1:end].decode(ENCODING_STD))
+            offset = end
+
+        def readDescriptions(count):
+            nonlocal offset
+            end = offset + count * width
+            if end > len(data):
+                raise ProtocolError("starting data is truncated")
+            codes = data[offset:end] if width == 1 else struct.unpack_from(f'!{count}H', data, offset)
+            offset = end
+            return [table[code] for code in codes]
+
+        starting_data = {"HAND": readDescriptions(hand_size), "DECK": readDescriptions(deck_size), "LOCKS": []}
+        for count in range(lock_count):
+            challenges = data[offset]
+            offset += 1
+            lock = []
+            for challenge in range(challenges):
+                length = data[offset]
+                offset += 1
+                lock.append(tuple(readDescriptions(length)))
+            starting_data["LOCKS"].append(lock)
+    except IndexError:  # ran off the end, or a code outside the table
+        raise ProtocolError("starting data is truncated or has an unknown card code") from None
+    except UnicodeDecodeError as error:
+        raise ProtocolError("card description is not utf-8") from error
+    if offset != len(data):
+        raise ProtocolError("unexpected bytes after the starting data")
+    return starting_data
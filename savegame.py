@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# versioned save games - a compact binary form for snapshots/checkpoints and a JSON form for debugging,
+# both holding the full GameState (every lock and its progress included). The original line based
+# text format (assets/game1.txt) can still be read.
+import array
+import json
+import random
+import struct
+import sys
+from engine import *
+
+SAVE_MAGIC = b"BTSV"
+SAVE_VERSION = 1
+
+_FLAG_GAME_OVER = 1
+_FLAG_DIFFICULTY_PENDING = 2
+_FLAG_RNG = 4
+_FLAG_LOOSE_LOCK = 8  # the current lock isn't one of the game's locks, it is saved after them
+
+# magic, version, flags, score, locks solved, turns, end cause, current lock, pending card number, card choice
+_HEADER = struct.Struct("<4sBBiIIBiiB")
+_COUNT = struct.Struct("<I")
+_CHALLENGE = struct.Struct("<BB")  # met, length of condition
+_RNG_TAIL = struct.Struct("<Bd")  # has gauss_next, gauss_next
+_MT_WORDS = 625  # words in a Mersenne Twister state
+
+
+class SaveGameError(ValueError):
+    pass
+
+
+def _RestoreRng(Words, GaussNext):
+    """a Random in the saved state, checked first as setstate only raises a bare ValueError"""
+    Words = tuple(Words)
+    if len(Words) != _MT_WORDS:
+        raise SaveGameError(f'random state has {len(Words)} words, expected {_MT_WORDS}')
+    if not all(type(Word) is int and 0 <= Word <= 0xFFFFFFFF for Word in Words) or Words[-1] >= _MT_WORDS:
+        raise SaveGameError("random state is corrupt")
+    if GaussNext is not None and type(GaussNext) not in (int, float):
+        raise SaveGameError(f'{GaussNext!r} is not a gauss_next')
+    Rng = random.Random()
+    try:
+        Rng.setstate((3, Words, GaussNext))
+    except (ValueError, TypeError, OverflowError) as Error:
+        raise SaveGameError(f'random state is corrupt: {Error}') from Error
+    return Rng
+
+
+def _NewCard(Description, CardNumber):
+    if Description == "Dif":
+        return DifficultyCard(CardNumber)
+    ToolType, Space, Kit = Description.partition(" ")
+    if Space == "" or ToolType == "" or Kit == "":
+        raise SaveGameError(f'{Description!r} is not a card')
+    return ToolCard(ToolType, Kit, CardNumber)
+
+
+def _Collections(State):
+    return [State.GetHand(), State.GetSequence(), State.GetDiscard(), State.GetDeck()]
+
+
+def _SavedLocks(State):
+    """the game's locks plus, if it isn't a copy of one of them, the current lock - and the current lock's index"""
+    Locks = list(State.GetLocks())
+    Index = State.GetCurrentLockIndex()
+    if Index is not None:
+        Locks[Index] = State.GetCurrentLock()  # the copy being played, so its progress is saved
+        return Locks, Index, False
+    return Locks + [State.GetCurrentLock()], len(Locks), True
+
+
+def _BuildState(Locks, CurrentLock, LooseLock, Rng, CardLists, Score, LocksSolved, Turns, GameOver, EndCause, Pending):
+    if not 0 <= CurrentLock < len(Locks):
+        raise SaveGameError("the current lock is missing")
+    if LooseLock:
+        State = GameState(Locks[:-1], Rng)
+        State.SetCurrentLock(Locks[CurrentLock])
+    else:  # play on a copy, so the game's own lock stays as fresh as the others
+        Locks = list(Locks)
+        Current = Locks[CurrentLock].GetCopy()
+        Locks[CurrentLock] = Locks[CurrentLock].GetFreshCopy()
+        State = GameState(Locks, Rng)
+        State.SetCurrentLock(Current, CurrentLock)
+    for Collection, Cards in zip(_Collections(State), CardLists):
+        for C in Cards:
+            Collection.AddCard(C)
+    State.SetScore(Score)
+    State.SetNumLocksSolved(LocksSolved)
+    State.SetTurns(Turns)
+    if GameOver:
+        State.EndGame(EndCause)
+    if Pending is not None:
+        PendingNumber, CardChoice = Pending
+        Pos = State.GetDiscard().GetPositionOf(PendingNumber)
+        if Pos is None:
+            raise SaveGameError("the pending difficulty card is not on the discard pile")
+        State.SetPendingDifficulty(State.GetDiscard().GetCards()[Pos], CardChoice)
+    return State
+
+
+def _PackWords(TypeCode, Values):
+    Words = array.array(TypeCode, Values)
+    if sys.byteorder == "big":
+        Words.byteswap()  # saves are little endian
+    return Words.tobytes()
+
+
+def _UnpackWords(TypeCode, Data, Offset, Count):
+    Words = array.array(TypeCode)
+    End = Offset + Count * Words.itemsize
+    if End > len(Data):
+        raise SaveGameError("save game is truncated")
+    Words.frombytes(Data[Offset:End])
+    if sys.byteorder == "big":
+        Words.byteswap()
+    return Words, End
+
+
+def SaveGame(State, IncludeRng=True):
+    """the game as compact bytes, include the random state to carry on exactly where it left off"""
+    Descriptions = {}  # description -> index into the table written at the front
+    Locks, CurrentLock, LooseLock = _SavedLocks(State)
+    Flags = (_FLAG_GAME_OVER if State.GetGameOver() else 0) | (_FLAG_RNG if IncludeRng else 0) | (_FLAG_LOOSE_LOCK if LooseLock else 0)
+    PendingNumber, CardChoice = -1, 0
+    if State.GetDifficultyPending():
+        Flags |= _FLAG_DIFFICULTY_PENDING
+        PendingCard, CardChoice = State.GetPendingDifficulty()
+        PendingNumber = PendingCard.GetCardNumber()
+
+    Body = []
+    for Collection in _Collections(State):
+        Cards = Collection.GetCards()
+        Body.append(_COUNT.pack(len(Cards)))
+        Body.append(_PackWords("H", [Descriptions.setdefault(C.GetDescription(), len(Descriptions)) for C in Cards]))
+        Body.append(_PackWords("I", [C.GetCardNumber() for C in Cards]))
+    Body.append(_COUNT.pack(len(Locks)))
+    for ThisLock in Locks:
+        Body.append(_COUNT.pack(ThisLock.GetNumberOfChallenges()))
+        for C in ThisLock.GetChallenges():
+            Body.append(_CHALLENGE.pack(C.GetMet(), len(C.GetCondition())))
+            Body.append(_PackWords("H", [Descriptions.setdefault(D, len(Descriptions)) for D in C.GetCondition()]))
+    if IncludeRng:
+        Version, Words, GaussNext = State.GetRng().getstate()
+        Body.append(_PackWords("I", Words))
+        Body.append(_RNG_TAIL.pack(GaussNext is not None, GaussNext or 0.0))
+
+    Table = [_COUNT.pack(len(Descriptions))]
+    for Description in Descriptions:
+        Encoded = Description.encode("utf-8")
+        Table.append(_COUNT.pack(len(Encoded)) + Encoded)
+    Header = _HEADER.pack(SAVE_MAGIC, SAVE_VERSION, Flags, State.GetScore(), State.GetNumLocksSolved(), State.GetTurns(),
+                          END_CAUSES.index(State.GetEndCause()), CurrentLock, PendingNumber, CardChoice)
+    return b"".join([Header] + Table + Body)
+
+
+def LoadGame(Data):
+    """rebuild a GameState from the bytes made by SaveGame"""
+    try:
+        Magic, Version, Flags, Score, LocksSolved, Turns, EndCause, CurrentLock, PendingNumber, CardChoice = _HEADER.unpack_from(Data, 0)
+        if Magic != SAVE_MAGIC:
+            raise SaveGameError("not a breakthrough save game")
+        if Version != SAVE_VERSION:
+            raise SaveGameError(f'save game version {Version} is not supported (expected {SAVE_VERSION})')
+        Offset = _HEADER.size
+        (Count,) = _COUNT.unpack_from(Data, Offset)
+        Offset += _COUNT.size
+        Descriptions = []
+        for Index in range(Count):
+            (Length,) = _COUNT.unpack_from(Data, Offset)
+            Offset += _COUNT.size
+            Descriptions.append(bytes(Data[Offset:Offset + Length]).decode("utf-8"))
+            Offset += Length
+
+        CardLists = []
+        for Collection in range(4):
+            (Count,) = _COUNT.unpack_from(Data, Offset)
+            Codes, Offset = _UnpackWords("H", Data, Offset + _COUNT.size, Count)
+            Numbers, Offset = _UnpackWords("I", Data, Offset, Count)
+            CardLists.append([_NewCard(Descriptions[Code], Number) for Code, Number in zip(Codes, Numbers)])
+
+        Locks = []
+        (Count,) = _COUNT.unpack_from(Data, Offset)
+        Offset += _COUNT.size
+        for Index in range(Count):
+            ThisLock = Lock()
+            (Challenges,) = _COUNT.unpack_from(Data, Offset)
+            Offset += _COUNT.size
+            for Pos in range(Challenges):
+                Met, Length = _CHALLENGE.unpack_from(Data, Offset)
+                Condition, Offset = _UnpackWords("H", Data, Offset + _CHALLENGE.size, Length)
+                ThisLock.AddChallenge([Descriptions[Code] for Code in Condition])
+                ThisLock.SetChallengeMet(Pos, bool(Met))
+            Locks.append(ThisLock)
+
+        Rng = random.Random()
+        if Flags & _FLAG_RNG:
+            Words, Offset = _UnpackWords("I", Data, Offset, _MT_WORDS)
+            HasGauss, GaussNext = _RNG_TAIL.unpack_from(Data, Offset)
+            Rng = _RestoreRng(Words, GaussNext if HasGauss else None)
+        Cause = END_CAUSES[EndCause]
+    except (struct.error, IndexError, UnicodeDecodeError) as Error:
+        raise SaveGameError(f'save game is corrupt: {Error}') from Error
+
+    Pending = (PendingNumber, CardChoice) if Flags & _FLAG_DIFFICULTY_PENDING else None
+    return _BuildState(Locks, CurrentLock, bool(Flags & _FLAG_LOOSE_LOCK), Rng, CardLists, Score, LocksSolved, Turns,
+                       bool(Flags & _FLAG_GAME_OVER), Cause, Pending)
+
+
+def SaveGameJson(State, IncludeRng=False):
+    """the same content as SaveGame, readable for debugging"""
+    Locks, CurrentLock, LooseLock = _SavedLocks(State)
+    Saved = {"version": SAVE_VERSION, "score": State.GetScore(), "locks_solved": State.GetNumLocksSolved(),
+             "turns": State.GetTurns(), "game_over": State.GetGameOver(), "end_cause": State.GetEndCause()}
+    for Collection in _Collections(State):
+        Saved[Collection.GetName().lower()] = [[C.GetDescription(), C.GetCardNumber()] for C in Collection.GetCards()]
+    Saved["locks"] = [[{"condition": C.GetCondition(), "met": C.GetMet()} for C in L.GetChallenges()] for L in Locks]
+    Saved["current_lock"] = CurrentLock
+    Saved["loose_lock"] = LooseLock
+    if State.GetDifficultyPending():
+        PendingCard, CardChoice = State.GetPendingDifficulty()
+        Saved["pending_difficulty"] = [PendingCard.GetCardNumber(), CardChoice]
+    if IncludeRng:
+        Saved["rng"] = list(State.GetRng().getstate()[1]) + [State.GetRng().getstate()[2]]
+    return json.dumps(Saved, indent=1)
+
+
+def LoadGameJson(Text):
+    try:
+        Saved = json.loads(Text)
+        if Saved.get("version") != SAVE_VERSION:
+            raise SaveGameError(f'save game version {Saved.get("version")} is not supported (expected {SAVE_VERSION})')
+        CardLists = [[_NewCard(Description, int(Number)) for Description, Number in Saved[Name]]
+                     for Name in ("hand", "sequence", "discard", "deck")]
+        Locks = []
+        for Challenges in Saved["locks"]:
+            ThisLock = Lock()
+            for Pos, C in enumerate(Challenges):
+                ThisLock.AddChallenge([str(D) for D in C["condition"]])
+                ThisLock.SetChallengeMet(Pos, bool(C["met"]))
+            Locks.append(ThisLock)
+        Rng = random.Random()
+        if "rng" in Saved:
+            if not isinstance(Saved["rng"], list) or len(Saved["rng"]) != _MT_WORDS + 1:
+                raise SaveGameError(f'random state should be {_MT_WORDS} words and gauss_next')
+            Rng = _RestoreRng(Saved["rng"][:_MT_WORDS], Saved["rng"][_MT_WORDS])
+        if Saved["end_cause"] not in END_CAUSES:
+            raise SaveGameError(f'{Saved["end_cause"]!r} is not a way for a game to end')
+        Pending = tuple(Saved["pending_difficulty"]) if "pending_difficulty" in Saved else None
+        return _BuildState(Locks, int(Saved["current_lock"]), bool(Saved["loose_lock"]), Rng, CardLists, int(Saved["score"]),
+                           int(Saved["locks_solved"]), int(Saved["turns"]), bool(Saved["game_over"]), Saved["end_cause"], Pending)
+    except (json.JSONDecodeError, KeyError, IndexError, TypeError, ValueError) as Error:
+        if isinstance(Error, SaveGameError):
+            raise
+        raise SaveGameError(f'save game is corrupt: {Error}') from Error
+
+
+def _ParseTextCards(LineFromFile):
+    Cards = []
+    if len(LineFromFile) > 0:
+        for Item in LineFromFile.split(","):  # each item is the description then the card number
+            Description, Space, CardNumber = Item.rpartition(" ")
+            if not CardNumber.isdigit():
+                raise SaveGameError(f'{Item!r} is not a card and number')
+            Cards.append(_NewCard(Description, int(CardNumber)))
+    return Cards
+
+
+def LoadTextGame(Text, Locks):
+    """the original text format: score, lock, lock progress (Y/N), hand, sequence, discard, deck"""
+    Lines = [Line.rstrip() for Line in Text.split("\n")]
+    if len(Lines) < 7:
+        raise SaveGameError("text save game should have 7 lines")
+    if not Lines[0].lstrip("-").isdigit():
+        raise SaveGameError(f'{Lines[0]!r} is not a score')
+    CurrentLock = ParseLock(Lines[1])
+    for Pos, Met in enumerate(Lines[2].split(";")):
+        if Pos < CurrentLock.GetNumberOfChallenges():
+            CurrentLock.SetChallengeMet(Pos, Met == "Y")
+    CardLists = [_ParseTextCards(Line) for Line in Lines[3:7]]
+    return _BuildState(Locks + [CurrentLock], len(Locks), True, None, CardLists, int(Lines[0]), 0, 0, False, None, None)
+
+
+def WriteGameFile(State, FileName, AsJson=False):
+    if AsJson:
+        with open(FileName, "w") as f:
+            f.write(SaveGameJson(State, IncludeRng=True))
+    else:
+        with open(FileName, "wb") as f:
+            f.write(SaveGame(State))
+
+
+def ReadGameFile(FileName, Locks=None):
+    """load any save game, Locks are used by the text format which only records the current lock"""
+    with open(FileName, "rb") as f:
+        Data = f.read()
+    if Data.startswith(SAVE_MAGIC):
+        return LoadGame(Data)
+    try:
+        Text = Data.decode("utf-8")
+    except UnicodeDecodeError as Error:
+        raise SaveGameError("not a breakthrough save game") from Error
+    if Text.lstrip().startswith("{"):
+        return LoadGameJson(Text)
+    return LoadTextGame(Text, Locks or [])
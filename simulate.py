@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# batch simulator - plays seeded headless games across a process pool and aggregates the results
+# as they stream back, used for tuning assets/locks.txt and the deck composition
+import argparse
+import csv
+import functools
+import multiprocessing
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from engine import *
+from lock_catalogue import LockCatalogue
+from mcts import MCTSAgent
+
+AGENTS = {"random": RandomAgent, "greedy": GreedyAgent, "mcts": MCTSAgent}
+
+
+@dataclass
+class GameResult:
+    Seed: int
+    Score: int
+    LocksSolved: int
+    Turns: int
+    EndCause: str
+
+
+@dataclass
+class SimulationConfig:
+    LocksFile: str = "assets/locks.txt"
+    AgentName: str = "random"
+    DeckComposition: list = field(default_factory=lambda: STANDARD_DECK)
+    DifficultyCards: int = DIFFICULTY_CARDS
+    MaxTurns: int = 10000
+    LazyLocks: bool = False  # for very large generated lock files
+    LockCacheDir: str = None
+    AgentOptions: dict = field(default_factory=dict)  # keyword arguments for the agent, e.g. MCTS budgets
+
+
+class SimulationSummary():  # running totals, so results never have to be held in memory
+    def __init__(self):
+        self._Games = 0
+        self._TotalScore = 0
+        self._TotalScoreSquared = 0
+        self._TotalLocksSolved = 0
+        self._TotalTurns = 0
+        self._MinScore = None
+        self._MaxScore = None
+        self._LocksSolvedCounts = {}
+        self._EndCauseCounts = {}
+
+    def Add(self, Result):
+        self._Games += 1
+        self._TotalScore += Result.Score
+        self._TotalScoreSquared += Result.Score * Result.Score
+        self._TotalLocksSolved += Result.LocksSolved
+        self._TotalTurns += Result.Turns
+        if self._MinScore is None or Result.Score < self._MinScore:
+            self._MinScore = Result.Score
+        if self._MaxScore is None or Result.Score > self._MaxScore:
+            self._MaxScore = Result.Score
+        self._LocksSolvedCounts[Result.LocksSolved] = self._LocksSolvedCounts.get(Result.LocksSolved, 0) + 1
+        self._EndCauseCounts[Result.EndCause] = self._EndCauseCounts.get(Result.EndCause, 0) + 1
+
+    def GetGames(self):
+        return self._Games
+
+    def GetMeanScore(self):
+        return self._TotalScore / self._Games if self._Games > 0 else 0
+
+    def GetScoreStdDev(self):
+        if self._Games == 0:
+            return 0
+        Mean = self.GetMeanScore()
+        return max(0, self._TotalScoreSquared / self._Games - Mean * Mean) ** 0.5
+
+    def GetEndCauseCounts(self):
+        return dict(self._EndCauseCounts)
+
+    def GetLocksSolvedCounts(self):
+        return dict(self._LocksSolvedCounts)
+
+    def GetReport(self):
+        if self._Games == 0:
+            return "No games played.\n"
+        Report = f'Games played:        {self._Games}\n'
+        Report += f'Score:               mean {self.GetMeanScore():.2f}, sd {self.GetScoreStdDev():.2f}, min {self._MinScore}, max {self._MaxScore}\n'
+        Report += f'Locks solved:        mean {self._TotalLocksSolved / self._Games:.3f}\n'
+        Report += f'Turns:               mean {self._TotalTurns / self._Games:.1f}\n'
+        Report += "Locks solved counts: " + ", ".join(f'{k}: {v}' for k, v in sorted(self._LocksSolvedCounts.items())) + "\n"
+        Report += "End causes:          " + ", ".join(f'{k}: {v}' for k, v in sorted(self._EndCauseCounts.items())) + "\n"
+        return Report
+
+
+@functools.lru_cache(maxsize=4)
+def _GetCatalogue(LocksFile, LazyLocks, LockCacheDir):
+    return LockCatalogue(LocksFile, LazyLocks, LockCacheDir)  # loaded once per worker process
+
+
+def PlaySeededGame(Seed, Config, Locks):
+    State = GameState(Locks, random.Random(Seed))  # games play fresh copies of the locks, so they can be shared
+    State.SetupStandardGame(Config.DeckComposition, Config.DifficultyCards)
+    Player = AGENTS[Config.AgentName](random.Random(f'agent-{Seed}'), **Config.AgentOptions)  # kept apart from the deck's random stream
+    PlayHeadlessGame(State, Player, Config.MaxTurns)
+    return GameResult(Seed, State.GetScore(), State.GetNumLocksSolved(), State.GetTurns(), State.GetEndCause())
+
+
+def _RunChunk(Task):
+    FirstSeed, NumGames, Config = Task
+    Locks = _GetCatalogue(Config.LocksFile, Config.LazyLocks, Config.LockCacheDir)
+    return [PlaySeededGame(Seed, Config, Locks) for Seed in range(FirstSeed, FirstSeed + NumGames)]
+
+
+def IterateResults(NumGames, Seed=0, Config=None, Workers=None, ChunkSize=250):
+    """yield a list of GameResults per finished chunk, games are seeded Seed, Seed + 1, ..."""
+    Config = Config or SimulationConfig()
+    Tasks = ((First, min(ChunkSize, Seed + NumGames - First), Config) for First in range(Seed, Seed + NumGames, ChunkSize))
+    if Workers == 1:  # useful under a profiler
+        for Task in Tasks:
+            yield _RunChunk(Task)
+        return
+    with multiprocessing.Pool(Workers) as Pool:
+        for Chunk in Pool.imap_unordered(_RunChunk, Tasks):
+            yield Chunk
+
+
+def Simulate(NumGames, Seed=0, Config=None, Workers=None, ChunkSize=250, ResultWriter=None):
+    Summary = SimulationSummary()
+    for Chunk in IterateResults(NumGames, Seed, Config, Workers, ChunkSize):
+        for Result in Chunk:
+            Summary.Add(Result)
+            if ResultWriter is not None:
+                ResultWriter.writerow([Result.Seed, Result.Score, Result.LocksSolved, Result.Turns, Result.EndCause])
+    return Summary
+
+
+def ParseDeckComposition(Spec):
+    """'P:5,F:3,K:3' gives that many copies of each kit (a, b, c) of each tool"""
+    Composition = []
+    for Item in Spec.split(","):
+        ToolType, Copies = Item.split(":")
+        Composition.append((int(Copies), [(ToolType.strip(), Kit) for Kit in ("a", "b", "c")]))
+    return Composition
+
+
+def Main(Args):
+    Parser = argparse.ArgumentParser(description="Simulate many headless games of Breakthrough.")
+    Parser.add_argument("games", type=int, help="number of games to play")
+    Parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    Parser.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores)")
+    Parser.add_argument("--chunk-size", type=int, default=250, help="games per task sent to a worker")
+    Parser.add_argument("--agent", choices=sorted(AGENTS), default="random")
+    Parser.add_argument("--locks", default="assets/locks.txt", help="lock file to play with")
+    Parser.add_argument("--lazy-locks", action="store_true", help="read locks from the file as they are needed")
+    Parser.add_argument("--lock-cache", default=None, help="directory to cache the parsed lock file in")
+    Parser.add_argument("--deck", default=None, help="deck composition, e.g. P:5,F:3,K:3")
+    Parser.add_argument("--difficulty", type=int, default=DIFFICULTY_CARDS, help="difficulty cards added per starting hand card")
+    Parser.add_argument("--max-turns", type=int, default=10000)
+    Parser.add_argument("--output", default=None, help="stream per-game results to this csv file")
+    Parser.add_argument("--mcts-playouts", type=int, default=None, help="mcts agent: playouts per move")
+    Parser.add_argument("--mcts-time", type=float, default=None, help="mcts agent: seconds per move (results then depend on machine load)")
+    Options = Parser.parse_args(Args)
+
+    Config = SimulationConfig(Options.locks, Options.agent, STANDARD_DECK, Options.difficulty, Options.max_turns,
+                              Options.lazy_locks, Options.lock_cache)
+    if Options.deck is not None:
+        Config.DeckComposition = ParseDeckComposition(Options.deck)
+    if Options.mcts_playouts is not None:
+        Config.AgentOptions["Playouts"] = Options.mcts_playouts
+    if Options.mcts_time is not None:
+        Config.AgentOptions["TimeLimit"] = Options.mcts_time
+
+    StartTime = time.perf_counter()
+    if Options.output is not None:
+        with open(Options.output, "w", newline="") as f:
+            Writer = csv.writer(f)
+            Writer.writerow(["seed", "score", "locks_solved", "turns", "end_cause"])
+            Summary = Simulate(Options.games, Options.seed, Config, Options.workers, Options.chunk_size, Writer)
+    else:
+        Summary = Simulate(Options.games, Options.seed, Config, Options.workers, Options.chunk_size)
+    Elapsed = time.perf_counter() - StartTime
+    print(Summary.GetReport(), end="")
+    print(f'Elapsed:             {Elapsed:.2f}s ({Summary.GetGames() / Elapsed:.1f} games/second)')
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
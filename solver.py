@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# exact solver - once the deck is shuffled a game is fixed by its random stream, so from the host's side it
+# is a perfect information puzzle. finds the best score reachable from a position by a memoized search over
+# a compact copy of the rules, to grade players and agents against the true optimum of each dealt game
+import argparse
+import random
+import sys
+import time
+from engine import *
+from savegame import ReadGameFile, SaveGameError
+from simulate import AGENTS, ParseDeckComposition
+from mcts import DescribeAction
+
+
+class SolverLimitReached(Exception):
+    pass
+
+
+def CopyRng(Rng):
+    """a Random in the same state, so solving or replaying a game leaves its own stream untouched"""
+    Copy = random.Random()
+    Copy.setstate(Rng.getstate())
+    return Copy
+
+
+_CODE_BYTES = [bytes((Code,)) for Code in range(256)]  # one-card byte strings, so the hot path never builds them
+
+
+class _Epoch():  # the stretch of a game between two reshuffles: the deck, lock and random stream it started with
+    __slots__ = ("Deck", "RngState", "Matcher", "NumberOfChallenges", "Shuffles")
+
+    def __init__(self, Deck, RngState, Matcher, NumberOfChallenges):
+        self.Deck = Deck  # card codes, drawn from the front
+        self.RngState = RngState  # only used when the next lock is solved
+        self.Matcher = Matcher  # card codes -> positions of the challenges with that condition
+        self.NumberOfChallenges = NumberOfChallenges
+        self.Shuffles = {}  # cards shuffled -> (order they end up in, next lock, random state after)
+
+
+class Solver():
+    """best final score from a position, assuming the deck order and the game's Rng are known - positions are
+    canonical (the hand as a multiset, only the last three sequence cards), moves are told apart by card code
+    and the discard pile's order is only part of a position when a reshuffle can still be reached from it"""
+
+    def __init__(self, Locks, MaxEntries=1000000, MaxNodes=None):
+        self._Locks = Locks
+        self._MaxEntries = MaxEntries  # positions remembered, the least searched half is forgotten when full
+        self._MaxNodes = MaxNodes  # positions expanded by one Solve before giving up, None for no limit
+        self._Table = {}  # position key -> (future points, positions expanded to find them)
+        self._Epochs = {}  # (deck, lock, random state), or (epoch, deck) after a reshuffle -> epoch id
+        self._EpochList = []
+        self._Matchers = {}  # lock index -> matcher
+        self._Nodes = 0
+        self._Limit = None
+        self._LastSolve = {}
+
+    def Solve(self, State):
+        """the highest score the game can finish with from here"""
+        if len(CARD_DESCRIPTIONS) > 256:
+            raise ValueError("the solver packs card codes into bytes, a game can have at most 255 kinds of tool card")
+        Position = self.__GetPosition(State)
+        if Position is None:
+            return State.GetScore()
+        StartTime = time.perf_counter()
+        self._Limit = None if self._MaxNodes is None else self._Nodes + self._MaxNodes
+        StartNodes = self._Nodes
+        RecursionLimit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(RecursionLimit, 100000))  # one frame per turn of the longest game searched
+        try:
+            Value = State.GetScore() + self.__Search(Position)[0]
+        finally:
+            sys.setrecursionlimit(RecursionLimit)
+        Elapsed = time.perf_counter() - StartTime
+        self._LastSolve = {"score": Value, "nodes": self._Nodes - StartNodes, "seconds": Elapsed, "entries": len(self._Table)}
+        return Value
+
+    def GetLastSolve(self):
+        """score, positions expanded, seconds and table size of the last Solve"""
+        return dict(self._LastSolve)
+
+    def GetBestAction(self, State):
+        """an action that keeps the best score reachable"""
+        Target = self.Solve(State) - State.GetScore()
+        Position = self.__GetPosition(State)
+        LegalActions = State.GetLegalActions()
+        for Move in LegalActions:
+            Gain, Child, Solved = self.__Apply(Position, self.__GetMoveKey(State, Move))
+            if Child is not None:
+                Gain += self.__Search(Child)[0]
+            if Gain == Target:
+                return Move
+        return LegalActions[0]
+
+    def __GetMoveKey(self, State, Move):
+        if Move.Kind == DISCARD_FIVE:
+            return (DISCARD_FIVE, -1)
+        if Move.Kind == LOSE_KEY:
+            return (LOSE_KEY, State.GetHand().GetCardCodeAt(Move.Position))
+        return (Move.Kind, State.GetHand().GetCardCodeAt(Move.Position - 1))
+
+    def __GetMatcher(self, ThisLock):
+        Codes = {Description: Code for Code, Description in enumerate(CARD_DESCRIPTIONS)}
+        Matcher = {}
+        for Condition, Positions in ThisLock.GetTemplate().GetMatcher().items():
+            if all(D in Codes for D in Condition):  # a card nobody has can never meet it
+                Matcher[bytes(Codes[D] for D in Condition)] = Positions
+        return Matcher
+
+    def __GetEpoch(self, Key, Deck, RngState, ThisLock, LockIndex):
+        EpochId = self._Epochs.get(Key)
+        if EpochId is None:
+            if LockIndex is None:
+                Matcher = self.__GetMatcher(ThisLock)
+            else:
+                Matcher = self._Matchers.get(LockIndex)
+                if Matcher is None:
+                    Matcher = self._Matchers[LockIndex] = self.__GetMatcher(ThisLock)
+            EpochId = self._Epochs[Key] = len(self._EpochList)
+            self._EpochList.append(_Epoch(Deck, RngState, Matcher, ThisLock.GetNumberOfChallenges()))
+        return EpochId
+
+    def __Reshuffle(self, EpochId, Cards):
+        """the epoch a solved lock starts, Cards being the rest of the deck then the discard pile - the shuffle
+        only depends on the random state and how many cards there are, so it is worked out once per length"""
+        Epoch = self._EpochList[EpochId]
+        Shuffle = Epoch.Shuffles.get(len(Cards))
+        if Shuffle is None:
+            Rng = random.Random()
+            Rng.setstate(Epoch.RngState)
+            Order = list(range(len(Cards)))
+            Rng.shuffle(Order)
+            LockIndex = Rng.randrange(len(self._Locks))
+            Shuffle = Epoch.Shuffles[len(Cards)] = (Order, LockIndex, Rng.getstate())
+        Order, LockIndex, RngState = Shuffle
+        Deck = bytes(Cards[Pos] for Pos in Order)
+        return self.__GetEpoch((EpochId, Deck), Deck, RngState, self._Locks[LockIndex], LockIndex)
+
+    def __GetPosition(self, State):
+        """(epoch, cards drawn, hand, sequence tail, met mask, pending, discard pile) for a GameState"""
+        if State.GetGameOver():
+            return None
+        Hand, Sequence, Discard, Deck = State.GetHand(), State.GetSequence(), State.GetDiscard(), State.GetDeck()
+        CurrentLock = State.GetCurrentLock()
+        MetMask = 0
+        for Pos in range(CurrentLock.GetNumberOfChallenges()):
+            if CurrentLock.GetChallengeMet(Pos):
+                MetMask |= 1 << Pos
+        Pending = 0  # 1 when a played card waits on a difficulty card, 2 for a discarded one
+        if State.GetDifficultyPending():
+            Pending = 1 if State.GetPendingChallengeCheck() else 2
+        NumberOfCards = Sequence.GetNumberOfCards()
+        DeckCodes = bytes(Deck.GetCardCodeAt(Pos) for Pos in range(Deck.GetNumberOfCards()))
+        RngState = State.GetRng().getstate()
+        LockIndex = State.GetCurrentLockIndex()
+        EpochId = self.__GetEpoch((DeckCodes, LockIndex if LockIndex is not None else id(CurrentLock), RngState),
+                                  DeckCodes, RngState, CurrentLock, LockIndex)
+        return (EpochId, 0, bytes(sorted(Hand.GetCardCodeAt(Pos) for Pos in range(Hand.GetNumberOfCards()))),
+                bytes(Sequence.GetCardCodeAt(Pos) for Pos in range(max(0, NumberOfCards - 3), NumberOfCards)),
+                MetMask, Pending, bytes(Discard.GetCardCodeAt(Pos) for Pos in range(Discard.GetNumberOfCards())))
+
+    def __Search(self, Position):
+        """(future points, whether they depend on the discard pile's order, positions expanded)"""
+        Key = Position[:6]
+        Entry = self._Table.get(Key)
+        if Entry is not None:
+            return Entry[0], False, 0
+        FullKey = Position
+        Entry = self._Table.get(FullKey)
+        if Entry is not None:
+            return Entry[0], True, 0
+        self._Nodes += 1
+        if self._Limit is not None and self._Nodes > self._Limit:
+            raise SolverLimitReached(f'gave up after {self._MaxNodes} positions')
+        Best, DependsOnDiscard, Work = 0, False, 1
+        for MoveKey in self.__GetMoveKeys(Position):
+            Gain, Child, Solved = self.__Apply(Position, MoveKey)
+            if Solved:
+                DependsOnDiscard = True  # the discard pile was shuffled back into the deck
+            if Child is not None:
+                Value, ChildDepends, ChildWork = self.__Search(Child)
+                Gain += Value
+                Work += ChildWork
+                if ChildDepends and not Solved:
+                    DependsOnDiscard = True
+            if Gain > Best:
+                Best = Gain
+        if len(self._Table) >= self._MaxEntries:
+            self.__Forget()
+        self._Table[FullKey if DependsOnDiscard else Key] = (Best, Work)
+        return Best, DependsOnDiscard, Work
+
+    def __Forget(self):
+        """drop the half of the table that took least work to find"""
+        Works = sorted(Entry[1] for Entry in self._Table.values())
+        Threshold = Works[len(Works) // 2]
+        self._Table = {Key: Entry for Key, Entry in self._Table.items() if Entry[1] > Threshold}
+
+    def __GetMoveKeys(self, Position):
+        EpochId, Drawn, Hand, Tail, MetMask, Pending, Discard = Position
+        if Pending != 0:
+            return [(LOSE_KEY, Code) for Pos, Code in enumerate(Hand)
+                    if CARD_TOOL_TYPES[Code] == "K" and (Pos == 0 or Hand[Pos - 1] != Code)] + [(DISCARD_FIVE, -1)]
+        MoveKeys = []
+        for Pos, Code in enumerate(Hand):
+            if Pos > 0 and Hand[Pos - 1] == Code:
+                continue
+            if len(Tail) == 0 or CARD_TOOL_TYPES[Code] != CARD_TOOL_TYPES[Tail[-1]]:
+                MoveKeys.append((PLAY_CARD, Code))
+            MoveKeys.append((DISCARD_CARD, Code))
+        return MoveKeys
+
+    def __Apply(self, Position, MoveKey):
+        """(points scored, next position or None once the game is over, whether a lock was solved) - the same
+        rules as GameState.Apply on the compact position"""
+        EpochId, Drawn, Hand, Tail, MetMask, Pending, Discard = Position
+        Epoch = self._EpochList[EpochId]
+        Deck = Epoch.Deck
+        Kind, Code = MoveKey
+        Gain = 0
+        if Pending == 0:
+            Pos = Hand.index(Code)
+            Hand = Hand[:Pos] + Hand[Pos + 1:]
+            if Kind == PLAY_CARD:
+                Gain = CARD_SCORES[Code]
+                Tail = (Tail + _CODE_BYTES[Code])[-3:]
+            else:
+                Discard = Discard + _CODE_BYTES[Code]
+            CheckChallenge = Kind == PLAY_CARD
+            if Drawn < len(Deck) and Deck[Drawn] == DIFFICULTY_CODE:  # wait for the player to deal with it
+                return Gain, (EpochId, Drawn + 1, Hand, Tail, MetMask, 1 if CheckChallenge else 2, Discard + _CODE_BYTES[DIFFICULTY_CODE]), False
+        else:
+            CheckChallenge = Pending == 1
+            if Kind == LOSE_KEY:
+                Pos = Hand.index(Code)
+                Hand = Hand[:Pos] + Hand[Pos + 1:]
+                Discard = Discard + _CODE_BYTES[Code]
+            else:
+                Discard = Discard + Deck[Drawn:Drawn + 5]
+                Drawn = min(len(Deck), Drawn + 5)
+        if len(Hand) < HAND_SIZE and Drawn < len(Deck):  # refill the hand
+            Hand = list(Hand)
+            while len(Hand) < HAND_SIZE and Drawn < len(Deck):
+                if Deck[Drawn] == DIFFICULTY_CODE:
+                    Discard = Discard + _CODE_BYTES[DIFFICULTY_CODE]
+                else:
+                    Hand.append(Deck[Drawn])
+                Drawn += 1
+            Hand = bytes(sorted(Hand))
+        GameOver = Drawn == len(Deck) and len(Hand) < HAND_SIZE
+        if CheckChallenge:
+            MetMask, Met = self.__CheckTail(Epoch, Tail, MetMask)
+            if Met:
+                Gain += 5
+        if MetMask == (1 << Epoch.NumberOfChallenges) - 1:  # solved, the discard pile is shuffled back in
+            Gain += 10
+            Cards = Deck[Drawn:] + Discard
+            if len(Cards) == 0:
+                return Gain, None, True
+            EpochId = self.__Reshuffle(EpochId, Cards)
+            MetMask, Met = self.__CheckTail(self._EpochList[EpochId], Tail, 0)
+            return Gain, (EpochId, 0, Hand, Tail, MetMask, 0, b''), True
+        if GameOver:
+            return Gain, None, False
+        MetMask, Met = self.__CheckTail(Epoch, Tail, MetMask)  # checked again before every turn
+        return Gain, (EpochId, Drawn, Hand, Tail, MetMask, 0, Discard), False
+
+    def __CheckTail(self, Epoch, Tail, MetMask):
+        """GameState.CheckIfLockChallengeMet - marks the first unmet challenge the last one, two or three cards meet"""
+        for Length in range(1, len(Tail) + 1):
+            for Pos in Epoch.Matcher.get(Tail[len(Tail) - Length:], ()):
+                if not MetMask & (1 << Pos):
+                    return MetMask | (1 << Pos), True
+        return MetMask, False
+
+
+class OracleAgent(Agent):
+    """plays perfectly by solving the game it is given, deck order and random stream included - a yardstick,
+    not a fair opponent"""
+
+    def __init__(self, Rng=None, GameSolver=None):
+        super().__init__(Rng)
+        self._Solver = GameSolver  # pass the one that solved the game to reuse what it found
+
+    def ChooseAction(self, State, LegalActions):
+        if self._Solver is None:
+            self._Solver = Solver(State.GetLocks())
+        if len(LegalActions) == 1:
+            return LegalActions[0]
+        return self._Solver.GetBestAction(State)
+
+
+def Main(Args):
+    Parser = argparse.ArgumentParser(description="Solve seeded games exactly and grade an agent against the optimum.")
+    Parser.add_argument("games", type=int, nargs="?", default=10)
+    Parser.add_argument("--seed", type=int, default=0)
+    Parser.add_argument("--agent", choices=sorted(AGENTS), default="greedy", help="agent to grade")
+    Parser.add_argument("--deck", default=None, help="deck composition, e.g. P:2,F:1,K:1 - small decks solve far faster")
+    Parser.add_argument("--difficulty", type=int, default=DIFFICULTY_CARDS, help="difficulty cards added per starting hand card")
+    Parser.add_argument("--max-entries", type=int, default=1000000, help="positions the solver remembers (about 300MB a million)")
+    Parser.add_argument("--max-nodes", type=int, default=2000000, help="give up on a game after expanding this many positions")
+    Parser.add_argument("--check", action="store_true", help="replay each optimum through the engine to confirm it")
+    Parser.add_argument("--game", default=None, help="solve this save game from where it was left instead (it must include the Rng)")
+    Options = Parser.parse_args(Args)
+
+    Locks = LoadLocks()
+    if Options.game is not None:
+        try:
+            State = ReadGameFile(Options.game, Locks)
+        except (OSError, SaveGameError) as Error:
+            raise SystemExit(f'could not load {Options.game}: {Error}')
+        ThisSolver = Solver(State.GetLocks(), Options.max_entries, Options.max_nodes)
+        try:
+            Optimum = ThisSolver.Solve(State)
+        except SolverLimitReached:
+            raise SystemExit(f'score {State.GetScore()}, best reachable unknown (gave up after {Options.max_nodes} positions)')
+        BestMove = "" if State.GetGameOver() else f', best move: {DescribeAction(ThisSolver.GetBestAction(State))}'
+        print(f'score {State.GetScore()}, best reachable {Optimum}{BestMove}')
+        return
+    DeckComposition = STANDARD_DECK if Options.deck is None else ParseDeckComposition(Options.deck)
+    Solved, TotalOptimum, TotalScore, TotalSeconds = 0, 0, 0, 0.0
+    for Seed in range(Options.seed, Options.seed + Options.games):
+        State = GameState(Locks, random.Random(Seed))
+        State.SetupStandardGame(DeckComposition, Options.difficulty)
+        Player = AGENTS[Options.agent](random.Random(f'agent-{Seed}'))
+        Score = PlayHeadlessGame(State.GetCopy(CopyRng(State.GetRng())), Player).GetScore()
+        ThisSolver = Solver(Locks, Options.max_entries, Options.max_nodes)
+        try:
+            Optimum = ThisSolver.Solve(State.GetCopy(CopyRng(State.GetRng())))
+        except SolverLimitReached:
+            print(f'seed {Seed}: {Options.agent} {Score}, optimum unknown (gave up after {Options.max_nodes} positions)')
+            continue
+        Stats = ThisSolver.GetLastSolve()
+        Check = ""
+        if Options.check:
+            Replayed = PlayHeadlessGame(State.GetCopy(CopyRng(State.GetRng())), OracleAgent(GameSolver=ThisSolver)).GetScore()
+            Check = ", replayed ok" if Replayed == Optimum else f', REPLAYED {Replayed}'
+        Solved += 1
+        TotalOptimum += Optimum
+        TotalScore += Score
+        TotalSeconds += Stats["seconds"]
+        print(f'seed {Seed}: {Options.agent} {Score}, optimum {Optimum} ({100 * Score / Optimum if Optimum > 0 else 100:.0f}%), '
+              f'{Stats["nodes"]} positions in {Stats["seconds"]:.2f}s{Check}')
+    if Solved > 0:
+        print(f'{Solved} games solved: mean optimum {TotalOptimum / Solved:.2f}, mean {Options.agent} score {TotalScore / Solved:.2f} '
+              f'({100 * TotalScore / TotalOptimum if TotalOptimum > 0 else 100:.1f}% of optimal), {TotalSeconds:.1f}s solving')
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from networking.async_server import AsyncBreakthroughServer
+from networking.standards import *
+from networking.framing import encodeFrame, encodeHello, readFrameAsync
+
+
+async def Join(Server, Lobby, Name):
+    Reader, Writer = await asyncio.open_connection("127.0.0.1", Server.port)
+    Flags, Payload = encodeHello(Name, Lobby)
+    Writer.write(encodeFrame(MSG_HELLO, Payload, Flags))
+    await Writer.drain()
+    return Reader, Writer
+
+
+async def WaitFor(Condition, Timeout=5.0):
+    Deadline = asyncio.get_running_loop().time() + Timeout
+    while asyncio.get_running_loop().time() < Deadline:
+        if Condition():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+async def ReadUntilClosed(Reader, Timeout=5.0):
+    async def Drain():
+        while await readFrameAsync(Reader) is not None:
+            pass
+    try:
+        await asyncio.wait_for(Drain(), Timeout)
+    except ConnectionResetError:
+        pass
+
+
+@pytest.mark.parametrize("Garbage", [encodeFrame(MSG_COMMAND, b''), encodeFrame(MSG_COMMAND, b'\x01\x02'),
+                                     encodeFrame(MSG_TEXT, b'\xff\xfe'), encodeFrame(MSG_STATE_UPDATE, b'\x00')])
+def test_malformed_frame_leaves_lobby(Garbage):
+    async def Run():
+        Server = AsyncBreakthroughServer("127.0.0.1", 0, seed=1)
+        await Server.start()
+        try:
+            Reader, Writer = await Join(Server, "room", "bob")
+            assert await WaitFor(lambda: Server.clientCount == 1)
+            Writer.write(Garbage)
+            await Writer.drain()
+            await ReadUntilClosed(Reader)
+            assert await WaitFor(lambda: Server.lobbyCount == 0)
+            Writer.close()
+        finally:
+            Server.close()
+    asyncio.run(Run())
+
+
+async def ReadUntil(Reader, MsgType, Timeout=5.0):
+    async def Read():
+        while True:
+            Frame = await readFrameAsync(Reader)
+            assert Frame is not None
+            if Frame[0] == MsgType:
+                return bytes(Frame[2])
+    return await asyncio.wait_for(Read(), Timeout)
+
+
+def test_only_lobby_owner_starts_game():
+    async def Run():
+        Server = AsyncBreakthroughServer("127.0.0.1", 0, seed=1)
+        await Server.start()
+        try:
+            OwnerReader, OwnerWriter = await Join(Server, "room", "alice")
+            assert await WaitFor(lambda: Server.clientCount == 1)
+            OtherReader, OtherWriter = await Join(Server, "room", "bob")
+            assert await WaitFor(lambda: Server.clientCount == 2)
+            OtherWriter.write(encodeFrame(MSG_COMMAND, bytes((SERVER_START_GAME,))))
+            while b'Only the lobby owner' not in await ReadUntil(OtherReader, MSG_TEXT):
+                pass
+            assert not Server.getLobby("room").started
+            OwnerWriter.write(encodeFrame(MSG_COMMAND, bytes((SERVER_START_GAME,))))
+            assert await ReadUntil(OwnerReader, MSG_COMMAND) == bytes((SERVER_START_GAME,))
+            assert await ReadUntil(OtherReader, MSG_COMMAND) == bytes((SERVER_START_GAME,))
+            assert Server.getLobby("room").started
+            OwnerWriter.close()
+            OtherWriter.close()
+        finally:
+            Server.close()
+    asyncio.run(Run())
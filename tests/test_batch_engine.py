@@ -0,0 +1,7 @@
+import pytest
+from batch_engine import CrossCheck
+
+
+@pytest.mark.parametrize("Policy", ["greedy", "random"])
+def test_batch_matches_scalar_engine(Policy):
+    assert CrossCheck(200, Seed=1000, Policy=Policy) == []
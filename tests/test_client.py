@@ -0,0 +1,29 @@
+import socket
+import threading
+import pytest
+from networking.client import BreakthroughClient
+from networking.standards import *
+from networking.framing import encodeFrame
+from networking.scoreboard import SCOREBOARD_ENTRY
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnhandledThreadExceptionWarning")  # the I/O thread mustn't die
+@pytest.mark.parametrize("Garbage", [encodeFrame(MSG_COMMAND, b''), encodeFrame(MSG_COMMAND, b'\x08\x08'),
+                                     encodeFrame(MSG_TEXT, b'\xff\xfe'),
+                                     encodeFrame(MSG_SCOREBOARD, SCOREBOARD_ENTRY.pack(0, 2, 1, 1) + b'\xff\xfe')])
+def test_malformed_frame_from_host_closes_connection(Garbage):
+    Listener = socket.create_server(("127.0.0.1", 0))
+    Client = BreakthroughClient("bob", f'127.0.0.1:{Listener.getsockname()[1]}')
+    IOThread = threading.Thread(target=Client.connect, daemon=True)
+    IOThread.start()
+    Host, Address = Listener.accept()
+    Host.settimeout(5)
+    Host.recv(4096)  # the hello
+    Host.sendall(Garbage)
+    IOThread.join(5)
+    assert not IOThread.is_alive()
+    assert not Client.clientActive and not Client.connected.is_set()
+    while Host.recv(4096) != b'':  # whatever was queued, then the end of the stream
+        pass
+    Host.close()
+    Listener.close()
@@ -0,0 +1,68 @@
+import random
+import pytest
+from networking.standards import *
+from networking.framing import FrameReader, ProtocolError, encodeFrame, encodeHello, decodeHello, splitRequestId, withRequestId
+
+
+class ChunkedSocket:  # hands the stream out a few random bytes at a time, as a real socket may
+    def __init__(self, data, rng):
+        self._data = data
+        self._pos = 0
+        self._rng = rng
+
+    def recv_into(self, view):
+        count = min(len(view), len(self._data) - self._pos, self._rng.randint(1, 4096))
+        view[:count] = self._data[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+
+def RandomFrames(rng, count):
+    return [(rng.randint(1, 8), rng.randint(0, 1), rng.randbytes(rng.choice([0, 1, 7, 300, RECV_BUFFER_SIZE + 17])))
+            for n in range(count)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_read_frame_round_trip(seed):
+    rng = random.Random(seed)
+    frames = RandomFrames(rng, 40)
+    reader = FrameReader(ChunkedSocket(b''.join(encodeFrame(t, p, f) for t, f, p in frames), rng), buffer_size=1024)
+    received = [(t, f, bytes(p)) for t, f, p in reader]
+    assert received == frames
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_receive_next_frame_round_trip(seed):
+    rng = random.Random(seed)
+    frames = RandomFrames(rng, 40)
+    reader = FrameReader(ChunkedSocket(b''.join(encodeFrame(t, p, f) for t, f, p in frames), rng), buffer_size=1024)
+    received = []
+    while reader.receive():
+        frame = reader.nextFrame()
+        while frame is not None:
+            received.append((frame[0], frame[1], bytes(frame[2])))
+            frame = reader.nextFrame()
+    assert received == frames
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_garbage_stream_only_raises_protocol_error(seed):
+    rng = random.Random(seed)
+    reader = FrameReader(ChunkedSocket(rng.randbytes(rng.randint(0, 5000)), rng))
+    try:
+        for frame in reader:
+            pass
+    except ProtocolError:
+        pass
+
+
+def test_hello_round_trip():
+    assert decodeHello(*encodeHello("bob")) == (DEFAULT_LOBBY, "bob")
+    assert decodeHello(*encodeHello("bob", "room 1")) == ("room 1", "bob")
+
+
+def test_request_id_round_trip():
+    assert splitRequestId(*withRequestId(1234, b'abc')) == (1234, b'abc')
+    assert splitRequestId(*withRequestId(None, b'abc')) == (None, b'abc')
+    with pytest.raises(ProtocolError):
+        splitRequestId(FRAME_HAS_REQUEST_ID, b'ab')
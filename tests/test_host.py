@@ -0,0 +1,63 @@
+import socket
+import threading
+import time
+import pytest
+from networking.server import BreakthroughHost
+from networking.standards import *
+from networking.framing import encodeFrame, encodeHello
+
+
+@pytest.fixture
+def host():
+    Host = BreakthroughHost("host", port=0, host_ip="127.0.0.1")
+    threading.Thread(target=Host.listenForClients, daemon=True).start()
+    assert Host.listening.wait(5)
+    yield Host
+    Host.serverListening = False
+
+
+def WaitFor(Condition, Timeout=5.0):
+    Deadline = time.monotonic() + Timeout
+    while time.monotonic() < Deadline:
+        if Condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def Join(Host, Name):
+    Sock = socket.create_connection(("127.0.0.1", Host.port), timeout=5)
+    Flags, Payload = encodeHello(Name)
+    Sock.sendall(encodeFrame(MSG_HELLO, Payload, Flags))
+    return Sock
+
+
+def IsClosedByPeer(Sock):
+    try:
+        while True:
+            if Sock.recv(65536) == b'':
+                return True
+    except ConnectionResetError:
+        return True
+    except socket.timeout:
+        return False
+
+
+@pytest.mark.parametrize("Garbage", [encodeFrame(MSG_COMMAND, b''), encodeFrame(MSG_COMMAND, b'\x01\x02'),
+                                     encodeFrame(MSG_TEXT, b'\xff\xfe'), encodeFrame(MSG_STATE_UPDATE, b'\x00')])
+def test_malformed_frame_disconnects_client(host, Garbage):
+    Sock = Join(host, "bob")
+    assert WaitFor(lambda: host.clientCount == 1)
+    Sock.sendall(Garbage)
+    assert WaitFor(lambda: host.clientCount == 0)
+    assert host.scoreboard.get("bob") is None
+    assert IsClosedByPeer(Sock)
+    Sock.close()
+
+
+def test_silent_connection_does_not_block_joins(host):
+    Silent = socket.create_connection(("127.0.0.1", host.port), timeout=5)
+    Sock = Join(host, "bob")
+    assert WaitFor(lambda: host.clientCount == 1, Timeout=1.0)
+    Sock.close()
+    Silent.close()
@@ -0,0 +1,90 @@
+import json
+import random
+import pytest
+from engine import *
+from savegame import SaveGame, LoadGame, SaveGameJson, LoadGameJson, SaveGameError, _RNG_TAIL
+from batch_engine import BatchGameState
+
+
+def PlayTurns(State, Player, Turns):
+    while not State.GetGameOver() and State.GetTurns() < Turns:
+        State.Apply(Player.ChooseAction(State, State.GetLegalActions()))
+    return State
+
+
+def MakeGame(Seed, Turns):
+    State = GameState(LoadLocks(), random.Random(Seed))
+    State.SetupStandardGame()
+    return PlayTurns(State, RandomAgent(random.Random(Seed)), Turns)
+
+
+@pytest.mark.parametrize("Seed", range(20))
+@pytest.mark.parametrize("Format", ["binary", "json"])
+def test_save_load_continue(Seed, Format):
+    State = MakeGame(Seed, 6)
+    if Format == "binary":
+        Loaded = LoadGame(SaveGame(State))
+    else:
+        Loaded = LoadGameJson(SaveGameJson(State, IncludeRng=True))
+    assert Loaded.GetCurrentLockIndex() == State.GetCurrentLockIndex()
+    assert [C.GetMet() for C in Loaded.GetCurrentLock().GetChallenges()] == [C.GetMet() for C in State.GetCurrentLock().GetChallenges()]
+    assert not any(C.GetMet() for L in Loaded.GetLocks() for C in L.GetChallenges())  # the locks stay fresh
+    for Collection, LoadedCollection in zip((State.GetHand(), State.GetSequence(), State.GetDiscard(), State.GetDeck()),
+                                            (Loaded.GetHand(), Loaded.GetSequence(), Loaded.GetDiscard(), Loaded.GetDeck())):
+        assert [C.GetCardNumber() for C in LoadedCollection.GetCards()] == [C.GetCardNumber() for C in Collection.GetCards()]
+        assert [C.GetCode() for C in LoadedCollection.GetCards()] == [C.GetCode() for C in Collection.GetCards()]
+    PlayTurns(State, RandomAgent(random.Random(1)), 10000)
+    PlayTurns(Loaded, RandomAgent(random.Random(1)), 10000)
+    assert (Loaded.GetScore(), Loaded.GetNumLocksSolved(), Loaded.GetTurns(), Loaded.GetEndCause()) == \
+        (State.GetScore(), State.GetNumLocksSolved(), State.GetTurns(), State.GetEndCause())
+
+
+def test_loaded_game_copies_into_batch():
+    States = [MakeGame(Seed, 4) for Seed in range(5)]
+    Loaded = [LoadGame(SaveGame(S)) for S in States if not S.GetDifficultyPending()]
+    Batch = BatchGameState.FromGameStates(Loaded)
+    assert list(Batch.CurrentLock) == [S.GetCurrentLockIndex() for S in Loaded]
+
+
+def test_loose_lock_round_trip():
+    State = MakeGame(3, 2)
+    State.SetCurrentLock(ParseLock("P a;F b,K c"))
+    State.GetCurrentLock().SetChallengeMet(0, True)
+    Loaded = LoadGame(SaveGame(State))
+    assert Loaded.GetCurrentLockIndex() is None
+    assert len(Loaded.GetLocks()) == len(State.GetLocks())
+    assert [C.GetMet() for C in Loaded.GetCurrentLock().GetChallenges()] == [True, False]
+
+
+@pytest.mark.parametrize("Seed", range(50))
+def test_corrupt_save_raises_save_game_error(Seed):
+    Data = bytearray(SaveGame(MakeGame(Seed, 3)))
+    Rng = random.Random(Seed)
+    Cut = Rng.randrange(len(Data))
+    for Count in range(3):
+        Data[Rng.randrange(4, len(Data))] = Rng.randrange(256)
+    for Broken in (bytes(Data[:Cut]), bytes(Data)):
+        try:
+            LoadGame(Broken)
+        except SaveGameError:
+            pass
+
+
+@pytest.mark.parametrize("Index", [625, 0xFFFFFFFF])
+def test_bad_rng_index_in_binary_save(Index):
+    Data = bytearray(SaveGame(MakeGame(1, 3)))
+    IndexAt = len(Data) - _RNG_TAIL.size - 4  # the random state's last word, after the other 624
+    assert int.from_bytes(Data[IndexAt:IndexAt + 4], "little") == MakeGame(1, 3).GetRng().getstate()[1][-1]
+    Data[IndexAt:IndexAt + 4] = Index.to_bytes(4, "little")
+    with pytest.raises(SaveGameError):
+        LoadGame(bytes(Data))
+
+
+@pytest.mark.parametrize("Change", [lambda Rng: Rng[:100], lambda Rng: Rng[:625], lambda Rng: Rng + [None],
+                                    lambda Rng: Rng[:624] + [625, None], lambda Rng: [-1] + Rng[1:],
+                                    lambda Rng: [1.5] + Rng[1:], lambda Rng: Rng[:625] + ["x"], lambda Rng: 7])
+def test_bad_rng_in_json_save(Change):
+    Saved = json.loads(SaveGameJson(MakeGame(1, 3), IncludeRng=True))
+    Saved["rng"] = Change(Saved["rng"])
+    with pytest.raises(SaveGameError):
+        LoadGameJson(json.dumps(Saved))
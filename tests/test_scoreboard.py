@@ -0,0 +1,47 @@
+import random
+import pytest
+from networking.scoreboard import Scoreboard
+
+
+def RandomName(Rng):
+    return "".join(Rng.choice("abcxyzé世\U0001f600") for Count in range(Rng.randint(1, 12)))
+
+
+@pytest.mark.parametrize("Seed", range(20))
+def test_changes_round_trip(Seed):
+    Rng = random.Random(Seed)
+    Host, Client = Scoreboard(), Scoreboard()
+    Names = [RandomName(Rng) for Count in range(8)]
+    for Step in range(50):
+        Name = Rng.choice(Names)
+        if Rng.random() < 0.2:
+            Host.remove(Name)
+        else:
+            Host.update(Name, {'score': Rng.randint(-5, 100), 'locksSolved': Rng.randint(0, 20)})
+        if Rng.random() < 0.3:
+            Client.applyChanges(Host.takeChanges())
+            assert Client.snapshot() == Host.snapshot()
+    Client.applyChanges(Host.takeChanges())
+    assert Client.snapshot() == Host.snapshot()
+    assert not Host.hasChanges()
+    Joiner = Scoreboard()
+    Joiner.applyChanges(Host.encodeAll())
+    assert Joiner.snapshot() == Host.snapshot()
+
+
+def test_unchanged_state_is_not_sent():
+    Host = Scoreboard()
+    assert Host.update("bob", {'score': 1, 'locksSolved': 0})
+    Host.takeChanges()
+    assert not Host.update("bob", {'score': 1, 'locksSolved': 0})
+    assert Host.takeChanges() == b''
+
+
+@pytest.mark.parametrize("Name", ["a" * 300, "a" * 254 + "é", "世" * 100, "a" + "\U0001f600" * 80])
+def test_long_names_are_cut_on_a_character(Name):
+    Host, Client = Scoreboard(), Scoreboard()
+    Host.update(Name, {'score': 3, 'locksSolved': 1})
+    Client.applyChanges(Host.takeChanges())
+    (Received,) = Client.snapshot()
+    assert Name.startswith(Received)
+    assert 252 <= len(Received.encode("utf-8")) <= 255
@@ -0,0 +1,65 @@
+import asyncio
+import random
+import pytest
+from engine import GameState, LoadLocks, HashLocks, RULESET_VERSION
+from lock_catalogue import LockCatalogue
+from networking.async_server import AsyncBreakthroughServer
+from networking.framing import ProtocolError, encodeFrame, encodeHello, readFrameAsync
+from networking.server import packStartingData
+from networking.standards import *
+from networking.wire import *
+
+
+def DealFromSeed(SeedData, Locks):
+    State = GameState(Locks, random.Random(SeedData["SEED"]))
+    State.SetupStandardGame()
+    return State
+
+
+@pytest.mark.parametrize("Seed", [0, 1, 2 ** 64 - 1, 123456789])
+def test_seed_data_round_trip(Seed):
+    Locks = LoadLocks()
+    SeedData = decodeSeedData(encodeSeedData(RULESET_VERSION, HashLocks(Locks), Seed))
+    assert SeedData == {"RULESET": RULESET_VERSION, "LOCKS_HASH": HashLocks(Locks), "SEED": Seed}
+
+
+@pytest.mark.parametrize("Payload", [b'', b'\x00' * (SEED_DATA.size - 1), b'\x00' * (SEED_DATA.size + 1)])
+def test_seed_data_wrong_size(Payload):
+    with pytest.raises(ProtocolError):
+        decodeSeedData(Payload)
+
+
+def test_catalogue_hash_matches_loaded_locks():
+    assert LockCatalogue("assets/locks.txt").GetHash() == HashLocks(LoadLocks())
+
+
+@pytest.mark.parametrize("Seed", range(5))
+def test_seed_deals_the_same_game_as_the_full_starting_data(Seed):
+    async def Ask(Reader, Writer, Code, MsgType):
+        Writer.write(encodeFrame(MSG_COMMAND, bytes((Code,))))
+        while True:
+            Frame = await asyncio.wait_for(readFrameAsync(Reader), 5)
+            assert Frame is not None
+            if Frame[0] == MsgType:
+                return bytes(Frame[2])
+
+    async def Run():
+        Server = AsyncBreakthroughServer("127.0.0.1", 0, seed=Seed)
+        await Server.start()
+        try:
+            Reader, Writer = await asyncio.open_connection("127.0.0.1", Server.port)
+            Flags, Payload = encodeHello("bob", "room")
+            Writer.write(encodeFrame(MSG_HELLO, Payload, Flags))
+            SeedData = decodeSeedData(await Ask(Reader, Writer, CLIENT_SDATA_REQUEST, MSG_SEED_DATA))
+            FullData = decodeStartingData(await Ask(Reader, Writer, CLIENT_FULL_SDATA_REQUEST, MSG_STARTING_DATA))
+            Writer.close()
+        finally:
+            Server.close()
+        return SeedData, FullData
+
+    SeedData, FullData = asyncio.run(Run())
+    Locks = LoadLocks()
+    assert SeedData["RULESET"] == RULESET_VERSION
+    assert SeedData["LOCKS_HASH"] == HashLocks(Locks)
+    State = DealFromSeed(SeedData, Locks)
+    assert packStartingData(State.GetHand(), State.GetDeck(), Locks) == FullData
@@ -0,0 +1,83 @@
+import random
+import pytest
+from networking.framing import ProtocolError
+from networking.wire import *
+
+
+def RandomDescription(Rng):
+    return Rng.choice("PFK") + " " + Rng.choice("abc") + Rng.choice(["", "é", "世" * Rng.randint(1, 4)])
+
+
+def RandomStartingData(Rng, Descriptions):
+    Pool = [RandomDescription(Rng) + str(Count) for Count in range(Descriptions)]
+    return {"HAND": [Rng.choice(Pool) for Count in range(Rng.randint(0, 5))],
+            "DECK": [Rng.choice(Pool) for Count in range(Rng.randint(0, 400))],
+            "LOCKS": [[tuple(Rng.choice(Pool) for Length in range(Rng.randint(0, 4)))
+                       for Challenge in range(Rng.randint(0, 5))] for Lock in range(Rng.randint(0, 30))]}
+
+
+@pytest.mark.parametrize("Seed", range(30))
+def test_starting_data_round_trip(Seed):
+    Rng = random.Random(Seed)
+    Data = RandomStartingData(Rng, Rng.choice([1, 10, 256, 257, 1000]))
+    assert decodeStartingData(encodeStartingData(Data)) == Data
+
+
+def test_standard_game_round_trip():
+    from engine import GameState, LoadLocks
+    from networking.server import packStartingData
+    Locks = LoadLocks()
+    State = GameState(Locks, random.Random(5))
+    State.SetupStandardGame()
+    Data = packStartingData(State.GetHand(), State.GetDeck(), Locks)
+    assert decodeStartingData(encodeStartingData(Data)) == Data
+
+
+@pytest.mark.parametrize("Seed", range(30))
+def test_mangled_starting_data_raises_protocol_error(Seed):
+    Rng = random.Random(Seed)
+    Payload = bytearray(encodeStartingData(RandomStartingData(Rng, Rng.choice([10, 300]))))
+    for Attempt in range(100):
+        Mangled = bytearray(Payload)
+        Choice = Rng.randrange(3)
+        if Choice == 0:
+            del Mangled[Rng.randrange(len(Mangled)):]
+        elif Choice == 1:
+            for Flip in range(Rng.randint(1, 4)):
+                Mangled[Rng.randrange(len(Mangled))] = Rng.randrange(256)
+        else:
+            Mangled += bytes(Rng.randrange(256) for Count in range(Rng.randint(1, 8)))
+        try:
+            decodeStartingData(memoryview(bytes(Mangled)))
+        except ProtocolError:
+            pass
+
+
+@pytest.mark.parametrize("Data", [
+    {"HAND": [], "DECK": ["P a"] * 0x10000, "LOCKS": []},
+    {"HAND": ["P a"] * 0x10000, "DECK": [], "LOCKS": []},
+    {"HAND": [], "DECK": [], "LOCKS": [[]] * 0x10000},
+    {"HAND": [], "DECK": [str(Count) for Count in range(0x10000)], "LOCKS": []},
+    {"HAND": ["x" * 256], "DECK": [], "LOCKS": []},
+    {"HAND": [], "DECK": [], "LOCKS": [[("P a",)] * 256]},
+    {"HAND": [], "DECK": [], "LOCKS": [[("P a",) * 256]]},
+])
+def test_starting_data_over_the_wire_limits(Data):
+    with pytest.raises(ProtocolError, match="at most"):
+        encodeStartingData(Data)
+
+
+def test_starting_data_at_the_wire_limits():
+    Data = {"HAND": ["x" * 255], "DECK": ["P a"] * 0xFFFF, "LOCKS": [[("P a",) * 255] * 255]}
+    assert decodeStartingData(encodeStartingData(Data)) == Data
+
+
+@pytest.mark.parametrize("Score,LocksSolved", [(0, 0), (100, 7), (-1, 2 ** 31 - 1)])
+def test_state_update_round_trip(Score, LocksSolved):
+    assert decodeStateUpdate(encodeStateUpdate(Score, LocksSolved)) == {'score': Score, 'locksSolved': LocksSolved}
+
+
+@pytest.mark.parametrize("Payload", [b'', b'\x00' * 7, b'\x00' * 9])
+def test_state_update_wrong_size(Payload):
+    with pytest.raises(ProtocolError):
+        decodeStateUpdate(Payload)